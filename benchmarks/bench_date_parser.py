@@ -0,0 +1,77 @@
+"""Benchmark parsing raw EXIF dates.
+
+Compares the former `parse_raw_date`, looping over a set of strptime
+formats, with `DateParser.parse` and the cached `parse_exif_date`.
+Unique dates show the parser itself, repeated dates the cache, and
+offset dates the fallback path of the former function.
+
+Usage:
+    python -m benchmarks.bench_date_parser [number of dates]
+"""
+
+import sys
+import timeit
+from collections.abc import Callable
+from datetime import datetime, timedelta
+
+from media_organizer.date_parser import DateParser, parse_exif_date
+
+DEFAULT_DATE_COUNT: int = 10_000
+
+LEGACY_DATE_FORMATS: set[str] = {
+    "%Y:%m:%d %H:%M:%S",
+    "%Y:%m:%d %H:%M:%SZ",
+    "%Y:%m:%d %H:%M:%S%z",
+}
+
+
+def legacy_parse_raw_date(raw_date: str) -> datetime | None:
+    """The former parser, raising a ValueError on every format miss."""
+    for date_format in LEGACY_DATE_FORMATS:
+        try:
+            return datetime.strptime(raw_date, date_format)
+        except ValueError:
+            continue
+    return None
+
+
+def create_dates(count: int, suffix: str = "", unique: bool = True) -> list[str]:
+    """Return the given number of raw dates, one second apart if unique."""
+    start: datetime = datetime(2023, 5, 20, 15, 45, 50)
+    return [
+        (start + timedelta(seconds=index if unique else index % 10)).strftime(
+            f"%Y:%m:%d %H:%M:%S{suffix}"
+        )
+        for index in range(count)
+    ]
+
+
+def measure(parse: Callable[[str], datetime | None], raw_dates: list[str]) -> float:
+    """Return the best time in nanoseconds per date of parsing all dates."""
+    seconds: float = min(
+        timeit.repeat(lambda: [parse(raw) for raw in raw_dates], number=1, repeat=5)
+    )
+    return seconds / len(raw_dates) * 1e9
+
+
+def run(count: int) -> None:
+    """Print the time per date of every parser for every kind of dates."""
+    parsers: dict[str, Callable[[str], datetime | None]] = {
+        "legacy parse_raw_date": legacy_parse_raw_date,
+        "DateParser.parse": DateParser().parse,
+        "parse_exif_date (cached)": parse_exif_date,
+    }
+    samples: dict[str, list[str]] = {
+        "unique": create_dates(count),
+        "repeated": create_dates(count, unique=False),
+        "offset": create_dates(count, suffix="+01:00"),
+    }
+    print(f"{'parser':<26}" + "".join(f"{name:>12}" for name in samples))
+    for parser_name, parse in parsers.items():
+        parse_exif_date.cache_clear()
+        timings: list[float] = [measure(parse, dates) for dates in samples.values()]
+        print(f"{parser_name:<26}" + "".join(f"{ns:>9.0f} ns" for ns in timings))
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_DATE_COUNT)
@@ -0,0 +1,68 @@
+"""Benchmark the throughput cost of durable moves.
+
+Creates a source of small files of unknown type and organizes it with
+`move_from_source` three times: without durability, with durable moves
+synced after every move, and with the default durable batches. Prints
+the files moved per second and the number of folder syncs. The batched
+mode should stay close to the plain one, far above one sync per move.
+
+Usage:
+    python -m benchmarks.bench_durable [file count] [folder for the files]
+"""
+
+import contextlib
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from media_organizer.durability import DurableBatch, use_batch
+from media_organizer.media_organizer import move_from_source
+
+DEFAULT_FILE_COUNT: int = 5000
+FILES_PER_FOLDER: int = 100
+
+
+def create_source(source_dir: Path, file_count: int) -> None:
+    """Create the given number of small files of unknown type."""
+    for index in range(file_count):
+        folder: Path = source_dir / f"folder_{index // FILES_PER_FOLDER:05d}"
+        if index % FILES_PER_FOLDER == 0:
+            folder.mkdir(parents=True)
+        (folder / f"file_{index:08d}.bin").write_bytes(b"data")
+
+
+def measure(work_dir: Path, file_count: int, batch: DurableBatch | None) -> float:
+    """Return the seconds taken to organize a fresh source with the given batch."""
+    source_dir: Path = work_dir / "source"
+    create_source(source_dir, file_count)
+    os.sync()
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            start: float = time.perf_counter()
+            with use_batch(batch) if batch else contextlib.nullcontext():
+                move_from_source(source_dir, work_dir / "dest", fast=True, dry_run=False)
+            return time.perf_counter() - start
+
+
+def run(file_count: int, base_dir: str | None) -> None:
+    """Print the throughput of every durability mode."""
+    modes: dict[str, DurableBatch | None] = {
+        "plain": None,
+        "sync every move": DurableBatch(max_operations=1),
+        "batched": DurableBatch(),
+    }
+    print(f"{'mode':>16} {'files/s':>10} {'syncs':>8}")
+    for name, batch in modes.items():
+        with tempfile.TemporaryDirectory(dir=base_dir) as tmp_dir:
+            seconds: float = measure(Path(tmp_dir), file_count, batch)
+        syncs: int = batch.synced_folders if batch else 0
+        print(f"{name:>16} {file_count / seconds:>10.0f} {syncs:>8}")
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_FILE_COUNT,
+        sys.argv[2] if len(sys.argv) > 2 else None,
+    )
@@ -0,0 +1,69 @@
+"""Benchmark peak memory of walking large sources.
+
+Creates sources with a growing number of files and runs
+`move_from_source` in dry run mode on each of them in a fresh
+process, printing the peak RSS. The RSS should stay flat while the
+number of files grows. For comparison the same sources are walked with
+`Path.rglob`, which keeps every yielded path in memory.
+
+Usage:
+    python -m benchmarks.bench_memory [file counts ...]
+"""
+
+import contextlib
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+from pathlib import Path
+
+from media_organizer.media_organizer import move_from_source
+
+DEFAULT_FILE_COUNTS: list[int] = [10_000, 50_000, 100_000, 200_000]
+FILES_PER_FOLDER: int = 1000
+
+
+def create_source(source_dir: Path, file_count: int) -> None:
+    """Create the given number of empty files of unknown type."""
+    for index in range(file_count):
+        folder: Path = source_dir / f"folder_{index // FILES_PER_FOLDER:05d}"
+        if index % FILES_PER_FOLDER == 0:
+            folder.mkdir()
+        (folder / f"file_{index:08d}.bin").touch()
+
+
+def measure(method: str, source_dir: Path, dest_dir: Path) -> int:
+    """Return the peak RSS in KiB of the given walk method, run in this process."""
+    if method == "move_from_source":
+        with open(os.devnull, "w", encoding="utf-8") as devnull:
+            with contextlib.redirect_stdout(devnull):
+                move_from_source(source_dir, dest_dir, fast=True, dry_run=True)
+    else:
+        for _ in source_dir.rglob("*"):
+            pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run(file_counts: list[int]) -> None:
+    """Print the peak RSS of every walk method for every file count."""
+    context = multiprocessing.get_context("spawn")
+    print(f"{'files':>10} {'move_from_source':>18} {'rglob':>12}")
+    for file_count in file_counts:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            source_dir: Path = Path(tmp_dir) / "source"
+            source_dir.mkdir()
+            create_source(source_dir, file_count)
+            with context.Pool(1, maxtasksperchild=1) as pool:
+                organizer_rss: int = pool.apply(
+                    measure, ("move_from_source", source_dir, Path(tmp_dir) / "dest")
+                )
+            with context.Pool(1, maxtasksperchild=1) as pool:
+                rglob_rss: int = pool.apply(
+                    measure, ("rglob", source_dir, Path(tmp_dir) / "dest")
+                )
+        print(f"{file_count:>10} {organizer_rss:>15}KiB {rglob_rss:>9}KiB")
+
+
+if __name__ == "__main__":
+    run([int(count) for count in sys.argv[1:]] or DEFAULT_FILE_COUNTS)
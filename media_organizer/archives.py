@@ -0,0 +1,455 @@
+"""Organize the members of zip and tar archives without unpacking them first.
+
+Every member is read once, as a stream. Its date comes from the EXIF
+data at the start of the member or from the archive headers, then the
+member is written straight into its folder of the destination. Nothing
+is unpacked next to the archive, and the memory used per archive does
+not grow with the size of its members.
+
+Zip archives are read through their central directory, tar archives,
+compressed or not, as a stream since they have no index. Several
+archives are expanded at once, the members of one archive in order.
+"""
+
+import os
+import shutil
+import tarfile
+import zipfile
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
+from pathlib import Path, PurePosixPath
+from typing import IO, Final
+
+from media_organizer import config
+from media_organizer.catalog import Catalog
+from media_organizer.coordination import DestinationLocks
+from media_organizer.date_fetcher import get_accurate_media_date, get_exif_date
+from media_organizer.durability import DurableBatch, get_active_batch
+from media_organizer.enums import DateSource, OnDuplicate
+from media_organizer.file_utils import (
+    create_unique_filepath,
+    is_files_equal,
+    make_dirs,
+    move_file,
+)
+from media_organizer.routing import Route, RoutingTable, get_default_routing
+
+TAR_SUFFIXES: Final[tuple[str, ...]] = (
+    ".tar",
+    ".tgz",
+    ".tar.gz",
+    ".tar.bz2",
+    ".tar.xz",
+)
+
+ZIP_ENCRYPTED_FLAG: Final[int] = 0x1
+"""General purpose bit flag of encrypted zip members."""
+
+
+def is_expandable(path: Path) -> bool:
+    """Return True if the members of the given archive can be organized."""
+    name: str = path.name.lower()
+    return name.endswith(".zip") or name.endswith(TAR_SUFFIXES)
+
+
+@dataclass(frozen=True)
+class ArchiveMember:
+    """One regular file of an archive."""
+
+    name: str
+    """Path of the member inside the archive."""
+
+    header_date: datetime | None
+    """Modification time stored in the archive headers."""
+
+    @property
+    def file_name(self) -> str:
+        """Return the file name of the member, without its folders."""
+        return PurePosixPath(self.name).name
+
+    @property
+    def group_key(self) -> str:
+        """Return the key shared by a photo and its sidecar, see `find_xmp_config`."""
+        return str(PurePosixPath(self.name).with_suffix(""))
+
+
+def iter_zip_members(archive_path: Path) -> Iterator[tuple[ArchiveMember, IO[bytes]]]:
+    """Yield the regular members of a zip archive with a stream of their content.
+
+    Only the central directory at the end of the archive is read up
+    front, every member is then read from its own offset.
+    """
+    with zipfile.ZipFile(archive_path) as archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            if info.flag_bits & ZIP_ENCRYPTED_FLAG:
+                print(f"[ WARNING ] skipping encrypted {archive_path}:{info.filename}")
+                continue
+            try:
+                header_date: datetime | None = datetime(*info.date_time)
+            except ValueError:
+                header_date = None
+            with archive.open(info) as stream:
+                yield ArchiveMember(info.filename, header_date), stream
+
+
+def iter_tar_members(archive_path: Path) -> Iterator[tuple[ArchiveMember, IO[bytes]]]:
+    """Yield the regular members of a tar archive with a stream of their content.
+
+    The archive is read front to back once, compressed archives are
+    decompressed on the fly. Streams must be read before the next member.
+    """
+    with tarfile.open(archive_path, "r|*") as archive:
+        for info in archive:
+            # Tar files keep every header read, they are not needed again.
+            archive.members = []  # type: ignore[attr-defined]
+            if not info.isfile():
+                continue
+            stream: IO[bytes] | None = archive.extractfile(info)
+            if stream is None:
+                continue
+            header_date: datetime | None = (
+                datetime.fromtimestamp(info.mtime) if info.mtime else None
+            )
+            yield ArchiveMember(info.name, header_date), stream
+
+
+def iter_members(archive_path: Path) -> Iterator[tuple[ArchiveMember, IO[bytes]]]:
+    """Yield the regular members of the given zip or tar archive."""
+    if archive_path.name.lower().endswith(".zip"):
+        return iter_zip_members(archive_path)
+    return iter_tar_members(archive_path)
+
+
+def get_member_date(
+    member: ArchiveMember, head: bytes, route: Route, fast: bool
+) -> tuple[datetime | None, DateSource]:
+    """Return the date of a member of a dated route and where it comes from.
+
+    The accurate mode reads the EXIF data in the head of members of exif
+    routes, both modes fall back to the modification time in the archive
+    headers.
+    """
+    if not route.is_dated:
+        return None, DateSource.NONE
+    if not fast and route.date_strategy == DateSource.EXIF:
+        if date := get_exif_date(head, label=member.name):
+            return date, DateSource.EXIF
+    if member.header_date:
+        return member.header_date, DateSource.MTIME
+    return None, DateSource.NONE
+
+
+def write_member(  # pylint: disable=too-many-arguments
+    stream: IO[bytes],
+    head: bytes,
+    label: str,
+    dst_path: Path,
+    *,
+    on_duplicate: OnDuplicate,
+    locks: DestinationLocks,
+) -> Path | None:
+    """Write the head and the rest of the given stream to the destination file.
+
+    The destination name is claimed under the folder lock by creating
+    the file, its content is written after releasing the lock. If another
+    run created the same file in the meantime, the duplicate strategy is
+    applied again, like `media_organizer.file_utils.move_file`. While
+    moves are durable, the content is synced, see
+    `media_organizer.durability`.
+
+    Args:
+        stream: The member content following the head.
+        head: The first bytes of the member, already read.
+        label: Names the member in messages.
+        dst_path: The destination file.
+        on_duplicate: Which strategy to follow when the destination
+            file already exists.
+        locks: Destination folder locks shared with concurrent runs.
+
+    Returns:
+        The written file, None if it was not written because of a duplicate.
+    """
+    requested_path: Path = dst_path
+    make_dirs(dst_path.parent)
+    existing_path: Path | None = None
+    with locks.lock(dst_path.parent):
+        if dst_path.exists():
+            print(
+                "[ WARNING ] duplicate: Found file with same name in the destination "
+                f"folder. {label} == {dst_path}"
+            )
+            match on_duplicate:
+                case OnDuplicate.CREATE_UNIQ_FILENAME_IF_CONTENT_MISMATCH:
+                    existing_path = dst_path
+                    dst_path = create_unique_filepath(dst_path)
+                case OnDuplicate.CREATE_UNIQ_FILENAME:
+                    dst_path = create_unique_filepath(dst_path)
+                case OnDuplicate.SKIP:
+                    print(f"[ SKIP ] {label} {dst_path}")
+                    return None
+                case OnDuplicate.OVERWRITE:
+                    print(f"[ OVERWRITE ] {label} -> {dst_path}")
+                case _:
+                    raise ValueError(
+                        f"{on_duplicate=} did not match any configured value."
+                    )
+        dst_file: IO[bytes] | None = None
+        try:
+            dst_file = open(  # pylint: disable=consider-using-with
+                dst_path, "wb" if on_duplicate == OnDuplicate.OVERWRITE else "xb"
+            )
+        except FileExistsError:
+            print(f"[ WARNING ] {dst_path} was created by another run, retrying {label}")
+
+    if dst_file is None:
+        return write_member(
+            stream,
+            head,
+            label,
+            requested_path,
+            on_duplicate=on_duplicate,
+            locks=locks,
+        )
+    print(f"extract {label} {dst_path}")
+    batch: DurableBatch | None = get_active_batch()
+    try:
+        with dst_file:
+            dst_file.write(head)
+            shutil.copyfileobj(stream, dst_file, config.ARCHIVE_COPY_CHUNK_SIZE)
+            if batch:
+                dst_file.flush()
+                os.fsync(dst_file.fileno())
+    except BaseException:
+        dst_path.unlink(missing_ok=True)
+        raise
+    if batch:
+        batch.touch(dst_path.parent)
+
+    if existing_path and is_files_equal(src_path=dst_path, dst_path=existing_path):
+        print(f"[ DEBUG ] rm {dst_path}")
+        dst_path.unlink()
+        return None
+    return dst_path
+
+
+@dataclass(frozen=True)
+class OrganizedPhoto:
+    """Where a photo of an archive went, for its sidecar."""
+
+    folder: Path
+    base_dir: Path
+    date: datetime | None
+    date_source: DateSource
+
+
+def move_to_accurate_date(
+    media_path: Path,
+    base_dir: Path,
+    folder_format: str,
+    on_duplicate: OnDuplicate,
+    locks: DestinationLocks,
+) -> tuple[Path | None, datetime | None]:
+    """Move a written member into the folder of the date in its metadata.
+
+    Used for dates not found in the head, e.g. those of video containers.
+
+    Returns:
+        The path of the member, None if it was dropped as a duplicate, and
+        its accurate date, None if unknown.
+    """
+    accurate_date: datetime | None = get_accurate_media_date(media_path)
+    if accurate_date is None:
+        return media_path, None
+    dated_path: Path = base_dir / accurate_date.strftime(folder_format) / media_path.name
+    if dated_path.parent == media_path.parent:
+        return media_path, accurate_date
+    moved_path: Path | None = move_file(
+        src_filepath=media_path,
+        dst_filepath=dated_path,
+        dry_run=False,
+        on_duplicate=on_duplicate,
+        locks=locks,
+    )
+    return moved_path, accurate_date
+
+
+def move_sidecar(
+    sidecar_path: Path,
+    photo: OrganizedPhoto,
+    on_duplicate: OnDuplicate,
+    locks: DestinationLocks,
+    catalog: Catalog | None,
+) -> None:
+    """Move a sidecar written before its photo next to the photo."""
+    moved_path: Path | None = move_file(
+        src_filepath=sidecar_path,
+        dst_filepath=photo.folder / sidecar_path.name,
+        dry_run=False,
+        on_duplicate=on_duplicate,
+        locks=locks,
+    )
+    if catalog and moved_path:
+        catalog.add(moved_path, photo.base_dir, photo.date, photo.date_source)
+
+
+# pylint: disable-next=too-many-arguments,too-many-locals,too-many-branches
+def organize_archive(
+    archive_path: Path,
+    dest_dir: Path,
+    fast: bool = False,
+    dry_run: bool = True,
+    on_duplicate: OnDuplicate = OnDuplicate.CREATE_UNIQ_FILENAME_IF_CONTENT_MISMATCH,
+    *,
+    locks: DestinationLocks,
+    catalog: Catalog | None = None,
+    folder_format: str = config.DATE_FOLDER_FORMAT,
+    routing: RoutingTable | None = None,
+) -> int:
+    """Organize every member of the given archive into the destination.
+
+    Members go where `organize_file` would move them. Sidecars follow
+    their photo, a sidecar found before its photo is moved next to it
+    once the photo is written.
+
+    Args:
+        archive_path: The zip or tar archive, see `is_expandable`.
+        dest_dir: The destination directory holding the category folders.
+        fast: Only use the dates of the archive headers.
+        dry_run: Does not write the members unless this flag is set to False.
+        on_duplicate: Which strategy to follow when a member already
+            exists in the destination folder.
+        locks: Destination folder locks shared with concurrent runs.
+        catalog: Catalog of the destination recording the written
+            members, None in dry runs.
+        folder_format: strftime format of the date folders.
+        routing: Routing table of the file categories, the default one
+            if None.
+
+    Returns:
+        The number of organized members, or in a dry run organizable ones.
+    """
+    if routing is None:
+        routing = get_default_routing()
+    organized: int = 0
+    photos: dict[str, OrganizedPhoto] = {}
+    lone_sidecars: dict[str, Path] = {}
+    for member, stream in iter_members(archive_path):
+        file_name: str = member.file_name
+        if not file_name:
+            continue
+        label: str = f"{archive_path}:{member.name}"
+        is_sidecar: bool = (
+            PurePosixPath(file_name).suffix.lower() == config.DARKTABLE_EXT_FORMAT
+        )
+        route: Route = routing.lookup(file_name)
+        head: bytes = stream.read(config.ARCHIVE_HEAD_SIZE)
+        date, date_source = get_member_date(member, head, route, fast)
+        template: str = route.get_template(file_name, folder_format)
+
+        base_dir: Path | None = dest_dir / route.folder if route.is_dated else None
+        photo: OrganizedPhoto | None = (
+            photos.get(member.group_key) if is_sidecar else None
+        )
+        if photo:
+            dst_path: Path = photo.folder / file_name
+            base_dir, date, date_source = photo.base_dir, photo.date, photo.date_source
+        else:
+            dst_path = (
+                route.get_folder(dest_dir, file_name, date, folder_format) / file_name
+            )
+
+        organized += 1
+        if dry_run:
+            print(f"extract {label} {dst_path}")
+            continue
+
+        written_path: Path | None = write_member(
+            stream, head, label, dst_path, on_duplicate=on_duplicate, locks=locks
+        )
+        if written_path is None:
+            continue
+        if member.header_date:
+            timestamp: float = member.header_date.timestamp()
+            os.utime(written_path, (timestamp, timestamp))
+
+        # Dates not in the head, e.g. those of video containers, are read now.
+        if (
+            not fast
+            and photo is None
+            and route.date_strategy == DateSource.EXIF
+            and date_source != DateSource.EXIF
+            and base_dir is not None
+        ):
+            written_path, accurate_date = move_to_accurate_date(
+                written_path, base_dir, template, on_duplicate, locks
+            )
+            if written_path is None:
+                continue
+            if accurate_date:
+                date, date_source = accurate_date, DateSource.EXIF
+
+        if catalog and base_dir is not None:
+            catalog.add(written_path, base_dir, date, date_source)
+
+        if route.sidecars and base_dir is not None:
+            photo = OrganizedPhoto(written_path.parent, base_dir, date, date_source)
+            photos[member.group_key] = photo
+            if sidecar_path := lone_sidecars.pop(member.group_key, None):
+                move_sidecar(sidecar_path, photo, on_duplicate, locks, catalog)
+        elif is_sidecar and photo is None:
+            lone_sidecars[member.group_key] = written_path
+    return organized
+
+
+def organize_archives(  # pylint: disable=too-many-arguments,too-many-locals
+    archive_paths: list[Path],
+    dest_dir: Path,
+    fast: bool = False,
+    dry_run: bool = True,
+    on_duplicate: OnDuplicate = OnDuplicate.CREATE_UNIQ_FILENAME_IF_CONTENT_MISMATCH,
+    *,
+    locks: DestinationLocks,
+    catalog: Catalog | None = None,
+    folder_format: str = config.DATE_FOLDER_FORMAT,
+    routing: RoutingTable | None = None,
+    workers: int = config.ARCHIVE_WORKERS,
+) -> list[Path]:
+    """Organize the members of the given archives, several archives at once.
+
+    See `organize_archive` for the arguments.
+
+    Returns:
+        The archives whose members were all read. Archives which could
+        not be read, e.g. corrupted ones, are left where they are.
+    """
+    organize: Callable[[Path], int] = partial(
+        organize_archive,
+        dest_dir=dest_dir,
+        fast=fast,
+        dry_run=dry_run,
+        on_duplicate=on_duplicate,
+        locks=locks,
+        catalog=catalog,
+        folder_format=folder_format,
+        routing=routing,
+    )
+    expanded: list[Path] = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures: list[tuple[Path, Future[int]]] = [
+            (archive_path, executor.submit(organize, archive_path))
+            for archive_path in archive_paths
+        ]
+        for archive_path, future in futures:
+            try:
+                organized: int = future.result()
+            except (OSError, EOFError, zipfile.BadZipFile, tarfile.TarError) as error:
+                print(f"[ WARNING ] cannot expand archive {archive_path}, error: {error}")
+                continue
+            print(f"[ INFO ] expanded {organized} files from {archive_path}")
+            expanded.append(archive_path)
+    return expanded
@@ -0,0 +1,78 @@
+"""BK-tree index of perceptual hashes.
+
+A BK-tree answers "which hashes are within Hamming distance r of this
+one" without comparing against every stored hash. Each child edge is
+labelled with its distance to the parent, and the triangle inequality
+lets a query skip every subtree outside [d - r, d + r].
+"""
+
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+
+def hamming_distance(first_hash: int, second_hash: int) -> int:
+    """Return the number of bits differing between the two given hashes."""
+    return (first_hash ^ second_hash).bit_count()
+
+
+class _Node(Generic[T]):  # pylint: disable=too-few-public-methods
+    """Node of the BK-tree holding every item sharing the same hash."""
+
+    __slots__ = ("hash_value", "items", "children")
+
+    def __init__(self, hash_value: int, item: T) -> None:
+        self.hash_value: int = hash_value
+        self.items: list[T] = [item]
+        self.children: dict[int, _Node[T]] = {}
+
+
+class BKTree(Generic[T]):
+    """BK-tree of integer hashes using the Hamming distance."""
+
+    def __init__(self) -> None:
+        self._root: _Node[T] | None = None
+        self._length: int = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def add(self, hash_value: int, item: T) -> None:
+        """Add the given item under the given hash."""
+        self._length += 1
+        if self._root is None:
+            self._root = _Node(hash_value, item)
+            return
+
+        node: _Node[T] = self._root
+        while True:
+            distance: int = hamming_distance(hash_value, node.hash_value)
+            if distance == 0:
+                node.items.append(item)
+                return
+            child: _Node[T] | None = node.children.get(distance)
+            if child is None:
+                node.children[distance] = _Node(hash_value, item)
+                return
+            node = child
+
+    def query(self, hash_value: int, radius: int) -> list[tuple[int, T]]:
+        """Return the items within the given Hamming radius of the given hash.
+
+        Returns:
+            Tuples of distance and item, closest first.
+        """
+        matches: list[tuple[int, T]] = []
+        pending: list[_Node[T]] = [self._root] if self._root else []
+        while pending:
+            node: _Node[T] = pending.pop()
+            distance: int = hamming_distance(hash_value, node.hash_value)
+            if distance <= radius:
+                matches.extend((distance, item) for item in node.items)
+            pending.extend(
+                child
+                for child_distance, child in node.children.items()
+                if distance - radius <= child_distance <= distance + radius
+            )
+        matches.sort(key=lambda match: match[0])
+        return matches
@@ -0,0 +1,252 @@
+"""Partial runs: organizing files by priority within a time or size budget.
+
+A source backlog can exceed the time available to organize it. Files
+are then organized in priority order: the files of chosen categories
+first, and within each category the newest or the smallest files first.
+
+Ordering never sorts the whole source in memory. Each category is kept
+in a `SpillList`, and ordered with a heap bounded to the number of
+files the run may organize, or with `sorted_spill` without such limit.
+
+A `RunBudget` stops the run between two files once the time, the
+number of files or the bytes are used up, and counts what remains of
+the files walked so far. The walk itself stops with the run.
+"""
+
+import heapq
+import time
+from collections.abc import Callable, Iterable, Iterator
+from typing import Final
+
+from media_organizer.enums import Priority
+from media_organizer.routing import RoutingTable
+from media_organizer.spill import SpillList, sorted_spill
+from media_organizer.walker import FileRecord
+
+PRIORITY_KEYS: Final[dict[Priority, Callable[[FileRecord], float]]] = {
+    Priority.NEWEST: lambda record: -record.mtime,
+    Priority.SMALLEST: lambda record: record.size,
+}
+"""Sort key of every priority but the walk order."""
+
+DURATION_UNITS: Final[dict[str, int]] = {"": 1, "S": 1, "M": 60, "H": 3600, "D": 86400}
+
+
+def parse_duration(raw_duration: str) -> float:
+    """Parse a duration like "90", "45m" or "1.5h" into seconds.
+
+    Raises:
+        ValueError: The given duration is not a valid duration.
+    """
+    duration: str = raw_duration.strip().upper()
+    unit: str = duration[-1:] if duration[-1:] in DURATION_UNITS else ""
+    try:
+        value: float = float(duration.removesuffix(unit) if unit else duration)
+    except ValueError as error:
+        raise ValueError(f"{raw_duration!r} is not a valid duration.") from error
+    if value < 0:
+        raise ValueError(f"{raw_duration!r} is not a valid duration.")
+    return value * DURATION_UNITS[unit]
+
+
+def check_categories(routing: RoutingTable, categories: Iterable[str]) -> None:
+    """Raise a ValueError if one of the given categories is not routed."""
+    known: set[str] = {route.category for route in routing.routes.values()}
+    known.add(routing.fallback.category)
+    if unknown := [category for category in categories if category not in known]:
+        raise ValueError(
+            f"unknown categories {', '.join(unknown)}, "
+            f"choose from {', '.join(sorted(known))}."
+        )
+
+
+def order_records(  # pylint: disable=too-many-arguments
+    records: Iterable[FileRecord],
+    routing: RoutingTable,
+    priority: Priority = Priority.WALK,
+    first: tuple[str, ...] = (),
+    *,
+    max_items: int,
+    max_files: int | None = None,
+) -> Iterator[FileRecord]:
+    """Yield the given files in priority order.
+
+    Args:
+        records: Walked files, consumed lazily.
+        routing: Routes telling the category of every file.
+        priority: Order of the files within each category.
+        first: Categories organized before the others, in this order.
+        max_items: Maximum number of files kept in memory.
+        max_files: Files the run organizes at most, bounding the heaps.
+
+    Raises:
+        ValueError: A given category is not in the routing table.
+    """
+    check_categories(routing, first)
+    if priority == Priority.WALK and not first:
+        return iter(records)
+    return _order_records(records, routing, priority, first, max_items, max_files)
+
+
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments
+def _order_records(
+    records: Iterable[FileRecord],
+    routing: RoutingTable,
+    priority: Priority,
+    first: tuple[str, ...],
+    max_items: int,
+    max_files: int | None,
+) -> Iterator[FileRecord]:
+    """Yield the given files in priority order, see `order_records`."""
+    ranks: dict[str, int] = {category: rank for rank, category in enumerate(first)}
+    classes: list[SpillList[FileRecord]] = [
+        SpillList(max_items) for _ in range(len(first) + 1)
+    ]
+    try:
+        for record in records:
+            rank: int = ranks.get(routing.lookup(record.name).category, len(first))
+            classes[rank].append(record)
+        for records_class in classes:
+            if priority == Priority.WALK:
+                yield from records_class
+            elif max_files is not None:
+                yield from _smallest_first(
+                    records_class, PRIORITY_KEYS[priority], max_files, max_items
+                )
+            else:
+                yield from sorted_spill(
+                    records_class, key=PRIORITY_KEYS[priority], max_items=max_items
+                )
+            records_class.close()
+    finally:
+        for records_class in classes:
+            records_class.close()
+
+
+def _smallest_first(
+    records: Iterable[FileRecord],
+    key: Callable[[FileRecord], float],
+    count: int,
+    max_items: int,
+) -> Iterator[FileRecord]:
+    """Yield the ``count`` smallest files by key in order, then the others.
+
+    A heap bounded to ``count`` files keeps the smallest ones seen so
+    far, the others are only counted by the budget, in walk order.
+    """
+    # Negated keys and indexes make a max-heap, ties keep the walk order.
+    heap: list[tuple[float, int, FileRecord]] = []
+    with SpillList[FileRecord](max_items) as others:
+        for index, record in enumerate(records):
+            item: tuple[float, int, FileRecord] = (-key(record), -index, record)
+            if len(heap) < count:
+                heapq.heappush(heap, item)
+            else:
+                others.append(heapq.heappushpop(heap, item)[2])
+        yield from (record for *_, record in sorted(heap, reverse=True))
+        yield from others
+
+
+class RunBudget:  # pylint: disable=too-many-instance-attributes
+    """Time, number of files and bytes a run may use."""
+
+    def __init__(
+        self,
+        seconds: float | None = None,
+        max_files: int | None = None,
+        max_bytes: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Start the budget, its time runs from now.
+
+        Args:
+            seconds: Time the run may take, unlimited if None.
+            max_files: Files the run may organize, unlimited if None.
+            max_bytes: Bytes the run may organize, unlimited if None.
+            clock: Monotonic clock, replaced in tests.
+        """
+        self.seconds: float | None = seconds
+        self.max_files: int | None = max_files
+        self.max_bytes: int | None = max_bytes
+        self.clock: Callable[[], float] = clock
+        self.started: float = clock()
+        self.exhausted: str | None = None
+        """What was used up, None while the budget lasts."""
+        self.done_files: int = 0
+        self.done_bytes: int = 0
+        self.walked_all: bool = False
+        """True once every file of the source was walked, and counted."""
+        self._walked_files: int = 0
+        self._walked_bytes: int = 0
+        self._queued_files: int = 0
+        self._queued_bytes: int = 0
+
+    def is_out_of_time(self) -> bool:
+        """Return True if the time of the budget is used up."""
+        if (
+            self.exhausted is None
+            and self.seconds is not None
+            and self.clock() - self.started >= self.seconds
+        ):
+            self.exhausted = "time"
+        return self.exhausted == "time"
+
+    def _fits(self, record: FileRecord) -> bool:
+        """Return True if the given file fits in the budget, else record why not."""
+        if self.is_out_of_time():
+            return False
+        if self.max_files is not None and self._queued_files >= self.max_files:
+            self.exhausted = "files"
+        elif (
+            self.max_bytes is not None
+            and self._queued_bytes + record.size > self.max_bytes
+        ):
+            self.exhausted = "bytes"
+        return self.exhausted is None
+
+    def count_walked(self, records: Iterable[FileRecord]) -> Iterator[FileRecord]:
+        """Yield the given walked files, counting them as remaining until done."""
+        for record in records:
+            self._walked_files += 1
+            self._walked_bytes += record.size
+            yield record
+        self.walked_all = True
+
+    def limit(self, records: Iterable[FileRecord]) -> Iterator[FileRecord]:
+        """Yield the given files until the budget is used up.
+
+        The files are queued ahead of their moves, the bytes and number
+        of files are exact, the time is checked again before every move.
+        No file is read past the first one exceeding the budget.
+        """
+        for record in records:
+            if not self._fits(record):
+                return
+            self._queued_files += 1
+            self._queued_bytes += record.size
+            yield record
+
+    def add_done(self, record: FileRecord) -> None:
+        """Count the given file as organized."""
+        self.done_files += 1
+        self.done_bytes += record.size
+
+    def put_back(self, records: Iterable[FileRecord]) -> None:
+        """Count the given files, counted as organized, as remaining after all."""
+        for record in records:
+            self.done_files -= 1
+            self.done_bytes -= record.size
+
+    def finish(self) -> tuple[int, int]:
+        """Count the walked files not organized by the run, after it stopped.
+
+        The rest of the source is not walked to count it, the count is
+        then a lower bound, see `walked_all`.
+
+        Returns:
+            The number of files and bytes known to remain in the source.
+        """
+        return (
+            self._walked_files - self.done_files,
+            self._walked_bytes - self.done_bytes,
+        )
@@ -0,0 +1,364 @@
+"""Catalog of the files organized into a destination.
+
+Every dated file moved into the destination is recorded with its size,
+a partial content hash, its resolved date and where that date came
+from. The layout of the date folders can then be changed from the
+catalog alone, without reading the metadata of the library again, and
+files of a given month or day are found without walking the tree.
+
+The catalog is a sqlite database in the state folder of the destination,
+paths are stored relative to the destination.
+"""
+
+import sqlite3
+import threading
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Final
+
+from media_organizer import config
+from media_organizer.coordination import DestinationLocks
+from media_organizer.enums import DateSource, DeviceProfile, OnDuplicate
+from media_organizer.file_sample import get_partial_hash
+from media_organizer.file_utils import move_file
+from media_organizer.io_scheduler import IoScheduler
+from media_organizer.routing import (
+    Route,
+    RoutingTable,
+    check_folder_format,
+    get_default_routing,
+)
+from media_organizer.walker import walk_source
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    """One organized file."""
+
+    path: Path
+    """Path relative to the destination."""
+
+    base: Path
+    """Category folder holding the date folders, relative to the destination."""
+
+    size: int
+    partial_hash: str
+    date: datetime | None
+    date_source: DateSource
+
+
+def get_catalog_path(dest_dir: Path) -> Path:
+    """Return the catalog file of the given destination."""
+    return dest_dir / config.STATE_FOLDER_NAME / config.CATALOG_FILE_NAME
+
+
+def get_date_prefix_end(date_prefix: str) -> str:
+    """Return the smallest string sorting after every date with the given prefix.
+
+    Dates are stored in ISO format, which only uses characters sorting
+    before "~".
+    """
+    return f"{date_prefix}~"
+
+
+ENTRY_COLUMNS: Final[str] = "path, base, size, partial_hash, date, date_source"
+"""Columns of the files table read into a `CatalogEntry`."""
+
+
+def to_entry(row: tuple) -> CatalogEntry:
+    """Return the entry of the given row of ENTRY_COLUMNS."""
+    path, base, size, content_hash, date, date_source = row
+    return CatalogEntry(
+        path=Path(path),
+        base=Path(base),
+        size=size,
+        partial_hash=content_hash,
+        date=datetime.fromisoformat(date) if date else None,
+        date_source=DateSource(date_source),
+    )
+
+
+class Catalog:
+    """The catalog of one destination.
+
+    Changes can be recorded from several threads, e.g. while expanding
+    archives, they are serialized.
+    """
+
+    def __init__(self, dest_dir: Path) -> None:
+        self.dest_dir: Path = dest_dir
+        catalog_path: Path = get_catalog_path(dest_dir)
+        catalog_path.parent.mkdir(parents=True, exist_ok=True)
+        # Concurrent runs on the same destination wait for each other's writes.
+        self.connection: sqlite3.Connection = sqlite3.connect(
+            catalog_path, timeout=60, check_same_thread=False
+        )
+        self._lock: threading.Lock = threading.Lock()
+        self.connection.executescript(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, base TEXT, size INTEGER, partial_hash TEXT, "
+            "date TEXT, date_source TEXT);"
+            "CREATE INDEX IF NOT EXISTS files_date ON files (date);"
+            "CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT);"
+        )
+        self._uncommitted: int = 0
+
+    def __enter__(self) -> "Catalog":
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    @staticmethod
+    def read_folder_format(dest_dir: Path) -> str:
+        """Return the date folder format of the given destination.
+
+        Does not create the catalog, so dry runs leave no trace.
+        """
+        catalog_path: Path = get_catalog_path(dest_dir)
+        if not catalog_path.exists():
+            return config.DATE_FOLDER_FORMAT
+        with Catalog(dest_dir) as catalog:
+            return catalog.get_folder_format()
+
+    def get_folder_format(self) -> str:
+        """Return the strftime format of the date folders."""
+        row = self.connection.execute(
+            "SELECT value FROM metadata WHERE key = 'folder_format'"
+        ).fetchone()
+        return row[0] if row else config.DATE_FOLDER_FORMAT
+
+    def set_folder_format(self, folder_format: str) -> None:
+        """Store the strftime format of the date folders."""
+        self.connection.execute(
+            "INSERT OR REPLACE INTO metadata VALUES ('folder_format', ?)",
+            (folder_format,),
+        )
+        self.commit()
+
+    def add(
+        self,
+        file_path: Path,
+        base_dir: Path,
+        date: datetime | None,
+        date_source: DateSource,
+    ) -> None:
+        """Record the given organized file, replacing any previous record.
+
+        Args:
+            file_path: The file in the destination.
+            base_dir: The category folder holding its date folders.
+            date: The resolved date of the file, None if unknown.
+            date_source: Where the date comes from.
+        """
+        row: tuple = (
+            str(file_path.relative_to(self.dest_dir)),
+            str(base_dir.relative_to(self.dest_dir)),
+            file_path.stat().st_size,
+            # Sampled for its date before the move, so usually not read again.
+            get_partial_hash(file_path),
+            date.isoformat() if date else None,
+            str(date_source),
+        )
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)", row
+            )
+            self._count_change()
+
+    def move(self, old_path: Path, new_path: Path) -> None:
+        """Record that the given file moved within the destination."""
+        with self._lock:
+            self.connection.execute(
+                "UPDATE OR REPLACE files SET path = ? WHERE path = ?",
+                (
+                    str(new_path.relative_to(self.dest_dir)),
+                    str(old_path.relative_to(self.dest_dir)),
+                ),
+            )
+            self._count_change()
+
+    def remove(self, file_path: Path) -> None:
+        """Forget the given file."""
+        with self._lock:
+            self.connection.execute(
+                "DELETE FROM files WHERE path = ?",
+                (str(file_path.relative_to(self.dest_dir)),),
+            )
+            self._count_change()
+
+    def query(self, date_prefix: str = "") -> Iterator[CatalogEntry]:
+        """Yield the files whose ISO date starts with the given prefix.
+
+        E.g. ``2021-06`` for June 2021 or ``2021-06-13`` for one day,
+        ordered by date.
+        """
+        cursor: sqlite3.Cursor = self.connection.execute(
+            f"SELECT {ENTRY_COLUMNS} FROM files "
+            "WHERE date >= ? AND date < ? ORDER BY date, path",
+            (date_prefix, get_date_prefix_end(date_prefix)),
+        )
+        for row in cursor:
+            yield to_entry(row)
+
+    def iter_entries(
+        self, batch_size: int = config.CATALOG_COMMIT_INTERVAL
+    ) -> Iterator[CatalogEntry]:
+        """Yield every file, undated ones included.
+
+        Entries are read a batch at a time, so they can be changed while
+        iterating.
+        """
+        last_rowid: int = 0
+        while rows := self.connection.execute(
+            f"SELECT rowid, {ENTRY_COLUMNS} FROM files "
+            "WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            (last_rowid, batch_size),
+        ).fetchall():
+            last_rowid = rows[-1][0]
+            for row in rows:
+                yield to_entry(row[1:])
+
+    def _count_change(self) -> None:
+        """Commit every few changes, a crash loses at most a few records.
+
+        Called while holding the lock.
+        """
+        self._uncommitted += 1
+        if self._uncommitted >= config.CATALOG_COMMIT_INTERVAL:
+            self.connection.commit()
+            self._uncommitted = 0
+
+    def commit(self) -> None:
+        """Persist the recorded changes."""
+        with self._lock:
+            self.connection.commit()
+            self._uncommitted = 0
+
+    def close(self) -> None:
+        """Persist the recorded changes and close the catalog."""
+        self.commit()
+        self.connection.close()
+
+
+def remove_empty_folders(folder: Path, stop_dir: Path) -> None:
+    """Remove the given folder and its parents while empty, up to stop_dir."""
+    while folder != stop_dir and folder.is_relative_to(stop_dir):
+        try:
+            folder.rmdir()
+        except OSError:
+            return
+        folder = folder.parent
+
+
+def relayout(
+    dest_dir: Path,
+    folder_format: str,
+    dry_run: bool = True,
+    routing: RoutingTable | None = None,
+) -> tuple[int, int]:
+    """Move every dated file of the catalog into the folders of the given format.
+
+    Only the catalog is read, no metadata. Files missing from the
+    destination are dropped from the catalog. Emptied date folders are
+    removed. Categories with their own folder template keep their layout.
+
+    The new format is saved before any file moves and every move is
+    committed at once, so a relayout stopped halfway can be run again.
+
+    Args:
+        dest_dir: The organized destination.
+        folder_format: strftime format of the date folders, e.g. ``%Y/%Y_%m``.
+        dry_run: Only print the moves.
+        routing: Routing table of the file categories, the default one
+            if None.
+
+    Returns:
+        The number of moved, or in a dry run movable, files and of files
+        missing from the destination.
+    """
+    check_folder_format(folder_format)
+    templated_folders: set[Path] = {
+        Path(folder)
+        for folder, route in (routing or get_default_routing()).get_dated_routes().items()
+        if route.template is not None
+    }
+    locks: DestinationLocks = DestinationLocks(dest_dir)
+    moved: int = 0
+    missing: int = 0
+    with Catalog(dest_dir) as catalog:
+        if not dry_run:
+            # Saved first, files organized while relayouting go to the new folders.
+            catalog.set_folder_format(folder_format)
+        for entry in catalog.iter_entries():
+            if entry.date is None or entry.base in templated_folders:
+                continue
+            old_path: Path = entry.path
+            new_path: Path = (
+                entry.base / entry.date.strftime(folder_format) / old_path.name
+            )
+            if new_path == old_path:
+                continue
+            src_path: Path = dest_dir / old_path
+            if not src_path.exists():
+                print(
+                    f"[ WARNING ] {src_path} is in the catalog but not in the destination"
+                )
+                missing += 1
+                if not dry_run:
+                    catalog.remove(src_path)
+                continue
+
+            dst_path: Path | None = move_file(
+                src_filepath=src_path,
+                dst_filepath=dest_dir / new_path,
+                dry_run=dry_run,
+                on_duplicate=OnDuplicate.CREATE_UNIQ_FILENAME,
+                locks=locks,
+            )
+            if dst_path is None:
+                continue
+            moved += 1
+            if dry_run:
+                continue
+            catalog.move(src_path, dst_path)
+            # Committed at once, after a crash a moved file is never taken for missing.
+            catalog.commit()
+            remove_empty_folders(src_path.parent, stop_dir=dest_dir)
+    return moved, missing
+
+
+def build_catalog(
+    dest_dir: Path,
+    fast: bool = False,
+    device_profile: DeviceProfile = DeviceProfile.AUTO,
+    routing: RoutingTable | None = None,
+) -> int:
+    """Record every file already in the dated categories of the destination.
+
+    For destinations organized before they had a catalog, the dates of
+    every file are read once, following the date strategy of their
+    category. Returns the number of recorded files.
+    """
+    scheduler: IoScheduler = IoScheduler(dest_dir=dest_dir, device_profile=device_profile)
+    recorded: int = 0
+    dated_routes: dict[str, Route] = (routing or get_default_routing()).get_dated_routes()
+    with Catalog(dest_dir) as catalog:
+        for folder, route in dated_routes.items():
+            base_dir: Path = dest_dir / folder
+            if not base_dir.is_dir():
+                continue
+            dated_records = scheduler.read_dates(
+                walk_source(base_dir),
+                read_date=partial(route.read_date, fast=fast),
+                needs_date=lambda _: True,
+            )
+            for record, date in dated_records:
+                catalog.add(
+                    record.path, base_dir, date, route.get_date_source(date, fast)
+                )
+                recorded += 1
+    return recorded
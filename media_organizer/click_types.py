@@ -0,0 +1,87 @@
+"""Click parameter types and command group of the command line interface."""
+
+from pathlib import Path
+
+import click
+
+from media_organizer.budget import parse_duration
+from media_organizer.coordination import Shard
+from media_organizer.file_utils import parse_byte_size
+from media_organizer.routing import RoutingTable, load_routing
+
+
+class ByteSizeParamType(click.ParamType):
+    """Click parameter type accepting human readable sizes like 512M or 2G."""
+
+    name = "size"
+
+    def convert(self, value, param, ctx) -> int:
+        """Convert the given raw size into bytes."""
+        if isinstance(value, int):
+            return value
+        try:
+            return parse_byte_size(value)
+        except ValueError as error:
+            self.fail(str(error), param, ctx)
+
+
+class DurationParamType(click.ParamType):
+    """Click parameter type accepting durations like 90, 45m or 1.5h."""
+
+    name = "duration"
+
+    def convert(self, value, param, ctx) -> float:
+        """Convert the given raw duration into seconds."""
+        if isinstance(value, (int, float)):
+            return float(value)
+        try:
+            return parse_duration(value)
+        except ValueError as error:
+            self.fail(str(error), param, ctx)
+
+
+class ShardParamType(click.ParamType):
+    """Click parameter type accepting a shard given as i/N."""
+
+    name = "i/N"
+
+    def convert(self, value, param, ctx) -> Shard:
+        """Convert the given raw shard into a Shard."""
+        if isinstance(value, Shard):
+            return value
+        try:
+            return Shard.parse(value)
+        except ValueError as error:
+            self.fail(str(error), param, ctx)
+
+
+class DefaultCommandGroup(click.Group):
+    """Click group running its default command when no command is given.
+
+    Keeps ``media_organizer SOURCE_DIR [DEST_DIR]`` working next to
+    the other commands like ``media_organizer near-duplicates``.
+    """
+
+    default_command: str = "organize"
+
+    def parse_args(self, ctx: click.Context, args: list[str]) -> list[str]:
+        """Prepend the default command unless a command or --help is given."""
+        if not args or (
+            args[0] not in self.commands and args[0] not in ctx.help_option_names
+        ):
+            args = [self.default_command, *args]
+        return super().parse_args(ctx, args)
+
+
+def load_routing_option(
+    _ctx: click.Context, param: click.Parameter, value: str | None
+) -> RoutingTable:
+    """Click callback loading the routing config of the given path.
+
+    Without a path, the user's or the default routing config is loaded,
+    see `load_routing`.
+    """
+    try:
+        return load_routing(Path(value) if value else None)
+    except ValueError as error:
+        raise click.BadParameter(str(error), param=param) from error
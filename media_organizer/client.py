@@ -0,0 +1,55 @@
+"""Thin client sending commands to a running ``media_organizer serve``.
+
+Only imports the standard library, so it starts in tens of milliseconds.
+Takes the same arguments as ``media_organizer``. When no server is
+running, the command runs in this process like the standalone command.
+"""
+
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+
+from media_organizer import config
+
+
+def send_command(argv: list[str], socket_path: Path) -> int:
+    """Run the given command line on the server and return its exit code.
+
+    The output of the command is written to stdout while it runs.
+
+    Raises:
+        OSError: No server is running on the given socket.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(str(socket_path))
+        request: dict[str, object] = {"argv": argv, "cwd": os.getcwd()}
+        connection.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with connection.makefile("rb") as responses:
+            for line in responses:
+                response: dict[str, object] = json.loads(line)
+                if "exit_code" in response:
+                    return int(str(response["exit_code"]))
+                sys.stdout.write(str(response.get("output", "")))
+                sys.stdout.flush()
+    raise ConnectionError(f"The server on {socket_path} closed the connection.")
+
+
+def main() -> None:
+    """Entry point of the media_organizer_client command."""
+    argv: list[str] = sys.argv[1:]
+    try:
+        exit_code: int = send_command(argv, config.get_socket_path())
+    except (FileNotFoundError, ConnectionRefusedError):
+        # Imported here, starting without a server pays the full startup.
+        # pylint: disable-next=import-outside-toplevel
+        from media_organizer.media_organizer import main as standalone_main
+
+        standalone_main(args=argv, prog_name="media_organizer")  # pylint: disable=E1120
+        return
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
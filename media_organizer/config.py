@@ -3,9 +3,12 @@
 Configs like the name of the directories to store the files and more.
 """
 
+import os
 from pathlib import Path
 from typing import Final, Set
 
+from media_organizer.enums import DeviceProfile
+
 ARCHIVES_FOLDER_NAME: Final[str] = "archives"
 PHOTOS_FOLDER_NAME: Final[str] = "photos"
 VIDEOS_FOLDER_NAME: Final[str] = "videos"
@@ -16,59 +19,98 @@ DOCS_FOLDER_NAME: Final[str] = "docs"
 
 MEDIA_FOLDER_NAME: Final = "media"
 
-PHOTOS_SUPPORTED_EXTENSIONS: Set[str] = {
-    # Standard format
+STATE_FOLDER_NAME: Final[str] = ".media_organizer"
+"""Folder in the destination holding the organizer's own state."""
+LOCKS_FOLDER_NAME: Final[str] = "locks"
+
+ROUTING_FILE_NAME: Final[str] = "routing.toml"
+"""Routing config of the file categories, see `media_organizer.routing`.
+
+The default one ships with the package, the user's one lives in the
+config folder of the organizer.
+"""
+
+PERCEPTUAL_HASH_EXTENSIONS: Set[str] = {
     ".jpg",
-    # Unsorted
-    ".png",  # Limited date information
-    ".gif",  # Limited date information
-    # Raw image format
-    ".cr2",
-    ".dng",
-    ".arw",
-    ".nef",
+    ".jpeg",
+    ".png",
+    ".gif",
+    ".webp",
+    ".tif",
+    ".tiff",
 }
+"""Photo formats decoded to compute perceptual hashes, raw formats are not."""
 
+PERCEPTUAL_HASH_BATCH_SIZE: Final[int] = 64
+"""Number of photos hashed together by one worker process."""
 
-VIDEOS_SUPPORTED_EXTENSIONS: Set[str] = {
-    # Video format
-    ".mp4",
-    ".mov",
-}
+NEAR_DUPLICATE_RADIUS: Final[int] = 8
+"""Maximum number of differing bits between hashes of near duplicate photos."""
 
-AUDIO_SUPPORTED_EXTENSIONS: Set[str] = {
-    ".woff",
-    ".wav",
-    ".mp3",
-}
+NEAR_DUPLICATES_FOLDER_NAME: Final[str] = "near-duplicates"
 
+PARTIAL_HASH_SIZE: Final[int] = 64 * 1024
+"""Bytes read from both the head and the tail of a file for its partial hash."""
 
-TEXT_SUPPORTED_EXTENSIONS: Set[str] = {
-    # Normal text
-    ".txt",
-    # Data formats
-    ".xml",
-    ".csv",
-    ".svg",
-    # Script
-    ".py",
-    ".java",
-    ".sh",
-    ".dll",
-    ".h",
-    ".c",
-    ".f",  # Found javascript
-    # Templates
-    ".html",
-    # Darktable config file
-    # TODO: unittest .xmp configs alongside .jpg or raw file. See if they will follow.
-    ".xmp",
-}
+SAMPLE_HEAD_SIZE: Final[int] = 128 * 1024
+"""Bytes read from the head of a file before its date is read.
 
-ARCHIVE_SUPPORTED_EXTENSIONS: Set[str] = {
-    ".gz",
-    ".zip",
-}
+Holds the EXIF segment of JPEG photos, and small files whole. Never
+smaller than PARTIAL_HASH_SIZE, the partial hash comes from the same read.
+"""
+
+SAMPLE_CACHE_SIZE: Final[int] = 4096
+"""Number of partial hashes of recently read files kept, keyed by stat data."""
+
+FULL_HASH_CHUNK_SIZE: Final[int] = 1024 * 1024
+"""Bytes read at once while computing the full hash of a file."""
+
+HASH_DIGEST_SIZE: Final[int] = 32
+"""Digest size in bytes of the BLAKE2b hashes used to find duplicates."""
+
+DEDUPE_MIN_SIZE: Final[int] = 1
+"""Smaller files are never reported as duplicates, e.g. empty files."""
+
+DEDUPE_BATCH_FILES: Final[int] = 256
+"""Number of candidate files hashed together by the hashing pool."""
+
+HASH_CACHE_FILE_NAME: Final[str] = "hashes.sqlite"
+
+CATALOG_FILE_NAME: Final[str] = "catalog.sqlite"
+"""Catalog of the organized files, in the state folder of the destination."""
+
+CATALOG_COMMIT_INTERVAL: Final[int] = 500
+"""Number of catalog changes committed together."""
+
+SNAPSHOTS_FILE_NAME: Final[str] = "snapshots.sqlite"
+"""Snapshots of the source folders of incremental runs, in the state folder."""
+
+SNAPSHOT_FULL_SCAN_SECONDS: Final[float] = 24 * 3600
+"""Incremental runs list every source folder again once this old."""
+
+SNAPSHOT_SETTLE_SECONDS: Final[float] = 2.0
+"""Folders changed this recently are listed again by the next incremental run.
+
+Entries added within the same timestamp tick as the listing would not
+show on the modification time of the folder.
+"""
+
+DURABLE_BATCH_OPERATIONS: Final[int] = 256
+"""Number of durable moves whose folders are synced together."""
+
+DURABLE_BATCH_SECONDS: Final[float] = 2.0
+"""Seconds after which the folders of durable moves are synced.
+
+Bounds the moves a crash can undo, never lose, see
+`media_organizer.durability`.
+"""
+
+DATE_FOLDER_FORMAT: Final[str] = "%Y/%Y_%m_%d"
+"""Default strftime format of the date folders, relative to the category folder.
+
+Changed per destination with the relayout command, the format in use is
+stored in the destination's catalog.
+"""
 
 DARKTABLE_EXT_FORMAT: Final[str] = ".xmp"
 """Config files for image editing.
@@ -84,7 +126,104 @@ it have been edit.
 The trick is to move the config file with the image it belongs.
 """
 
+DEFAULT_EXCLUDES: Final[tuple[str, ...]] = (
+    ".git",
+    "node_modules",
+    "@eaDir",
+    "*.lrdata",
+    STATE_FOLDER_NAME,
+)
+"""Folders never walked in the source unless asked for.
+
+Version control and dependency trees, Synology thumbnails and Lightroom
+previews hold no media worth organizing, or only copies of it.
+"""
+
+DEVICE_CONCURRENCY: Final[dict[DeviceProfile, int]] = {
+    DeviceProfile.SSD: 8,
+    DeviceProfile.HDD: 1,
+}
+"""Number of concurrent header reads allowed per device profile."""
+
+IO_SCHEDULE_WINDOW: Final[int] = 512
+"""Number of walked files that are grouped by device and ordered together.
+
+Keeps memory bounded while still giving rotational devices a batch
+of reads large enough to be ordered by their location on the disk.
+"""
+
+FILE_RECORD_SIZE: Final[int] = 256
+"""Estimated memory in bytes taken by one walked file record."""
+
+DEFAULT_MAX_MEMORY: Final[int] = 512 * 1024**2
+"""Default memory budget in bytes for large intermediate state."""
+
+SYS_DEV_BLOCK_DIR: Final[Path] = Path("/sys/dev/block")
+"""Sysfs directory mapping <major>:<minor> device numbers to block devices."""
+
+WATCH_SETTLE_SECONDS: Final[float] = 5.0
+"""Seconds a watched file must see no new event before it is organized."""
+
+WATCH_SIDECAR_WAIT_SECONDS: Final[float] = 30.0
+"""Seconds a watched sidecar waits for its photo before it is organized alone."""
+
+WATCH_BATCH_SIZE: Final[int] = 32
+"""Maximum number of settled file groups organized together by the watch command."""
+
+DATE_PARSE_CACHE_SIZE: Final[int] = 4096
+"""Number of parsed raw dates kept, files of a burst share their dates."""
+
+ARCHIVE_WORKERS: Final[int] = 4
+"""Number of archives expanded at once."""
+
+ARCHIVE_HEAD_SIZE: Final[int] = 64 * 1024
+"""Bytes of every archive member read before its destination is chosen.
+
+JPEG and TIFF based photos keep their EXIF data at the start.
+"""
+
+ARCHIVE_COPY_CHUNK_SIZE: Final[int] = 1024 * 1024
+"""Bytes of an archive member copied to the destination at once."""
+
+PROGRESS_REFRESH_SECONDS: Final[float] = 0.5
+"""Seconds between redraws of the progress line on a terminal."""
+
+PROGRESS_LOG_INTERVAL_SECONDS: Final[float] = 30.0
+"""Seconds between progress log lines when the output is not a terminal."""
+
+PROGRESS_RATE_SMOOTHING: Final[float] = 0.3
+"""Weight of the latest measure in the smoothed throughputs, between 0 and 1."""
+
+EXIFTOOL_WORKERS: Final[int] = 2
+"""Number of exiftool processes kept running by the server."""
+
+SOCKET_PATH_ENV: Final[str] = "MEDIA_ORGANIZER_SOCKET"
+"""Environment variable overriding the socket of the server."""
+
 
 def get_default_destinition() -> Path:
     """Return the default folder for the media file destination."""
     return Path.home() / MEDIA_FOLDER_NAME
+
+
+def get_default_cache_dir() -> Path:
+    """Return the folder for the organizer's caches, following XDG."""
+    cache_home: str = os.environ.get("XDG_CACHE_HOME", "") or str(Path.home() / ".cache")
+    return Path(cache_home) / "media_organizer"
+
+
+def get_user_routing_path() -> Path:
+    """Return the user's routing config, following XDG."""
+    config_home: str = os.environ.get("XDG_CONFIG_HOME", "") or str(
+        Path.home() / ".config"
+    )
+    return Path(config_home) / "media_organizer" / ROUTING_FILE_NAME
+
+
+def get_socket_path() -> Path:
+    """Return the Unix socket the server listens on and the client connects to."""
+    if socket_path := os.environ.get(SOCKET_PATH_ENV):
+        return Path(socket_path)
+    if runtime_dir := os.environ.get("XDG_RUNTIME_DIR"):
+        return Path(runtime_dir) / "media_organizer.sock"
+    return Path(f"/tmp/media_organizer-{os.getuid()}.sock")
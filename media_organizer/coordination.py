@@ -0,0 +1,182 @@
+"""Coordinate several organizer runs sharing one destination.
+
+A giant source can be split into shards, each organized by its own
+process or host against the same destination. Shards never share a
+source file and moves into the same destination folder are serialized
+by short lived lock files, so no run silently overwrites another one.
+"""
+
+import fcntl
+import hashlib
+import os
+import threading
+import zlib
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from media_organizer import config
+from media_organizer.enums import ShardStrategy
+from media_organizer.walker import FileRecord
+
+
+@dataclass(frozen=True)
+class Shard:
+    """One of ``count`` disjoint parts of a source directory."""
+
+    index: int
+    count: int
+
+    @classmethod
+    def parse(cls, raw_shard: str) -> "Shard":
+        """Parse shard given as "i/N", where i is zero based.
+
+        Raises:
+            ValueError: The given shard is not valid.
+        """
+        raw_index, _, raw_count = raw_shard.partition("/")
+        try:
+            shard: Shard = cls(index=int(raw_index), count=int(raw_count))
+        except ValueError as error:
+            raise ValueError(f"{raw_shard!r} is not a valid shard, use i/N.") from error
+        if shard.count < 1 or not 0 <= shard.index < shard.count:
+            raise ValueError(f"{raw_shard!r} is not a valid shard, use 0 <= i < N.")
+        return shard
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+
+def get_shard_key(
+    record: FileRecord, source_dir: Path, strategy: ShardStrategy = ShardStrategy.PATH
+) -> str:
+    """Return the key deciding which shard the given file belongs to.
+
+    Every suffix is stripped from the file name, so a photo and its
+    sidecar files, e.g. IMG01.ARW, IMG01.xmp and IMG01.ARW.xmp, always
+    land in the same shard.
+    """
+    relative_parent: str = os.path.relpath(record.parent, source_dir)
+    if strategy == ShardStrategy.SUBTREE and relative_parent != os.curdir:
+        return relative_parent.split(os.sep, 1)[0]
+    base_name: str = record.name.split(".", 1)[0]
+    return os.path.join(relative_parent, base_name)
+
+
+def is_in_shard(
+    record: FileRecord,
+    source_dir: Path,
+    shard: Shard,
+    strategy: ShardStrategy = ShardStrategy.PATH,
+) -> bool:
+    """Return True if the given file belongs to the given shard.
+
+    Uses a stable hash, the same file lands in the same shard across
+    processes, hosts and python versions.
+    """
+    key: str = get_shard_key(record, source_dir, strategy)
+    return zlib.crc32(os.fsencode(key)) % shard.count == shard.index
+
+
+class DestinationLocks:
+    """Lock files serializing moves into the same destination folder.
+
+    Lock files live in ``<destination>/.media_organizer/locks`` and not
+    in the date folders, so the organized library stays clean. They only
+    exist while held, see `lock`. POSIX record locks are used since they
+    also work on NFS mounts. They belong to the whole process, threads of
+    the same process are serialized by a thread lock per lock file.
+    """
+
+    def __init__(self, dest_dir: Path) -> None:
+        self.dest_dir: Path = dest_dir
+        self.locks_dir: Path = (
+            dest_dir / config.STATE_FOLDER_NAME / config.LOCKS_FOLDER_NAME
+        )
+
+    def get_lock_path(self, folder: Path) -> Path:
+        """Return the lock file of the given destination folder.
+
+        The lock is named after the folder relative to the destination,
+        hosts mounting the destination on different paths share it.
+        """
+        key: Path = (
+            folder.relative_to(self.dest_dir)
+            if folder.is_relative_to(self.dest_dir)
+            else folder.resolve()
+        )
+        digest: str = hashlib.sha1(os.fsencode(key), usedforsecurity=False).hexdigest()
+        return self.locks_dir / f"{digest}.lock"
+
+    @contextmanager
+    def lock(self, folder: Path) -> Iterator[None]:
+        """Hold an exclusive lock of the given destination folder.
+
+        Keep the hold time short, only check for duplicates and claim the
+        destination filename while holding it.
+
+        The lock file is removed by its holder before releasing it, so
+        lock files never pile up. A run which waited on a removed lock
+        file finds it replaced, or gone, and locks the new one instead.
+        """
+        self.locks_dir.mkdir(parents=True, exist_ok=True)
+        lock_path: Path = self.get_lock_path(folder)
+        with hold_thread_lock(lock_path):
+            while True:
+                fd: int = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.lockf(fd, fcntl.LOCK_EX)
+                except BaseException:
+                    os.close(fd)
+                    raise
+                if is_same_file(fd, lock_path):
+                    break
+                # Removed by its previous holder while waiting for the lock.
+                os.close(fd)
+            try:
+                yield
+            finally:
+                # Removed while still held, nobody can lock the removed file after.
+                lock_path.unlink(missing_ok=True)
+                # Closing the file descriptor releases the lock.
+                os.close(fd)
+
+
+_thread_locks: dict[Path, threading.Lock] = {}
+_thread_lock_users: Counter[Path] = Counter()
+_thread_locks_guard: threading.Lock = threading.Lock()
+
+
+@contextmanager
+def hold_thread_lock(lock_path: Path) -> Iterator[None]:
+    """Hold the lock of the given lock file among the threads of this process.
+
+    A POSIX record lock never blocks another thread of its process, and
+    closing any descriptor of the file releases it. Only one thread of
+    the process may thus use a lock file at once.
+    """
+    key: Path = lock_path.absolute()
+    with _thread_locks_guard:
+        thread_lock: threading.Lock = _thread_locks.setdefault(key, threading.Lock())
+        _thread_lock_users[key] += 1
+    try:
+        with thread_lock:
+            yield
+    finally:
+        with _thread_locks_guard:
+            _thread_lock_users[key] -= 1
+            if not _thread_lock_users[key]:
+                del _thread_lock_users[key]
+                del _thread_locks[key]
+
+
+def is_same_file(fd: int, path: Path) -> bool:
+    """Return True if the given open file is still the file at the given path."""
+    try:
+        path_stat: os.stat_result = path.stat()
+    except FileNotFoundError:
+        return False
+    fd_stat: os.stat_result = os.fstat(fd)
+    return (fd_stat.st_dev, fd_stat.st_ino) == (path_stat.st_dev, path_stat.st_ino)
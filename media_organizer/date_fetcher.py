@@ -1,63 +1,57 @@
 """Methods to extract creation date from files."""
 
+import struct
 import subprocess
 from datetime import datetime
 from pathlib import Path
 from typing import Final
 
-import piexif  # type: ignore
+from media_organizer.date_parser import clean_raw_date, parse_exif_date
+from media_organizer.enums import FileKind
+from media_organizer.exiftool import ExifToolPool, get_active_pool
+from media_organizer.file_sample import EXIF_KINDS, FileSample, sniff_kind
 
 DARKTABLE_EXT_FORMAT: Final[str] = ".xmp"
 
-COMMON_DATE_FORMATS: set[str] = {
-    "%Y:%m:%d %H:%M:%S",
-    "%Y:%m:%d %H:%M:%SZ",
-    "%Y:%m:%d %H:%M:%S%z",
-}
-"""Common date formats found in files metadata.
 
-These formats with ":" seperator for year, month and day is unusual and
-therefore the dateutil.parser.parse method cannot process dates in such format.
-See stackoverflow discussion: https://stackoverflow.com/q/73104677
-"""
+def parse_raw_date(raw_date: str, sub_sec: str = "", offset: str = "") -> datetime | None:
+    """Parse the given raw date into datetime object.
 
-
-def try_parse_date(raw_date: str, date_format: str) -> datetime | None:
-    """Parse the given raw date string using given date format."""
-    try:
-        return datetime.strptime(raw_date, date_format)
-    except ValueError:
-        return None
-
-
-def parse_raw_date(raw_date: str) -> datetime | None:
-    """Parse the given raw date into datetime object."""
-    parsed_date: datetime | None
-    for common_date_format in COMMON_DATE_FORMATS:
-        parsed_date = try_parse_date(raw_date=raw_date, date_format=common_date_format)
-        if parsed_date:
-            return parsed_date
-    return None
+    See `media_organizer.date_parser.DateParser.parse` for the arguments.
+    """
+    return parse_exif_date(raw_date, sub_sec=sub_sec, offset=offset)
 
 
 def extract_creation_date(media_path: Path) -> datetime | None:
     """
     Extract the creation date from media using exiftool.
 
+    Uses the active pool of long running exiftool processes if any,
+    see `media_organizer.exiftool`, otherwise starts exiftool.
+
     Parameters:
     - media_path (str): Path to the media file.
 
     Returns:
     - datetime: Datetime object representing the creation date of the media.
     """
-    cmd: list[str] = ["exiftool", "-CreateDate", "-s3", str(media_path)]
+    args: list[str] = ["-CreateDate", "-s3", str(media_path)]
 
-    result: subprocess.CompletedProcess = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True
-    )
-    raw_date: str = result.stdout.strip()
+    raw_date: str
+    exiftool_pool: ExifToolPool | None = get_active_pool()
+    if exiftool_pool and "\n" not in str(media_path):
+        raw_date = exiftool_pool.execute(*args).strip()
+    else:
+        result: subprocess.CompletedProcess = subprocess.run(
+            ["exiftool", *args],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=True,
+        )
+        raw_date = result.stdout.strip()
 
-    if raw_date == "":
+    if clean_raw_date(raw_date) == "":
         return None
 
     parsed_date: datetime | None = parse_raw_date(raw_date=raw_date)
@@ -92,39 +86,114 @@ def get_accurate_img_date(img_path: Path) -> datetime | None:
     Returns:
         datetime: Exif creation date or None if loading exif fails.
     """
+    return get_sample_exif_date(FileSample.read(img_path))
+
+
+def get_sample_exif_date(sample: FileSample) -> datetime | None:
+    """
+    Get the creation date in the EXIF metadata of a sampled file.
+
+    The EXIF data of JPEG photos, and of files read whole, is read from
+    the sample. Other TIFF or WEBP files, and files of unknown format,
+    are read again by piexif. Formats piexif cannot read are skipped.
+
+    Args:
+        sample: The head and tail of the file.
+
+    Returns:
+        datetime: Exif creation date or None if loading exif fails.
+    """
+    kind: FileKind = sample.kind
+    label: str = str(sample.path)
+    if kind == FileKind.JPEG:
+        return get_exif_date(sample.head, label)
+    if kind in EXIF_KINDS and (content := sample.content) is not None:
+        return get_exif_date(content, label)
+    if kind in EXIF_KINDS or kind == FileKind.UNKNOWN:
+        return get_exif_date(label, label)
+    return None
+
+
+def get_exif_date(image: str | bytes, label: str) -> datetime | None:
+    """
+    Get the creation date in the EXIF metadata of an image file or image bytes.
+
+    Args:
+        image: The path to the image, or its bytes. The bytes may be the
+            head of a JPEG or TIFF based image, which keep their EXIF
+            metadata at the start. Bytes of other formats are skipped.
+        label: Names the image in messages.
+
+    Returns:
+        datetime: Exif creation date or None if loading exif fails.
+    """
+    if isinstance(image, bytes) and sniff_kind(image) not in EXIF_KINDS:
+        # piexif reads bytes of other formats as a file name.
+        return None
+
+    # Imported here, so commands not reading EXIF data start faster.
+    import piexif  # type: ignore  # pylint: disable=import-outside-toplevel
+
     try:
-        exif_data = piexif.load(str(img_path))
+        exif_data = piexif.load(image)
     except (
         piexif._exceptions.InvalidImageDataError,  # pylint: disable=W0212
         ValueError,
+        # Raised for EXIF data cut off at the end of an image head.
+        struct.error,
+        IndexError,
     ) as error:
         print(
-            f"[ VERBOSE ]: piexif unable to read EXIF data from {img_path}, "
+            f"[ VERBOSE ]: piexif unable to read EXIF data from {label}, "
             f"error: {error}"
         )
         return None
 
-    datetime_keys = [
-        piexif.ExifIFD.DateTimeOriginal,
-        piexif.ExifIFD.DateTimeDigitized,
-        piexif.ImageIFD.DateTime,
+    # Each date tag with its sub second and UTC offset tags.
+    datetime_keys: list[tuple[str, int, int, int]] = [
+        (
+            "Exif",
+            piexif.ExifIFD.DateTimeOriginal,
+            piexif.ExifIFD.SubSecTimeOriginal,
+            piexif.ExifIFD.OffsetTimeOriginal,
+        ),
+        (
+            "Exif",
+            piexif.ExifIFD.DateTimeDigitized,
+            piexif.ExifIFD.SubSecTimeDigitized,
+            piexif.ExifIFD.OffsetTimeDigitized,
+        ),
+        (
+            "0th",
+            piexif.ImageIFD.DateTime,
+            piexif.ExifIFD.SubSecTime,
+            piexif.ExifIFD.OffsetTime,
+        ),
     ]
 
-    img_datetime = None
-    for key in datetime_keys:
-        if key in exif_data["Exif"] and exif_data["Exif"][key]:
-            img_datetime = exif_data["Exif"][key].decode("utf-8")
-            break
+    exif_ifd: dict = exif_data.get("Exif", {})
+    for ifd_name, date_key, sub_sec_key, offset_key in datetime_keys:
+        img_datetime: str = decode_exif_text(exif_data.get(ifd_name, {}).get(date_key))
+        if not clean_raw_date(img_datetime):
+            continue
 
-    if not img_datetime:
-        return None
+        parsed_date: datetime | None = parse_raw_date(
+            raw_date=img_datetime,
+            sub_sec=decode_exif_text(exif_ifd.get(sub_sec_key)),
+            offset=decode_exif_text(exif_ifd.get(offset_key)),
+        )
+        if not parsed_date:
+            print(f"[ WARNING ] Could not parse {img_datetime} date from {label}")
+        return parsed_date
 
-    parsed_date: datetime | None = parse_raw_date(raw_date=img_datetime)
+    return None
 
-    if not parsed_date:
-        print(f"[ WARNING ] Could not parse {img_datetime} date from {img_path}")
 
-    return parsed_date
+def decode_exif_text(value: bytes | str | None) -> str:
+    """Return the given EXIF text value as string, empty if missing."""
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return value or ""
 
 
 def get_accurate_media_date(media_path: Path) -> datetime | None:
@@ -0,0 +1,165 @@
+"""Parse the dates found in EXIF data and exiftool output.
+
+Almost every camera writes ``YYYY:MM:DD HH:MM:SS``, which is sliced at
+fixed positions into the ISO form read by the C implemented
+``datetime.fromisoformat`` instead of going through ``strptime``. Other
+forms fall back to ``COMMON_DATE_FORMATS``, starting with the format
+which matched last, since a library usually comes from a few devices.
+"""
+
+from datetime import datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import Final
+
+from media_organizer import config
+
+COMMON_DATE_FORMATS: Final[tuple[str, ...]] = (
+    "%Y:%m:%d %H:%M:%S",
+    "%Y:%m:%d %H:%M:%SZ",
+    "%Y:%m:%d %H:%M:%S%z",
+    "%Y:%m:%d %H:%M:%S.%f",
+    "%Y:%m:%d %H:%M:%S.%f%z",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S%z",
+)
+"""Common date formats found in files metadata.
+
+These formats with ":" seperator for year, month and day is unusual and
+therefore the dateutil.parser.parse method cannot process dates in such format.
+See stackoverflow discussion: https://stackoverflow.com/q/73104677
+"""
+
+PLACEHOLDER_DATE_CHARS: Final[str] = "0: "
+"""Characters of the placeholder dates written by cameras without a clock.
+
+E.g. ``0000:00:00 00:00:00`` or the blank ``    :  :     :  :  ``.
+"""
+
+
+def clean_raw_date(raw_date: str) -> str:
+    """Return the given raw date without padding, empty if it is a placeholder.
+
+    Fixed size EXIF fields are padded with NUL characters, anything after
+    the first NUL is garbage.
+    """
+    if "\x00" in raw_date:
+        raw_date = raw_date.split("\x00", 1)[0]
+    cleaned: str = raw_date.strip()
+    if not cleaned.strip(PLACEHOLDER_DATE_CHARS):
+        return ""
+    return cleaned
+
+
+def parse_offset(raw_offset: str) -> tzinfo | None:
+    """Parse an offset like ``+02:00``, ``-0530`` or ``Z``, None if invalid."""
+    if raw_offset == "Z":
+        return timezone.utc
+    digits: str = raw_offset[1:].replace(":", "")
+    if raw_offset[:1] not in ("+", "-") or len(digits) != 4 or not digits.isdigit():
+        return None
+    hours, minutes = int(digits[:2]), int(digits[2:])
+    if hours > 23 or minutes > 59:
+        return None
+    offset: timedelta = timedelta(hours=hours, minutes=minutes)
+    return timezone(-offset if raw_offset[0] == "-" else offset)
+
+
+def parse_sub_sec(raw_sub_sec: str) -> int | None:
+    """Return the microseconds of a sub second field like ``123``, None if invalid."""
+    digits: str = clean_raw_date(raw_sub_sec) or "0"
+    if not digits.isdigit():
+        return None
+    return int(digits[:6].ljust(6, "0"))
+
+
+def slice_date(raw_date: str) -> datetime | None:
+    """Parse ``YYYY:MM:DD HH:MM:SS`` followed by optional fractions and offset.
+
+    Returns None if the given date is not in that form.
+    """
+    if (
+        len(raw_date) < 19
+        or raw_date[10] != " "
+        or raw_date[4] + raw_date[7] + raw_date[13] + raw_date[16] != "::::"
+    ):
+        return None
+    try:
+        return datetime.fromisoformat(f"{raw_date[:4]}-{raw_date[5:7]}-{raw_date[8:]}")
+    except ValueError:
+        return None
+
+
+class DateParser:
+    """Parse raw dates, trying the last matching fallback format first.
+
+    Only a reference to the last format is shared, so the parser can be
+    used from several threads without locking.
+    """
+
+    def __init__(self, date_formats: tuple[str, ...] = COMMON_DATE_FORMATS) -> None:
+        self.date_formats: tuple[str, ...] = date_formats
+        self.last_format: str = date_formats[0]
+
+    def parse_with_formats(self, raw_date: str) -> datetime | None:
+        """Parse the given date with the fallback formats."""
+        last_format: str = self.last_format
+        other_formats = (fmt for fmt in self.date_formats if fmt != last_format)
+        for date_format in (last_format, *other_formats):
+            try:
+                parsed_date: datetime = datetime.strptime(raw_date, date_format)
+            except ValueError:
+                continue
+            if date_format != last_format:
+                self.last_format = date_format
+            return parsed_date
+        return None
+
+    def parse(
+        self, raw_date: str, sub_sec: str = "", offset: str = ""
+    ) -> datetime | None:
+        """Parse the given raw date into a datetime object.
+
+        Args:
+            raw_date: Date like ``2023:05:20 15:45:50``.
+            sub_sec: Fractions of the second, e.g. EXIF SubSecTimeOriginal.
+            offset: Offset from UTC, e.g. EXIF OffsetTimeOriginal. Ignored if
+                the raw date has its own offset.
+
+        Returns:
+            The parsed date, None for placeholders and unknown formats.
+        """
+        cleaned: str = clean_raw_date(raw_date)
+        if not cleaned:
+            return None
+        parsed_date: datetime | None = slice_date(cleaned) or self.parse_with_formats(
+            cleaned
+        )
+        if parsed_date is None:
+            return None
+
+        if sub_sec and not parsed_date.microsecond:
+            microsecond: int | None = parse_sub_sec(sub_sec)
+            if microsecond:
+                parsed_date = parsed_date.replace(microsecond=microsecond)
+        cleaned_offset: str = clean_raw_date(offset) if offset else ""
+        if cleaned_offset and parsed_date.tzinfo is None:
+            offset_tz: tzinfo | None = parse_offset(cleaned_offset)
+            if offset_tz:
+                parsed_date = parsed_date.replace(tzinfo=offset_tz)
+        return parsed_date
+
+
+_DEFAULT_PARSER: Final[DateParser] = DateParser()
+
+
+@lru_cache(maxsize=config.DATE_PARSE_CACHE_SIZE)
+def parse_exif_date(
+    raw_date: str, sub_sec: str = "", offset: str = ""
+) -> datetime | None:
+    """Parse the given raw date, see `DateParser.parse`.
+
+    Files of a burst or an import share their dates, repeated raw dates
+    are answered from a cache.
+    """
+    return _DEFAULT_PARSER.parse(raw_date, sub_sec=sub_sec, offset=offset)
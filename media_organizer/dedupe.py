@@ -0,0 +1,358 @@
+"""Find identical files across the whole collection.
+
+Files are narrowed down by a funnel, each step only runs on the files
+left by the previous one:
+
+1. Group by size, taken from the stat data of the walk.
+2. Group by a partial hash of the head and tail of each file.
+3. Group by a full streaming hash of the remaining candidates.
+
+Hashes are computed in a thread pool and cached per stat signature, so
+later runs only hash new or changed files.
+"""
+
+import hashlib
+import os
+import sqlite3
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from pathlib import Path
+
+from media_organizer import config
+from media_organizer.enums import DedupeAction, OnDuplicate
+from media_organizer.file_sample import FileSample, is_partial_hash_full
+from media_organizer.file_utils import move_file
+from media_organizer.spill import get_max_items, sorted_spill
+from media_organizer.walker import FileRecord, walk_source
+
+
+def partial_hash(file_path: Path) -> str:
+    """Return the hash of the head and the tail of the given file."""
+    return FileSample.read(file_path, head_size=config.PARTIAL_HASH_SIZE).partial_hash
+
+
+def full_hash(file_path: Path) -> str:
+    """Return the hash of the whole content of the given file."""
+    digest = hashlib.blake2b(digest_size=config.HASH_DIGEST_SIZE)
+    with open(file_path, "rb") as file:
+        while chunk := file.read(config.FULL_HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class HashCache:
+    """Cache of file hashes keyed by the stat signature of the files.
+
+    A cached hash is only used while the device, inode, size and
+    modification time of the file are unchanged.
+    """
+
+    def __init__(self, cache_path: Path) -> None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection: sqlite3.Connection = sqlite3.connect(cache_path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            "dev INTEGER, ino INTEGER, size INTEGER, mtime REAL, "
+            "partial TEXT, full TEXT, PRIMARY KEY (dev, ino))"
+        )
+
+    def get(self, record: FileRecord) -> tuple[str | None, str | None]:
+        """Return the cached partial and full hash of the given file."""
+        row = self.connection.execute(
+            "SELECT partial, full FROM hashes "
+            "WHERE dev = ? AND ino = ? AND size = ? AND mtime = ?",
+            (record.dev, record.ino, record.size, record.mtime),
+        ).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def put(self, record: FileRecord, partial: str, full: str | None) -> None:
+        """Store the hashes of the given file."""
+        self.connection.execute(
+            "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)",
+            (record.dev, record.ino, record.size, record.mtime, partial, full),
+        )
+
+    def commit(self) -> None:
+        """Persist the stored hashes."""
+        self.connection.commit()
+
+    def close(self) -> None:
+        """Persist the stored hashes and close the cache."""
+        self.connection.commit()
+        self.connection.close()
+
+
+def iter_size_groups(
+    records: Iterable[FileRecord], max_memory: int = config.DEFAULT_MAX_MEMORY
+) -> Iterator[list[FileRecord]]:
+    """Yield groups of at least two distinct files sharing the same size.
+
+    Records are sorted by size within the memory budget, spilling to
+    disk when needed. Hard links of the same inode count as one file,
+    they do not take any extra space.
+    """
+    sorted_records: Iterator[FileRecord] = sorted_spill(
+        (record for record in records if record.size >= config.DEDUPE_MIN_SIZE),
+        key=lambda record: record.size,
+        max_items=get_max_items(max_memory),
+    )
+    for _, same_size in groupby(sorted_records, key=lambda record: record.size):
+        inodes: dict[tuple[int, int], FileRecord] = {}
+        for record in same_size:
+            inodes.setdefault((record.dev, record.ino), record)
+        if len(inodes) > 1:
+            yield list(inodes.values())
+
+
+def _batched_groups(
+    groups: Iterator[list[FileRecord]], batch_files: int
+) -> Iterator[list[list[FileRecord]]]:
+    """Batch small groups together, so the hashing pool has enough work."""
+    batch: list[list[FileRecord]] = []
+    files: int = 0
+    for group in groups:
+        batch.append(group)
+        files += len(group)
+        if files >= batch_files:
+            yield batch
+            batch, files = [], 0
+    if batch:
+        yield batch
+
+
+def _regroup(
+    groups: list[list[FileRecord]], hashes: dict[FileRecord, str | None]
+) -> list[list[FileRecord]]:
+    """Split the given groups by hash, keeping groups of at least two files."""
+    regrouped: list[list[FileRecord]] = []
+    for group in groups:
+        by_hash: dict[str, list[FileRecord]] = {}
+        for record in group:
+            if (hash_value := hashes.get(record)) is not None:
+                by_hash.setdefault(hash_value, []).append(record)
+        regrouped.extend(same for same in by_hash.values() if len(same) > 1)
+    return regrouped
+
+
+def _hash_partial(record: FileRecord) -> str | None:
+    """Return the partial hash of the given file, None if it cannot be read."""
+    try:
+        return partial_hash(record.path)
+    except OSError as error:
+        print(f"[ WARNING ] cannot hash {record.path}, error: {error}")
+        return None
+
+
+def _hash_full(record: FileRecord) -> str | None:
+    """Return the full hash of the given file, None if it cannot be read."""
+    try:
+        return full_hash(record.path)
+    except OSError as error:
+        print(f"[ WARNING ] cannot hash {record.path}, error: {error}")
+        return None
+
+
+class _Hashes:  # pylint: disable=too-few-public-methods
+    """Partial and full hashes of a batch of candidates."""
+
+    def __init__(self, records: list[FileRecord], cache: HashCache | None) -> None:
+        self.partials: dict[FileRecord, str | None] = {}
+        self.fulls: dict[FileRecord, str | None] = {}
+        for record in records:
+            partial, full = cache.get(record) if cache else (None, None)
+            if partial is not None:
+                self.partials[record] = partial
+            if full is not None:
+                self.fulls[record] = full
+
+
+def _compute_hashes(
+    records: list[FileRecord],
+    hash_method: Callable[[FileRecord], str | None],
+    hashes: dict[FileRecord, str | None],
+    executor: ThreadPoolExecutor,
+) -> list[FileRecord]:
+    """Hash the given files missing in the given hashes, return the hashed files."""
+    to_hash: list[FileRecord] = [record for record in records if record not in hashes]
+    hashes.update(zip(to_hash, executor.map(hash_method, to_hash)))
+    return to_hash
+
+
+def find_duplicates(
+    records: Iterable[FileRecord],
+    workers: int | None = None,
+    cache: HashCache | None = None,
+    max_memory: int = config.DEFAULT_MAX_MEMORY,
+) -> Iterator[list[FileRecord]]:
+    """Yield groups of files with identical content.
+
+    Args:
+        records: Files to compare with each other.
+        workers: Number of hashing threads, defaults to the number of CPUs.
+        cache: Cache of hashes computed by earlier runs.
+        max_memory: Memory budget for grouping the files by size.
+
+    Yields:
+        Groups of at least two files with identical content.
+    """
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        for size_groups in _batched_groups(
+            iter_size_groups(records, max_memory), config.DEDUPE_BATCH_FILES
+        ):
+            candidates: list[FileRecord] = [
+                record for group in size_groups for record in group
+            ]
+            hashes: _Hashes = _Hashes(candidates, cache)
+            hashed: list[FileRecord] = _compute_hashes(
+                candidates, _hash_partial, hashes.partials, executor
+            )
+
+            partial_groups: list[list[FileRecord]] = _regroup(
+                size_groups, hashes.partials
+            )
+            full_candidates: list[FileRecord] = []
+            for record in (record for group in partial_groups for record in group):
+                if is_partial_hash_full(record.size):
+                    hashes.fulls[record] = hashes.partials[record]
+                else:
+                    full_candidates.append(record)
+            hashed += _compute_hashes(full_candidates, _hash_full, hashes.fulls, executor)
+
+            if cache:
+                for record in hashed:
+                    if partial := hashes.partials.get(record):
+                        cache.put(record, partial, hashes.fulls.get(record))
+                cache.commit()
+            yield from _regroup(partial_groups, hashes.fulls)
+
+
+def iter_roots(roots: list[Path]) -> Iterator[FileRecord]:
+    """Walk the given folders, skipping the organizer's own state folder."""
+    for root in roots:
+        for record in walk_source(root):
+            if config.STATE_FOLDER_NAME not in Path(record.parent).parts:
+                yield record
+
+
+def pick_original(group: list[FileRecord], roots: list[Path]) -> FileRecord:
+    """Return the file of the group to keep.
+
+    Files in folders given first are preferred, e.g. the organized
+    library over a new source. Then the shortest name wins, which keeps
+    IMG_0001.JPG over copies like IMG_0001 (1).JPG.
+    """
+
+    def root_index(record: FileRecord) -> int:
+        for index, root in enumerate(roots):
+            if record.path.is_relative_to(root):
+                return index
+        return len(roots)
+
+    return min(
+        group, key=lambda record: (root_index(record), len(record.name), str(record.path))
+    )
+
+
+def is_unchanged(record: FileRecord) -> bool:
+    """Return True if the file still has the size and mtime it was hashed with."""
+    try:
+        file_stat: os.stat_result = record.path.stat()
+    except OSError:
+        return False
+    return (file_stat.st_size, file_stat.st_mtime) == (record.size, record.mtime)
+
+
+def hardlink_file(original: Path, duplicate: Path) -> None:
+    """Atomically replace the given duplicate by a hard link to the original."""
+    tmp_path: Path = duplicate.with_name(f".{duplicate.name}.media_organizer.tmp")
+    os.link(original, tmp_path)
+    try:
+        os.replace(tmp_path, duplicate)
+    except OSError:
+        tmp_path.unlink()
+        raise
+
+
+def apply_action(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    original: FileRecord,
+    duplicate: FileRecord,
+    action: DedupeAction,
+    roots: list[Path],
+    trash_dir: Path | None = None,
+    dry_run: bool = True,
+) -> None:
+    """Apply the given action to a duplicate of the given original file."""
+    if action == DedupeAction.REPORT:
+        return
+    if not dry_run and not (is_unchanged(original) and is_unchanged(duplicate)):
+        print(f"[ WARNING ] {duplicate.path} changed since hashing, skip {action}")
+        return
+
+    match action:
+        case DedupeAction.DELETE:
+            print(f"rm {duplicate.path}")
+            if not dry_run:
+                duplicate.path.unlink()
+        case DedupeAction.HARDLINK:
+            if original.dev != duplicate.dev:
+                print(f"[ SKIP ] {duplicate.path} is on another device than the original")
+                return
+            print(f"ln -f {original.path} {duplicate.path}")
+            if not dry_run:
+                hardlink_file(original.path, duplicate.path)
+        case DedupeAction.TRASH:
+            if trash_dir is None:
+                raise ValueError(f"{action=} requires a trash folder.")
+            relative_path: Path = next(
+                (
+                    duplicate.path.relative_to(root)
+                    for root in roots
+                    if duplicate.path.is_relative_to(root)
+                ),
+                Path(duplicate.name),
+            )
+            move_file(
+                src_filepath=duplicate.path,
+                dst_filepath=trash_dir / relative_path,
+                dry_run=dry_run,
+                on_duplicate=OnDuplicate.CREATE_UNIQ_FILENAME,
+            )
+        case _:
+            raise ValueError(f"{action=} did not match any configured value.")
+
+
+def dedupe(  # pylint: disable=too-many-arguments
+    roots: list[Path],
+    action: DedupeAction = DedupeAction.REPORT,
+    trash_dir: Path | None = None,
+    dry_run: bool = True,
+    *,
+    workers: int | None = None,
+    cache: HashCache | None = None,
+    max_memory: int = config.DEFAULT_MAX_MEMORY,
+) -> None:
+    """Report identical files in the given folders and act on the duplicates.
+
+    Args:
+        roots: Folders to search, files in folders given first are kept.
+        action: What to do with every copy but the kept file.
+        trash_dir: Folder duplicates are moved to by the trash action.
+        dry_run: Only print the actions that would be taken.
+        workers: Number of hashing threads.
+        cache: Cache of hashes computed by earlier runs.
+        max_memory: Memory budget for grouping the files by size.
+    """
+    wasted_bytes: int = 0
+    for group in find_duplicates(
+        iter_roots(roots), workers=workers, cache=cache, max_memory=max_memory
+    ):
+        original: FileRecord = pick_original(group, roots)
+        print(f"[ INFO ] duplicates of {original.path} ({original.size} bytes)")
+        for duplicate in group:
+            if duplicate is original:
+                continue
+            print(f"  dup {duplicate.path}")
+            wasted_bytes += duplicate.size
+            apply_action(original, duplicate, action, roots, trash_dir, dry_run)
+    print(f"[ INFO ] {wasted_bytes} bytes taken by duplicates")
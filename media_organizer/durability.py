@@ -0,0 +1,158 @@
+"""Durable moves: batched fsyncs making moves survive a crash.
+
+A rename is atomic, after a crash the file is either at its source or at
+its destination, but which one is only persisted once the folders are
+synced. A copy across devices is not atomic: its data and its folder
+entry may be lost while the source is already removed.
+
+While a `DurableBatch` is active, see `use_batch`, moves keep this
+invariant at every point of a crash: every moved file is complete in at
+least one of its source and its destination.
+
+- Renames only mark their source and destination folders as touched.
+- Copies write their data to a temporary file which is synced before
+  it is renamed to the destination. Removing the source is deferred.
+- Removed duplicates of files in the destination are deferred too.
+- The batch is flushed after a number of operations or some time:
+  every touched folder is synced once, only then the deferred sources
+  are removed. Folders created for the destinations are touched in
+  their parent folder, so the destination is reachable after a crash.
+
+Until a flush, a crash may undo the moves of the batch, never lose a
+file. The cost is one fsync per touched folder and batch instead of
+several per file.
+"""
+
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from media_organizer import config
+
+
+def fsync_path(path: Path) -> None:
+    """Flush the given file or folder to its device."""
+    file_descriptor: int = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(file_descriptor)
+    finally:
+        os.close(file_descriptor)
+
+
+class DurableBatch:  # pylint: disable=too-many-instance-attributes
+    """Folders touched and sources to remove since the last flush.
+
+    Operations can be added from several threads, e.g. while expanding
+    archives. The time bound is checked whenever an operation is added.
+    """
+
+    def __init__(
+        self,
+        max_operations: int = config.DURABLE_BATCH_OPERATIONS,
+        max_delay: float = config.DURABLE_BATCH_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Start an empty batch.
+
+        Args:
+            max_operations: Number of operations flushed together.
+            max_delay: Seconds after which the first operation of the
+                batch is flushed, at the latest with the next operation.
+            clock: Monotonic clock, replaced in tests.
+        """
+        self.max_operations: int = max_operations
+        self.max_delay: float = max_delay
+        self.clock: Callable[[], float] = clock
+        self.flushes: int = 0
+        self.synced_folders: int = 0
+        self._touched: set[Path] = set()
+        self._deferred_unlinks: dict[Path, None] = {}
+        self._operations: int = 0
+        self._started: float | None = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def __enter__(self) -> "DurableBatch":
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.flush()
+
+    def touch(self, *folders: Path) -> None:
+        """Record an operation changing the entries of the given folders."""
+        with self._lock:
+            self._touched.update(folders)
+            self._count_operation()
+
+    def unlink_after_flush(self, path: Path) -> None:
+        """Remove the given source once its copy is persisted by a flush."""
+        with self._lock:
+            self._deferred_unlinks[path] = None
+            self._count_operation()
+
+    def is_unlink_deferred(self, path: Path) -> bool:
+        """Return True if the given file is already moved, waiting for a flush."""
+        with self._lock:
+            return path in self._deferred_unlinks
+
+    def _count_operation(self) -> None:
+        """Flush if the batch is full or old enough, called while holding the lock."""
+        self._operations += 1
+        now: float = self.clock()
+        if self._started is None:
+            self._started = now
+        if (
+            self._operations >= self.max_operations
+            or now - self._started >= self.max_delay
+        ):
+            self._flush()
+
+    def flush(self) -> None:
+        """Sync every touched folder, then remove the deferred sources."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        """Flush the batch, called while holding the lock."""
+        if not self._operations:
+            return
+        for folder in self._touched:
+            try:
+                fsync_path(folder)
+            except FileNotFoundError:
+                # Removed since, e.g. an emptied date folder.
+                continue
+            self.synced_folders += 1
+        for path in self._deferred_unlinks:
+            path.unlink(missing_ok=True)
+        self.flushes += 1
+        self._touched.clear()
+        self._deferred_unlinks.clear()
+        self._operations = 0
+        self._started = None
+
+
+_active_batch: DurableBatch | None = None  # pylint: disable=invalid-name
+
+
+def get_active_batch() -> DurableBatch | None:
+    """Return the batch moves are recorded in, None if moves are not durable."""
+    return _active_batch
+
+
+@contextmanager
+def use_batch(batch: DurableBatch) -> Iterator[DurableBatch]:
+    """Make the moves durable with the given batch while in the context.
+
+    The batch is flushed when leaving the context, errors included.
+    """
+    global _active_batch  # pylint: disable=global-statement
+    previous: DurableBatch | None = _active_batch
+    _active_batch = batch
+    try:
+        yield batch
+    finally:
+        _active_batch = previous
+        batch.flush()
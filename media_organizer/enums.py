@@ -24,3 +24,99 @@ class OnDuplicate(StrEnum):
     SKIP: Final[str] = "skip"
     """Leave the source filepath untouched if the same filename
     exists in the destination."""
+
+
+class DeviceProfile(StrEnum):
+    """Enum class containing I/O concurrency profiles for storage devices."""
+
+    AUTO: Final[str] = "auto"
+    """Detect the profile from /sys/block/<device>/queue/rotational."""
+    SSD: Final[str] = "ssd"
+    """Non-rotational storage, header reads are issued concurrently."""
+    HDD: Final[str] = "hdd"
+    """Rotational storage like spinning disks or USB card readers.
+
+    Header reads are serialized and ordered by their location on the disk
+    to avoid seek thrashing.
+    """
+
+
+class ShardStrategy(StrEnum):
+    """Enum class containing how a source directory is split into shards."""
+
+    PATH: Final[str] = "path"
+    """Hash the path of every file, spreads the files evenly."""
+    SUBTREE: Final[str] = "subtree"
+    """Hash the top level folder of every file, keeps folders together."""
+
+
+class HashAlgorithm(StrEnum):
+    """Enum class containing perceptual hash algorithms for photos."""
+
+    DHASH: Final[str] = "dhash"
+    """Difference hash, compares neighbour pixels. Fast and robust to resizing."""
+    PHASH: Final[str] = "phash"
+    """DCT based hash, slower but more robust to re-compression and tone changes."""
+
+
+class DedupeAction(StrEnum):
+    """Enum class containing what to do with duplicates of a file."""
+
+    REPORT: Final[str] = "report"
+    """Only report the duplicates."""
+    DELETE: Final[str] = "delete"
+    """Delete every copy but the kept file."""
+    HARDLINK: Final[str] = "hardlink"
+    """Replace every copy by a hard link to the kept file, names are kept."""
+    TRASH: Final[str] = "trash"
+    """Move every copy but the kept file into a trash folder."""
+
+
+class DateSource(StrEnum):
+    """Enum class containing where the date of an organized file comes from."""
+
+    EXIF: Final[str] = "exif"
+    """Metadata of the file, read with piexif or exiftool."""
+    MTIME: Final[str] = "mtime"
+    """Modification time of the file, used by the fast mode."""
+    NONE: Final[str] = "none"
+    """No date was found, the file is not in a date folder."""
+
+
+class ProgressStage(StrEnum):
+    """Enum class containing the stages a file goes through, in order."""
+
+    WALK: Final[str] = "walk"
+    """The file was found in the source."""
+    DATE: Final[str] = "date"
+    """The date of the file was read, if it needs one."""
+    MOVE: Final[str] = "move"
+    """The file was organized into the destination."""
+
+
+class FileKind(StrEnum):
+    """Enum class containing file formats recognized by their magic bytes."""
+
+    JPEG: Final[str] = "jpeg"
+    """JPEG photos, their EXIF segment comes first and is at most 64 KiB."""
+    TIFF: Final[str] = "tiff"
+    """TIFF and the raw formats based on it, like CR2, NEF, DNG or ARW."""
+    WEBP: Final[str] = "webp"
+    PNG: Final[str] = "png"
+    GIF: Final[str] = "gif"
+    ISO_MEDIA: Final[str] = "iso-media"
+    """ISO base media files: MP4 and MOV videos, HEIC photos."""
+    ZIP: Final[str] = "zip"
+    GZIP: Final[str] = "gzip"
+    UNKNOWN: Final[str] = "unknown"
+
+
+class Priority(StrEnum):
+    """Enum class containing the orders files are organized in."""
+
+    WALK: Final[str] = "walk"
+    """Order of the walk, files are organized while the source is walked."""
+    NEWEST: Final[str] = "newest"
+    """Most recently modified files first."""
+    SMALLEST: Final[str] = "smallest"
+    """Smallest files first, the most files within a budget."""
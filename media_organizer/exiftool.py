@@ -0,0 +1,106 @@
+"""Long running exiftool processes.
+
+Starting exiftool costs far more than reading the metadata of one file.
+``ExifTool`` keeps a process open with ``-stay_open True`` and sends it
+one command per file, ``ExifToolPool`` shares a few of them between
+threads. While a pool is active, the date fetchers use it instead of
+starting a new exiftool per file.
+"""
+
+import queue
+import subprocess
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import IO, Final
+
+READY_MARKER: Final[bytes] = b"{ready}"
+"""Line printed by exiftool when a command sent with -execute finished."""
+
+
+class ExifTool:
+    """One exiftool process running commands read from its stdin."""
+
+    def __init__(self, executable: str = "exiftool") -> None:
+        # pylint: disable-next=consider-using-with
+        self.process: subprocess.Popen = subprocess.Popen(
+            [executable, "-stay_open", "True", "-@", "-"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def execute(self, *args: str) -> str:
+        """Run exiftool with the given arguments and return its output.
+
+        Raises:
+            ValueError: An argument contains a newline, which would be read
+                as two arguments by exiftool.
+        """
+        if any("\n" in arg for arg in args):
+            raise ValueError(f"exiftool arguments cannot contain newlines: {args}")
+        stdin: IO[bytes] | None = self.process.stdin
+        stdout: IO[bytes] | None = self.process.stdout
+        assert stdin and stdout
+        stdin.write("\n".join((*args, "-execute", "")).encode("utf-8"))
+        stdin.flush()
+
+        output: list[bytes] = []
+        while (line := stdout.readline()) and line.rstrip() != READY_MARKER:
+            output.append(line)
+        if not line:
+            raise RuntimeError("exiftool exited unexpectedly.")
+        return b"".join(output).decode("utf-8", errors="replace")
+
+    def close(self) -> None:
+        """Ask the exiftool process to exit and wait for it."""
+        if self.process.poll() is None and self.process.stdin:
+            try:
+                self.process.stdin.write(b"-stay_open\nFalse\n")
+                self.process.stdin.flush()
+                self.process.stdin.close()
+            except BrokenPipeError:
+                pass
+        self.process.wait()
+
+
+class ExifToolPool:
+    """A fixed number of exiftool processes shared between threads."""
+
+    def __init__(self, size: int, executable: str = "exiftool") -> None:
+        self._idle: queue.SimpleQueue[ExifTool] = queue.SimpleQueue()
+        self._processes: list[ExifTool] = [ExifTool(executable) for _ in range(size)]
+        for process in self._processes:
+            self._idle.put(process)
+
+    def execute(self, *args: str) -> str:
+        """Run the given command on the first idle exiftool process."""
+        process: ExifTool = self._idle.get()
+        try:
+            return process.execute(*args)
+        finally:
+            self._idle.put(process)
+
+    def close(self) -> None:
+        """Stop every exiftool process of the pool."""
+        for process in self._processes:
+            process.close()
+
+
+_active_pool: ExifToolPool | None = None  # pylint: disable=invalid-name
+
+
+def get_active_pool() -> ExifToolPool | None:
+    """Return the pool the date fetchers use, None if they start exiftool per file."""
+    return _active_pool
+
+
+@contextmanager
+def use_pool(pool: ExifToolPool) -> Iterator[ExifToolPool]:
+    """Let the date fetchers use the given pool while in the context."""
+    global _active_pool  # pylint: disable=global-statement
+    previous: ExifToolPool | None = _active_pool
+    _active_pool = pool
+    try:
+        yield pool
+    finally:
+        _active_pool = previous
@@ -0,0 +1,157 @@
+"""Read the head and tail of a file once, for every stage needing its content.
+
+Reading the date of a photo, comparing it with a file of the same name
+in the destination and recording it in the catalog each used to open
+and read the file again. On network storage every open is a round trip.
+
+A `FileSample` opens the file once and keeps a bounded head and tail.
+Its format is recognized by the magic bytes of the head, the EXIF data
+of JPEG photos is read from the head, and its partial hash comes from
+the head and tail. Only the partial hash is kept once the sample is
+dropped, keyed by the stat data of the file: a renamed file keeps its
+inode, so the moved file is found in the cache too.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Final
+
+from media_organizer import config
+from media_organizer.enums import FileKind
+
+MAGIC_NUMBERS: Final[tuple[tuple[int, bytes, FileKind], ...]] = (
+    (0, b"\xff\xd8", FileKind.JPEG),
+    # Like piexif, raw formats using their own TIFF version are read as TIFF.
+    (0, b"II", FileKind.TIFF),
+    (0, b"MM", FileKind.TIFF),
+    (8, b"WEBP", FileKind.WEBP),
+    (0, b"\x89PNG\r\n\x1a\n", FileKind.PNG),
+    (0, b"GIF8", FileKind.GIF),
+    (4, b"ftyp", FileKind.ISO_MEDIA),
+    (0, b"PK\x03\x04", FileKind.ZIP),
+    (0, b"\x1f\x8b", FileKind.GZIP),
+)
+"""Offset and bytes identifying each file format, see `sniff_kind`."""
+
+EXIF_KINDS: Final[frozenset[FileKind]] = frozenset(
+    {FileKind.JPEG, FileKind.TIFF, FileKind.WEBP}
+)
+"""Formats piexif reads the EXIF data of."""
+
+Signature = tuple[int, int, int, int]
+"""Device, inode, size and modification time of a file."""
+
+
+def sniff_kind(head: bytes) -> FileKind:
+    """Return the format of a file recognized by the magic bytes of its head."""
+    for offset, magic, kind in MAGIC_NUMBERS:
+        if head.startswith(magic, offset):
+            return kind
+    return FileKind.UNKNOWN
+
+
+def get_signature(file_stat: os.stat_result) -> Signature:
+    """Return the key of the cached partial hash of a file."""
+    return (file_stat.st_dev, file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns)
+
+
+class FileSample:
+    """Head and tail of a file, read with a single open."""
+
+    __slots__ = ("path", "size", "head", "tail", "signature")
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self, path: Path, size: int, head: bytes, tail: bytes, signature: Signature
+    ) -> None:
+        self.path: Path = path
+        self.size: int = size
+        self.head: bytes = head
+        self.tail: bytes = tail
+        """The end of the file following the head, at most PARTIAL_HASH_SIZE bytes."""
+        self.signature: Signature = signature
+
+    @classmethod
+    def read(cls, path: Path, head_size: int | None = None) -> "FileSample":
+        """Read the head and the tail of the given file.
+
+        Args:
+            path: The file to read.
+            head_size: Bytes of the head, by default config.SAMPLE_HEAD_SIZE.
+                At least config.PARTIAL_HASH_SIZE bytes are read.
+        """
+        head_size = max(head_size or config.SAMPLE_HEAD_SIZE, config.PARTIAL_HASH_SIZE)
+        with open(path, "rb") as file:
+            file_stat: os.stat_result = os.fstat(file.fileno())
+            head: bytes = file.read(head_size)
+            tail: bytes = b""
+            if (rest := file_stat.st_size - len(head)) > 0:
+                tail_size: int = min(config.PARTIAL_HASH_SIZE, rest)
+                file.seek(-tail_size, os.SEEK_END)
+                tail = file.read(tail_size)
+        sample: FileSample = cls(
+            path, file_stat.st_size, head, tail, get_signature(file_stat)
+        )
+        remember_partial_hash(sample.signature, sample.partial_hash)
+        return sample
+
+    @property
+    def kind(self) -> FileKind:
+        """Return the format of the file, see `sniff_kind`."""
+        return sniff_kind(self.head)
+
+    @property
+    def content(self) -> bytes | None:
+        """Return the whole content of the file, None if it was not read whole."""
+        if len(self.head) + len(self.tail) < self.size:
+            return None
+        return self.head + self.tail
+
+    @property
+    def partial_hash(self) -> str:
+        """Return the hash of the head and the tail of the file.
+
+        Files not larger than head and tail together are hashed whole,
+        their partial hash is then also their full hash.
+        """
+        digest = hashlib.blake2b(digest_size=config.HASH_DIGEST_SIZE)
+        if is_partial_hash_full(self.size):
+            digest.update(self.head)
+            digest.update(self.tail)
+        else:
+            hash_size: int = config.PARTIAL_HASH_SIZE
+            digest.update(self.head[:hash_size])
+            # The tail is short, or empty, when the head reaches the end.
+            end: bytes = self.head[-hash_size:] + self.tail
+            digest.update(end[-hash_size:])
+        return digest.hexdigest()
+
+
+def is_partial_hash_full(size: int) -> bool:
+    """Return True if the partial hash of a file of the given size covers it whole."""
+    return size <= 2 * config.PARTIAL_HASH_SIZE
+
+
+_partial_hashes: OrderedDict[Signature, str] = OrderedDict()
+_partial_hashes_lock: threading.Lock = threading.Lock()
+
+
+def remember_partial_hash(signature: Signature, partial_hash: str) -> None:
+    """Keep the partial hash of a sampled file, forgetting the oldest ones."""
+    with _partial_hashes_lock:
+        _partial_hashes[signature] = partial_hash
+        _partial_hashes.move_to_end(signature)
+        while len(_partial_hashes) > config.SAMPLE_CACHE_SIZE:
+            _partial_hashes.popitem(last=False)
+
+
+def get_partial_hash(path: Path) -> str:
+    """Return the partial hash of the given file, only reading it if not sampled."""
+    signature: Signature = get_signature(path.stat())
+    with _partial_hashes_lock:
+        partial_hash: str | None = _partial_hashes.get(signature)
+    if partial_hash is not None:
+        return partial_hash
+    return FileSample.read(path, head_size=config.PARTIAL_HASH_SIZE).partial_hash
@@ -1,8 +1,19 @@
 """Utilities for handling files in the filesystem."""
 
+import ctypes
+import errno
+import os
+import shutil
+from collections.abc import Callable
+from contextlib import nullcontext
+from functools import cache
 from pathlib import Path
+from typing import Final
 
-from imohash import hashfile  # type: ignore
+from media_organizer.coordination import DestinationLocks
+from media_organizer.durability import DurableBatch, fsync_path, get_active_batch
+from media_organizer.enums import OnDuplicate
+from media_organizer.file_sample import get_partial_hash, is_partial_hash_full
 
 
 def create_unique_filepath(filepath: Path) -> Path:
@@ -29,11 +40,21 @@ def create_unique_filepath(filepath: Path) -> Path:
 
 def is_files_equal(src_path: Path, dst_path: Path) -> bool:
     """Return True if the given two files are equal otherwise False."""
-    # TODO:2024-10-31:THS: unittest this method.
     # Compare file sizes first (cheap check)
-    if src_path.stat().st_size != dst_path.stat().st_size:
+    size: int = src_path.stat().st_size
+    if size != dst_path.stat().st_size:
+        return False
+    # The source was usually sampled for its date, its partial hash is known.
+    if get_partial_hash(src_path) != get_partial_hash(dst_path):
+        return False
+    if is_partial_hash_full(size):
         return True
-    return hashfile(src_path, hexdigest=True) != hashfile(dst_path, hexdigest=True)
+
+    # Imported here, so commands never comparing files start faster.
+    # pylint: disable-next=import-outside-toplevel
+    from imohash import hashfile  # type: ignore
+
+    return hashfile(src_path, hexdigest=True) == hashfile(dst_path, hexdigest=True)
 
 
 def add_path_extension(src_filepath: Path, base_dir: Path) -> Path:
@@ -41,3 +62,280 @@ def add_path_extension(src_filepath: Path, base_dir: Path) -> Path:
     file_extension: str = src_filepath.suffix.strip(".")
     dest_filepath: Path = base_dir / file_extension / src_filepath.name
     return dest_filepath
+
+
+BYTE_SIZE_UNITS: dict[str, int] = {
+    "": 1,
+    "K": 1024,
+    "M": 1024**2,
+    "G": 1024**3,
+    "T": 1024**4,
+}
+
+
+def parse_byte_size(raw_size: str) -> int:
+    """Parse a human readable size like "512M" or "2G" into bytes.
+
+    Units are powers of 1024, an optional trailing "B" or "iB" is ignored.
+
+    Raises:
+        ValueError: The given size is not a valid size.
+    """
+    size: str = raw_size.strip().upper().removesuffix("B").removesuffix("I")
+    unit: str = size[-1:] if size[-1:] in BYTE_SIZE_UNITS else ""
+    number: str = size.removesuffix(unit) if unit else size
+    try:
+        value: float = float(number)
+    except ValueError as error:
+        raise ValueError(f"{raw_size!r} is not a valid size.") from error
+    if value < 0:
+        raise ValueError(f"{raw_size!r} is not a valid size.")
+    return int(value * BYTE_SIZE_UNITS[unit])
+
+
+AT_FDCWD: Final[int] = -100
+RENAME_NOREPLACE: Final[int] = 1
+
+
+@cache
+def _get_renameat2() -> Callable[..., int] | None:
+    """Return the renameat2 function of the C library, None if not available."""
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+    except OSError:
+        return None
+    renameat2 = getattr(libc, "renameat2", None)
+    if renameat2 is not None:
+        renameat2.argtypes = [
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint,
+        ]
+    return renameat2
+
+
+def rename_noreplace(src_path: Path, dst_path: Path) -> None:
+    """Atomically rename the source to the destination without overwriting it.
+
+    Uses renameat2 with RENAME_NOREPLACE. Filesystems not supporting the
+    flag fall back to link and unlink, where creating the link fails
+    atomically if the destination exists. Filesystems without hard links,
+    like FAT on memory cards, fall back to a check before a plain rename,
+    which is only safe under a destination folder lock.
+
+    Raises:
+        FileExistsError: The destination already exists.
+    """
+    renameat2 = _get_renameat2()
+    if renameat2 is not None:
+        result: int = renameat2(
+            AT_FDCWD,
+            os.fsencode(src_path),
+            AT_FDCWD,
+            os.fsencode(dst_path),
+            RENAME_NOREPLACE,
+        )
+        if result == 0:
+            return
+        error_code: int = ctypes.get_errno()
+        if error_code not in (errno.ENOSYS, errno.EINVAL):
+            raise OSError(
+                error_code, os.strerror(error_code), str(src_path), None, str(dst_path)
+            )
+
+    try:
+        os.link(src_path, dst_path)
+    except OSError as error:
+        if error.errno not in (errno.EPERM, errno.ENOTSUP, errno.EMLINK):
+            raise
+    else:
+        os.unlink(src_path)
+        return
+
+    if dst_path.exists():
+        raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), str(dst_path))
+    src_path.rename(dst_path)
+
+
+def make_dirs(folder: Path) -> None:
+    """Create the given folder and its missing parents.
+
+    While moves are durable, see `media_organizer.durability`, the
+    parents of the created folders are touched.
+    """
+    batch: DurableBatch | None = get_active_batch()
+    if batch is None:
+        folder.mkdir(parents=True, exist_ok=True)
+        return
+    created: list[Path] = []
+    missing: Path = folder
+    while not missing.exists():
+        created.append(missing)
+        missing = missing.parent
+    folder.mkdir(parents=True, exist_ok=True)
+    if created:
+        batch.touch(*(path.parent for path in created))
+
+
+def remove_source(src_path: Path) -> None:
+    """Remove a source file whose content is in the destination.
+
+    While moves are durable, the removal waits for the next flush.
+    """
+    if batch := get_active_batch():
+        batch.unlink_after_flush(src_path)
+    else:
+        src_path.unlink()
+
+
+def copy_across_devices(src_path: Path, dst_path: Path, overwrite: bool) -> None:
+    """Move the source to a destination on another device by copying it.
+
+    The copy is written to a hidden temporary file next to the
+    destination and renamed into place, the destination never holds a
+    partial copy. While moves are durable, the copy is synced before the
+    rename and the source is removed after the next flush.
+
+    Raises:
+        FileExistsError: The destination already exists and overwrite is
+            not set.
+    """
+    partial_path: Path = dst_path.with_name(f".{dst_path.name}.{os.getpid()}.partial")
+    batch: DurableBatch | None = get_active_batch()
+    try:
+        shutil.copy2(src_path, partial_path)
+        if batch:
+            fsync_path(partial_path)
+        if overwrite:
+            partial_path.replace(dst_path)
+        else:
+            rename_noreplace(partial_path, dst_path)
+    except BaseException:
+        partial_path.unlink(missing_ok=True)
+        raise
+    if batch:
+        batch.touch(dst_path.parent)
+    remove_source(src_path)
+
+
+def rename_file(src_path: Path, dst_path: Path, overwrite: bool) -> None:
+    """Rename the source to the destination, copying it across devices.
+
+    While moves are durable, both folders are touched.
+
+    Raises:
+        FileExistsError: The destination already exists and overwrite is
+            not set.
+    """
+    try:
+        if overwrite:
+            src_path.rename(dst_path)
+        else:
+            rename_noreplace(src_path, dst_path)
+    except OSError as error:
+        if error.errno != errno.EXDEV:
+            raise
+        copy_across_devices(src_path, dst_path, overwrite)
+        return
+    if batch := get_active_batch():
+        batch.touch(src_path.parent, dst_path.parent)
+
+
+def move_file(  # pylint: disable=too-many-return-statements
+    src_filepath: Path,
+    dst_filepath: Path,
+    dry_run: bool = True,
+    on_duplicate: OnDuplicate = OnDuplicate.CREATE_UNIQ_FILENAME_IF_CONTENT_MISMATCH,
+    *,
+    locks: DestinationLocks | None = None,
+) -> Path | None:
+    """Move the given source file to the given destination folder.
+
+    The destination is never overwritten by accident, the file is moved
+    with an atomic no-clobber rename. If another run creates the same
+    destination file in the meantime, the duplicate strategy is applied
+    again. Files are copied across devices, see `rename_file`.
+
+    Args:
+        src_filepath: The source file to move.
+        dst_filepath: The destination folder to move the source file into.
+        dry_run: Does not move the file unless this flag is set to False.
+        on_duplicate: Which strategy to follow when moving a file that
+            already exists in the destination folder.
+        locks: Destination folder locks shared with concurrent runs.
+
+    Returns:
+        The path the file was moved to, or would be in a dry run. None if
+        it was not moved because of a duplicate. A source which already is
+        the destination file is left as is and its path returned.
+    """
+    # TODO: unitest source file path without extension specifically.
+    # TODO: cover all statements in unittest.
+    requested_filepath: Path = dst_filepath
+    batch: DurableBatch | None = get_active_batch()
+    if batch and batch.is_unlink_deferred(src_filepath):
+        # Copied or dropped as a duplicate already, removed at the next flush.
+        return None
+
+    folder_lock = (
+        locks.lock(dst_filepath.parent) if locks and not dry_run else nullcontext()
+    )
+    with folder_lock:
+        if dst_filepath.exists() and src_filepath.samefile(dst_filepath):
+            # Already in place, e.g. when organizing a destination again.
+            print(f"[ SKIP ] {src_filepath} is already in place")
+            return dst_filepath
+        if dst_filepath.exists():
+            print(
+                "[ WARNING ] duplicate: Found file with same name in the destination "
+                f"folder. {src_filepath} == {dst_filepath}"
+            )
+            match on_duplicate:
+                case OnDuplicate.CREATE_UNIQ_FILENAME_IF_CONTENT_MISMATCH:
+                    # TODO: unittest this functionality.
+                    if is_files_equal(src_path=src_filepath, dst_path=dst_filepath):
+                        print(f"[ DEBUG ] rm {src_filepath}")
+                        if not dry_run:
+                            remove_source(src_filepath)
+                        return None
+                    dst_filepath = create_unique_filepath(dst_filepath)
+                case OnDuplicate.CREATE_UNIQ_FILENAME:
+                    dst_filepath = create_unique_filepath(dst_filepath)
+                case OnDuplicate.SKIP:
+                    print(f"[ SKIP ] {src_filepath} {dst_filepath}")
+                    return None
+                case OnDuplicate.OVERWRITE:
+                    print(f"[ OVERWRITE ] {src_filepath} -> {dst_filepath}")
+                case _:
+                    raise ValueError(
+                        f"{on_duplicate=} did not match any configured value."
+                    )
+
+        print(f"mv {src_filepath} {dst_filepath}")
+
+        if dry_run:
+            return dst_filepath
+
+        make_dirs(dst_filepath.parent)
+        try:
+            rename_file(
+                src_filepath,
+                dst_filepath,
+                overwrite=on_duplicate == OnDuplicate.OVERWRITE,
+            )
+            return dst_filepath
+        except FileExistsError:
+            print(
+                f"[ WARNING ] {dst_filepath} was created by another run, "
+                f"retrying {src_filepath}"
+            )
+
+    return move_file(
+        src_filepath=src_filepath,
+        dst_filepath=requested_filepath,
+        dry_run=dry_run,
+        on_duplicate=on_duplicate,
+        locks=locks,
+    )
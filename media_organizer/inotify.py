@@ -0,0 +1,129 @@
+"""Minimal inotify bindings through ctypes.
+
+Linux only, the watch command needs to know when files appeared in the
+source without walking it again and again.
+"""
+
+import ctypes
+import os
+import struct
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+from typing import Final
+
+IN_MODIFY: Final[int] = 0x00000002
+IN_CLOSE_WRITE: Final[int] = 0x00000008
+IN_MOVED_FROM: Final[int] = 0x00000040
+IN_MOVED_TO: Final[int] = 0x00000080
+IN_CREATE: Final[int] = 0x00000100
+IN_DELETE: Final[int] = 0x00000200
+IN_DELETE_SELF: Final[int] = 0x00000400
+IN_MOVE_SELF: Final[int] = 0x00000800
+IN_Q_OVERFLOW: Final[int] = 0x00004000
+IN_IGNORED: Final[int] = 0x00008000
+IN_ONLYDIR: Final[int] = 0x01000000
+IN_ISDIR: Final[int] = 0x40000000
+IN_NONBLOCK: Final[int] = os.O_NONBLOCK
+IN_CLOEXEC: Final[int] = os.O_CLOEXEC
+
+EVENT_HEADER: Final[struct.Struct] = struct.Struct("iIII")
+"""Fixed part of struct inotify_event: wd, mask, cookie and name length."""
+
+READ_SIZE: Final[int] = 64 * 1024
+"""Number of bytes read from the inotify file descriptor at once."""
+
+
+@dataclass(frozen=True)
+class InotifyEvent:
+    """One event on a watched folder."""
+
+    path: Path
+    """Folder the event happened in, joined with the name if any."""
+
+    mask: int
+
+    @property
+    def is_dir(self) -> bool:
+        """Return True if the event is about a folder."""
+        return bool(self.mask & IN_ISDIR)
+
+
+@cache
+def _get_libc() -> ctypes.CDLL:
+    """Return the C library with the inotify functions."""
+    libc = ctypes.CDLL(None, use_errno=True)
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+def _check(result: int, path: Path | None = None) -> int:
+    """Raise an OSError for a failed libc call, return the result otherwise."""
+    if result < 0:
+        error_code: int = ctypes.get_errno()
+        raise OSError(error_code, os.strerror(error_code), str(path) if path else None)
+    return result
+
+
+class Inotify:
+    """An inotify instance watching folders, not recursive by itself."""
+
+    def __init__(self) -> None:
+        self.fd: int = _check(_get_libc().inotify_init1(IN_NONBLOCK | IN_CLOEXEC))
+        self._folders: dict[int, Path] = {}
+
+    def add_watch(self, folder: Path, mask: int) -> int:
+        """Watch the given folder for the events of the given mask.
+
+        Raises:
+            OSError: The folder cannot be watched, e.g. when it was removed
+                or the limit of fs.inotify.max_user_watches is reached.
+        """
+        watch: int = _check(
+            _get_libc().inotify_add_watch(
+                self.fd, os.fsencode(folder), mask | IN_ONLYDIR
+            ),
+            folder,
+        )
+        self._folders[watch] = folder
+        return watch
+
+    def read_events(self) -> list[InotifyEvent]:
+        """Return the pending events, empty if there are none."""
+        try:
+            data: bytes = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        events: list[InotifyEvent] = []
+        offset: int = 0
+        while offset < len(data):
+            watch, mask, _, name_size = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name_end: int = offset + name_size
+            name: bytes = data[offset:name_end].rstrip(b"\x00")
+            offset = name_end
+
+            if mask & IN_Q_OVERFLOW:
+                events.append(InotifyEvent(path=Path(), mask=mask))
+                continue
+            folder: Path | None = self._folders.get(watch)
+            if mask & IN_IGNORED:
+                self._folders.pop(watch, None)
+            if folder is None:
+                continue
+            path: Path = folder / os.fsdecode(name) if name else folder
+            events.append(InotifyEvent(path=path, mask=mask))
+        return events
+
+    def close(self) -> None:
+        """Stop watching every folder."""
+        os.close(self.fd)
+        self._folders.clear()
+
+    def __enter__(self) -> "Inotify":
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
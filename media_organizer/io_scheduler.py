@@ -0,0 +1,227 @@
+"""Schedule file reads according to the storage device the files live on.
+
+Parallel reads speed up SSDs but cause seek thrashing on spinning disks
+and USB card readers. Work is therefore grouped by ``st_dev`` and every
+device gets a concurrency profile. Reads on rotational devices are
+ordered by their physical location on the disk (FIEMAP) or by inode.
+"""
+
+import fcntl
+import os
+import struct
+from collections.abc import Callable, Generator, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Final
+
+from media_organizer import config
+from media_organizer.enums import DeviceProfile
+from media_organizer.walker import FileRecord
+
+FS_IOC_FIEMAP: Final[int] = 0xC020660B
+"""Linux ioctl request number returning the extent mapping of a file."""
+
+FIEMAP_HEADER: Final[struct.Struct] = struct.Struct("=QQLLLL")
+"""struct fiemap: fm_start, fm_length, fm_flags, fm_mapped_extents,
+fm_extent_count and fm_reserved."""
+
+FIEMAP_EXTENT: Final[struct.Struct] = struct.Struct("=QQQQQLLLL")
+"""struct fiemap_extent: fe_logical, fe_physical, fe_length, fe_reserved64[2],
+fe_flags and fe_reserved[3]."""
+
+FIEMAP_MAX_LENGTH: Final[int] = 0xFFFFFFFFFFFFFFFF
+
+DeviceKey = tuple[int, int]
+"""Source and destination ``st_dev`` of a group of files."""
+
+
+def get_device_id(path: Path) -> int:
+    """Return the ``st_dev`` of the given path or of its closest existing parent.
+
+    The destination directory might not exist yet, the device it will
+    be created on is the device of the closest existing parent.
+    """
+    for candidate in (path, *path.parents):
+        try:
+            return candidate.stat().st_dev
+        except FileNotFoundError:
+            continue
+    return path.stat().st_dev
+
+
+def read_rotational(
+    st_dev: int, sys_dev_block: Path = config.SYS_DEV_BLOCK_DIR
+) -> bool | None:
+    """Return True if the given device is rotational.
+
+    Args:
+        st_dev: Device number as found in ``os.stat_result.st_dev``.
+        sys_dev_block: Sysfs directory listing block devices by <major>:<minor>.
+
+    Returns:
+        True for rotational devices, False for non-rotational ones and None
+        when the device is not a block device, e.g. tmpfs or network storage.
+    """
+    device_dir: Path = sys_dev_block / f"{os.major(st_dev)}:{os.minor(st_dev)}"
+    # Partitions do not have a queue folder, the queue belongs to the parent disk.
+    for rotational_path in (
+        device_dir / "queue" / "rotational",
+        device_dir / ".." / "queue" / "rotational",
+    ):
+        try:
+            return rotational_path.read_text(encoding="utf-8").strip() == "1"
+        except OSError:
+            continue
+    return None
+
+
+def get_physical_offset(path: Path) -> int | None:
+    """Return the physical offset of the first extent of the given file.
+
+    Uses the FIEMAP ioctl, returns None when the filesystem does not support
+    it or the file has no extents mapped yet.
+    """
+    try:
+        fd: int = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        buffer: bytearray = bytearray(FIEMAP_HEADER.size + FIEMAP_EXTENT.size)
+        FIEMAP_HEADER.pack_into(buffer, 0, 0, FIEMAP_MAX_LENGTH, 0, 0, 1, 0)
+        fcntl.ioctl(fd, FS_IOC_FIEMAP, buffer)
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+
+    mapped_extents: int = FIEMAP_HEADER.unpack_from(buffer)[3]
+    if not mapped_extents:
+        return None
+    return FIEMAP_EXTENT.unpack_from(buffer, FIEMAP_HEADER.size)[1]
+
+
+def order_for_rotational(records: list[FileRecord]) -> list[FileRecord]:
+    """Order the given files by their location on a rotational disk.
+
+    Files are first ordered by inode, which keeps the inode table reads
+    needed for FIEMAP sequential, and then by the physical offset of their
+    first extent. Files without a known offset keep their inode order and
+    come last.
+    """
+    by_inode: list[FileRecord] = sorted(records, key=lambda record: record.ino)
+    offsets: list[int | None] = [get_physical_offset(record.path) for record in by_inode]
+    ordered = sorted(
+        zip(by_inode, offsets),
+        key=lambda item: (item[1] is None, item[1] or 0, item[0].ino),
+    )
+    return [record for record, _ in ordered]
+
+
+class IoScheduler:
+    """Group header reads per device and run them with the device's concurrency."""
+
+    def __init__(
+        self,
+        dest_dir: Path,
+        device_profile: DeviceProfile = DeviceProfile.AUTO,
+        window: int = config.IO_SCHEDULE_WINDOW,
+    ) -> None:
+        """Initialize the scheduler.
+
+        Args:
+            dest_dir: The destination directory the files are moved to.
+            device_profile: Profile used for every device, AUTO detects
+                the profile of each device from sysfs.
+            window: Number of files grouped and ordered together.
+        """
+        self.device_profile: DeviceProfile = device_profile
+        self.window: int = window
+        self.dest_device: int = get_device_id(dest_dir)
+        self._profiles: dict[int, DeviceProfile] = {}
+        self._executors: dict[int, ThreadPoolExecutor] = {}
+
+    def get_profile(self, st_dev: int) -> DeviceProfile:
+        """Return the concurrency profile of the given device."""
+        if self.device_profile != DeviceProfile.AUTO:
+            return self.device_profile
+        if st_dev not in self._profiles:
+            rotational: bool | None = read_rotational(st_dev)
+            self._profiles[st_dev] = (
+                DeviceProfile.HDD if rotational else DeviceProfile.SSD
+            )
+        return self._profiles[st_dev]
+
+    def get_concurrency(self, device_key: DeviceKey) -> int:
+        """Return how many reads can run at once for the given device group.
+
+        Reads of a group are interleaved with writes to its destination,
+        so a rotational device on either side serializes the whole group.
+        """
+        return min(config.DEVICE_CONCURRENCY[self.get_profile(dev)] for dev in device_key)
+
+    def is_rotational(self, device_key: DeviceKey) -> bool:
+        """Return True if the source device of the given group is rotational."""
+        return self.get_profile(device_key[0]) == DeviceProfile.HDD
+
+    def read_dates(
+        self,
+        records: Iterable[FileRecord],
+        read_date: Callable[[Path], datetime | None],
+        needs_date: Callable[[FileRecord], bool],
+    ) -> Generator[tuple[FileRecord, datetime | None], None, None]:
+        """Read the dates of the given files, scheduled per device.
+
+        The given records are consumed in windows of ``self.window`` files.
+        Each window is grouped by device, ordered when the device is
+        rotational and read with the concurrency of the device.
+
+        Args:
+            records: Files to read dates from, consumed lazily.
+            read_date: Method reading the date of a single file.
+            needs_date: Filter telling which files need a date at all.
+
+        Yields:
+            Every given record alongside its date, None for files not
+            needing a date.
+        """
+        records_iter: Iterator[FileRecord] = iter(records)
+        try:
+            while window := list(islice(records_iter, self.window)):
+                groups: dict[DeviceKey, list[FileRecord]] = {}
+                for record in window:
+                    device_key: DeviceKey = (record.dev, self.dest_device)
+                    groups.setdefault(device_key, []).append(record)
+                del window
+                for device_key, group in groups.items():
+                    yield from self._read_group(device_key, group, read_date, needs_date)
+        finally:
+            for executor in self._executors.values():
+                executor.shutdown(wait=True, cancel_futures=True)
+            self._executors.clear()
+
+    def _read_group(
+        self,
+        device_key: DeviceKey,
+        records: list[FileRecord],
+        read_date: Callable[[Path], datetime | None],
+        needs_date: Callable[[FileRecord], bool],
+    ) -> Iterator[tuple[FileRecord, datetime | None]]:
+        """Read the dates of files living on the same device."""
+        ordered: list[FileRecord] = (
+            order_for_rotational(records) if self.is_rotational(device_key) else records
+        )
+        to_read: list[Path] = [record.path for record in ordered if needs_date(record)]
+
+        concurrency: int = self.get_concurrency(device_key)
+        dates: Iterator[datetime | None]
+        if concurrency > 1:
+            if concurrency not in self._executors:
+                self._executors[concurrency] = ThreadPoolExecutor(max_workers=concurrency)
+            dates = self._executors[concurrency].map(read_date, to_read)
+        else:
+            dates = map(read_date, to_read)
+
+        for record in ordered:
+            yield record, next(dates, None) if needs_date(record) else None
@@ -4,218 +4,560 @@ This script is the entry point of this repository.
 The high level logic is implemented here.
 """
 
+# pylint: disable=too-many-lines
+
+from collections.abc import Callable, Iterator
+from contextlib import nullcontext
+from datetime import datetime
+from functools import partial
 from pathlib import Path
-from typing import Final
 
 import click
 
 from media_organizer import config
-from media_organizer.date_fetcher import get_accurate_media_date, get_fast_date
-from media_organizer.enums import OnDuplicate
-from media_organizer.file_utils import (
-    add_path_extension,
-    create_unique_filepath,
-    is_files_equal,
+from media_organizer.archives import is_expandable, organize_archives
+from media_organizer.budget import RunBudget, check_categories, order_records
+from media_organizer.catalog import (
+    Catalog,
+    build_catalog,
+    get_catalog_path,
+    relayout,
+)
+from media_organizer.click_types import (
+    ByteSizeParamType,
+    DefaultCommandGroup,
+    DurationParamType,
+    ShardParamType,
+    load_routing_option,
+)
+from media_organizer.coordination import DestinationLocks, Shard, is_in_shard
+from media_organizer.durability import DurableBatch, get_active_batch, use_batch
+from media_organizer.enums import (
+    DateSource,
+    DedupeAction,
+    DeviceProfile,
+    HashAlgorithm,
+    OnDuplicate,
+    Priority,
+    ProgressStage,
+    ShardStrategy,
+)
+from media_organizer.file_utils import move_file
+from media_organizer.io_scheduler import IoScheduler
+from media_organizer.progress import Progress, format_megabytes
+from media_organizer.routing import (
+    Route,
+    RoutingTable,
+    check_folder_format,
+    get_default_routing,
+)
+from media_organizer.snapshots import SnapshotStore, get_snapshot_scope
+from media_organizer.spill import get_max_items
+from media_organizer.walker import (
+    FileRecord,
+    WalkRules,
+    find_nested_destination,
+    walk_source,
 )
 from media_organizer.xmp_utils import find_xmp_config
 
-# How the folder name is
-FOLDER_NAME_FORMAT: Final[str] = "%Y_%m_%d"
-YEAR_FORMAT: Final[str] = "%Y"
 
-
-def move_file(
-    src_filepath: Path,
-    dst_filepath: Path,
+def move_media(  # pylint: disable=too-many-arguments
+    media_path: Path,
+    dest_dir: Path,
+    fast: bool = False,
     dry_run: bool = True,
     on_duplicate: OnDuplicate = OnDuplicate.CREATE_UNIQ_FILENAME_IF_CONTENT_MISMATCH,
+    *,
+    locks: DestinationLocks | None = None,
+    catalog: Catalog | None = None,
+    folder_format: str = config.DATE_FOLDER_FORMAT,
+    routing: RoutingTable | None = None,
 ) -> None:
-    """Move the given source file to the given destination folder.
+    """Move media from source folder to the given destinationn directory.
 
     Args:
-        src_filepath: The source file to move.
-        dst_filepath: The destination folder to move the source file into.
-        dry_run: Does not move the file unless this flag is set to False.
+        media_path: The path to a image.
+        dest_dir: The destination directory to move the media to.
+        fast: Whether to use the fast method to fetch dates.
+        dry_run: Does not move the media unless this flag is set to False.
         on_duplicate: Which strategy to follow when moving a file that
             already exists in the destination folder.
+        locks: Destination folder locks shared with concurrent runs.
+        catalog: Catalog of the destination recording the moved files,
+            None in dry runs.
+        folder_format: strftime format of the date folders.
+        routing: Routing of the file categories, the default one if None.
     """
-    # TODO: unitest source file path without extension specifically.
-    # TODO: cover all statements in unittest.
+    route: Route = (routing or get_default_routing()).lookup(media_path.name)
+    media_datetime = route.read_date(media_path, fast)
+    move_dated_media(
+        media_path=media_path,
+        media_datetime=media_datetime,
+        dest_dir=dest_dir,
+        dry_run=dry_run,
+        on_duplicate=on_duplicate,
+        locks=locks,
+        catalog=catalog,
+        date_source=route.get_date_source(media_datetime, fast),
+        folder_format=route.get_template(media_path.name, folder_format),
+        sidecars=route.sidecars,
+    )
 
-    if dst_filepath.exists():
-        print(
-            "[ WARNING ] duplicate: Found file with same name in the destination folder. "
-            f"{src_filepath} == {dst_filepath}"
-        )
-        match on_duplicate:
-            case OnDuplicate.CREATE_UNIQ_FILENAME_IF_CONTENT_MISMATCH:
-                # TODO: unittest this functionality.
-                if is_files_equal(src_path=src_filepath, dst_path=dst_filepath):
-                    print(f"[ DEBUG ] rm {src_filepath}")
-                    if not dry_run:
-                        src_filepath.unlink()
-                    return
-                dst_filepath = create_unique_filepath(dst_filepath)
-            case OnDuplicate.CREATE_UNIQ_FILENAME:
-                dst_filepath = create_unique_filepath(dst_filepath)
-            case OnDuplicate.SKIP:
-                print(f"[ SKIP ] {src_filepath} {dst_filepath}")
-                return
-            case OnDuplicate.OVERWRITE:
-                print(f"[ OVERWRITE ] {src_filepath} -> {dst_filepath}")
-            case _:
-                raise ValueError(f"{on_duplicate=} did not match any configured value.")
-
-    print(f"mv {src_filepath} {dst_filepath}")
-
-    if not dry_run:
-        dst_filepath.parent.mkdir(parents=True, exist_ok=True)
-        src_filepath.rename(dst_filepath)
-
-
-def move_media(
+
+def move_dated_media(  # pylint: disable=too-many-arguments
     media_path: Path,
+    media_datetime: datetime | None,
     dest_dir: Path,
-    fast: bool = False,
     dry_run: bool = True,
     on_duplicate: OnDuplicate = OnDuplicate.CREATE_UNIQ_FILENAME_IF_CONTENT_MISMATCH,
+    *,
+    locks: DestinationLocks | None = None,
+    catalog: Catalog | None = None,
+    date_source: DateSource = DateSource.EXIF,
+    folder_format: str = config.DATE_FOLDER_FORMAT,
+    sidecars: bool = True,
 ) -> None:
-    """Move media from source folder to the given destinationn directory.
+    """Move media with an already resolved date to the given destination directory.
 
     Args:
         media_path: The path to a image.
+        media_datetime: The creation date of the media, None if unknown.
         dest_dir: The destination directory to move the media to.
-        fast: Whether to use the fast method to fetch dates.
         dry_run: Does not move the media unless this flag is set to False.
         on_duplicate: Which strategy to follow when moving a file that
             already exists in the destination folder.
+        locks: Destination folder locks shared with concurrent runs.
+        catalog: Catalog of the destination recording the moved files,
+            None in dry runs.
+        date_source: Where the media date comes from.
+        folder_format: strftime format of the date folders.
+        sidecars: Move the darktable sidecar of the media along with it.
     """
-    media_datetime = (
-        get_fast_date(media_path) if fast else get_accurate_media_date(media_path)
-    )
-
+    base_dir: Path = dest_dir
     if media_datetime:
-        media_year: str = media_datetime.strftime(YEAR_FORMAT)
-        media_date: str = media_datetime.strftime(FOLDER_NAME_FORMAT)
-        date_folder: str = f"{media_year}/{media_date}"
-        dest_dir = dest_dir / date_folder
+        dest_dir = dest_dir / media_datetime.strftime(folder_format)
 
-    if media_path.suffix in config.PHOTOS_SUPPORTED_EXTENSIONS:
+    moved_paths: list[Path | None] = []
+    if sidecars:
         if xmp_path := find_xmp_config(photo_path=media_path):
             print(f"[ INFO ] Found config {xmp_path} for {media_path}")
-            move_file(
-                src_filepath=xmp_path,
-                dst_filepath=dest_dir / xmp_path.name,
-                dry_run=dry_run,
-                on_duplicate=on_duplicate,
+            moved_paths.append(
+                move_file(
+                    src_filepath=xmp_path,
+                    dst_filepath=dest_dir / xmp_path.name,
+                    dry_run=dry_run,
+                    on_duplicate=on_duplicate,
+                    locks=locks,
+                )
             )
 
+    moved_paths.append(
+        move_file(
+            src_filepath=media_path,
+            dst_filepath=dest_dir / media_path.name,
+            dry_run=dry_run,
+            on_duplicate=on_duplicate,
+            locks=locks,
+        )
+    )
+
+    if catalog and not dry_run:
+        for moved_path in moved_paths:
+            if moved_path:
+                catalog.add(moved_path, base_dir, media_datetime, date_source)
+
+
+def organize_file(  # pylint: disable=too-many-arguments
+    src_path: Path,
+    media_datetime: datetime | None,
+    dest_dir: Path,
+    dry_run: bool = True,
+    on_duplicate: OnDuplicate = OnDuplicate.CREATE_UNIQ_FILENAME_IF_CONTENT_MISMATCH,
+    *,
+    locks: DestinationLocks | None = None,
+    catalog: Catalog | None = None,
+    date_source: DateSource = DateSource.EXIF,
+    folder_format: str = config.DATE_FOLDER_FORMAT,
+    routing: RoutingTable | None = None,
+) -> None:
+    """Move the given file into the folder of its category.
+
+    Args:
+        src_path: The file to move.
+        media_datetime: The creation date of media files, None if unknown.
+        dest_dir: The destination directory holding the category folders.
+        dry_run: Does not move the file unless this flag is set to False.
+        on_duplicate: Which strategy to follow when moving a file that
+            already exists in the destination folder.
+        locks: Destination folder locks shared with concurrent runs.
+        catalog: Catalog of the destination recording the moved files,
+            None in dry runs.
+        date_source: Where the media date comes from.
+        folder_format: strftime format of the date folders.
+        routing: Routing of the file categories, the default one if None.
+    """
+    routing = routing or get_default_routing()
+    route: Route = routing.lookup(src_path.name)
+
+    if route.is_dated:
+        move_dated_media(
+            media_path=src_path,
+            media_datetime=media_datetime,
+            dest_dir=dest_dir / route.folder,
+            dry_run=dry_run,
+            on_duplicate=on_duplicate,
+            locks=locks,
+            catalog=catalog,
+            date_source=date_source,
+            folder_format=route.get_template(src_path.name, folder_format),
+            sidecars=route.sidecars,
+        )
+        return
+
+    if route is routing.fallback:
+        print(f"[ WARNING ] {src_path} Unknown type.")
     move_file(
-        src_filepath=media_path,
-        dst_filepath=dest_dir / media_path.name,
+        src_filepath=src_path,
+        dst_filepath=route.get_folder(dest_dir, src_path.name, None) / src_path.name,
         dry_run=dry_run,
         on_duplicate=on_duplicate,
+        locks=locks,
     )
 
 
+# pylint: disable-next=too-many-arguments,too-many-locals,too-many-branches
 def move_from_source(
     source_dir: Path,
     dest_dir: Path,
     fast: bool = False,
     dry_run: bool = True,
     on_duplicate: OnDuplicate = OnDuplicate.CREATE_UNIQ_FILENAME_IF_CONTENT_MISMATCH,
+    *,
+    device_profile: DeviceProfile = DeviceProfile.AUTO,
+    max_memory: int = config.DEFAULT_MAX_MEMORY,
+    shard: Shard | None = None,
+    shard_by: ShardStrategy = ShardStrategy.PATH,
+    expand_archives: bool = False,
+    progress: Progress | None = None,
+    rules: WalkRules | None = None,
+    routing: RoutingTable | None = None,
+    incremental: bool = False,
+    full_scan: bool = False,
+    budget: RunBudget | None = None,
+    priority: Priority = Priority.WALK,
+    first: tuple[str, ...] = (),
 ) -> None:
-    """Move media from given source directory to the given destination directory."""
-    # The target destination filepath to move the source filepath to.
-    # By default, we move the source file to unsorted folder if we cannot
-    # categorize the file.
-    dst_path: Path
-
-    for src_path in source_dir.rglob("*"):
-        if not src_path.exists():
-            print(
-                f"[ WARNING ] file path {src_path} does not exists anymore, "
-                "it might have been moved alongside other related files."
-            )
-            continue
+    """Move media from given source directory to the given destination directory.
 
-        if src_path.is_dir():
-            print(f"[ VERBOSE ][ SKIP ] is folder: {src_path}")
-            continue
+    The source is walked as a stream of compact file records, nothing
+    proportional to the number of files is kept in memory. Dates of
+    media files are read ahead of the moves, scheduled per storage
+    device, see `media_organizer.io_scheduler`.
 
-        dst_path = dest_dir / config.UNSORT_FOLDER_NAME / src_path.name
+    Several runs can organize disjoint shards of the same source into the
+    same destination at once, see `media_organizer.coordination`.
 
-        if src_path.suffix.lower() in config.PHOTOS_SUPPORTED_EXTENSIONS:
-            move_media(
-                media_path=src_path,
-                dest_dir=dest_dir / config.PHOTOS_FOLDER_NAME,
-                fast=fast,
-                dry_run=dry_run,
-                on_duplicate=on_duplicate,
-            )
-            continue
-
-        if src_path.suffix.lower() in config.VIDEOS_SUPPORTED_EXTENSIONS:
-            move_media(
-                media_path=src_path,
-                dest_dir=dest_dir / config.VIDEOS_FOLDER_NAME,
-                fast=fast,
-                dry_run=dry_run,
-                on_duplicate=on_duplicate,
-            )
-            continue
+    With expand_archives, the members of zip and tar archives are
+    organized too, see `media_organizer.archives`, before the archives
+    themselves are moved.
 
-        if src_path.suffix.lower() in config.TEXT_SUPPORTED_EXTENSIONS:
-            dst_path = add_path_extension(
-                src_path, base_dir=dest_dir / config.DOCS_FOLDER_NAME
-            )
-            move_file(
-                src_filepath=src_path,
-                dst_filepath=dst_path,
-                dry_run=dry_run,
-                on_duplicate=on_duplicate,
-            )
-            continue
+    The given progress is updated as files go through the walk, the
+    date reads and the moves, see `media_organizer.progress`.
 
-        if src_path.suffix.lower() in config.AUDIO_SUPPORTED_EXTENSIONS:
-            dst_path = add_path_extension(
-                src_path, base_dir=dest_dir / config.AUDIO_FOLDER_NAME
-            )
-            move_file(
-                src_filepath=src_path,
-                dst_filepath=dst_path,
-                dry_run=dry_run,
-                on_duplicate=on_duplicate,
-            )
-            continue
+    Folders and files are skipped following the given walk rules, by
+    default the folders of `config.DEFAULT_EXCLUDES`. The organized
+    folders of a destination inside the source, or being the source, are
+    always skipped, see `exclude_destination`.
+
+    Files are routed into category folders by the given routing table,
+    see `media_organizer.routing`, the default one if None.
 
-        if src_path.suffix.lower() in config.ARCHIVE_SUPPORTED_EXTENSIONS:
-            dst_path = add_path_extension(
-                src_path, base_dir=dest_dir / config.ARCHIVES_FOLDER_NAME
+    Incremental runs only list the source folders changed since the last
+    incremental run, see `media_organizer.snapshots`, unless a full scan
+    is due or asked for. Dry runs always list every folder.
+
+    Files are organized in the given priority order, the files of the
+    given categories first, until the given budget is used up, see
+    `media_organizer.budget`. What remains is reported, and snapshots
+    are not saved, so the next incremental run lists the rest again.
+    Ordering by anything but the walk walks the whole source first.
+    """
+    scheduler: IoScheduler = IoScheduler(
+        dest_dir=dest_dir,
+        device_profile=device_profile,
+        window=min(config.IO_SCHEDULE_WINDOW, get_max_items(max_memory)),
+    )
+    routing = routing or get_default_routing()
+    rules = rules if rules is not None else WalkRules()
+    exclude_destination(rules, source_dir, dest_dir, routing)
+    snapshots: SnapshotStore | None = None
+    if incremental and not dry_run:
+        scope: str = get_snapshot_scope(
+            source_dir, rules.fingerprint, f"{shard} by {shard_by}" if shard else ""
+        )
+        snapshots = SnapshotStore(dest_dir, scope, full_scan=full_scan)
+    records: Iterator[FileRecord] = walk_source(source_dir, rules, snapshots)
+    keep: Callable[[FileRecord], bool] | None = None
+    if shard:
+        keep = partial(is_in_shard, source_dir=source_dir, shard=shard, strategy=shard_by)
+        records = filter(keep, records)
+    # A pre-count would list every folder the snapshots spare.
+    if progress and snapshots is None:
+        progress.start_precount(source_dir, keep, rules)
+        records = progress.track(records, ProgressStage.WALK)
+    locks: DestinationLocks = DestinationLocks(dest_dir)
+
+    budget = budget or RunBudget()
+    records = order_records(
+        budget.count_walked(records),
+        routing,
+        priority,
+        first,
+        max_items=get_max_items(max_memory),
+        max_files=budget.max_files,
+    )
+    records = budget.limit(records)
+    dated_records = scheduler.read_dates(
+        records,
+        read_date=partial(routing.read_date, fast=fast),
+        needs_date=routing.needs_date,
+    )
+
+    with (
+        snapshots or nullcontext(),
+        Catalog(dest_dir) if not dry_run else nullcontext() as catalog,
+    ):
+        folder_format: str = (
+            catalog.get_folder_format()
+            if catalog
+            else Catalog.read_folder_format(dest_dir)
+        )
+        archive_records: list[FileRecord] = []
+        for record, media_datetime in dated_records:
+            if budget.is_out_of_time():
+                break
+            budget.add_done(record)
+            if progress:
+                progress.add(ProgressStage.DATE, record.size)
+            src_path: Path = record.path
+            if not src_path.exists():
+                print(
+                    f"[ WARNING ] file path {src_path} does not exists anymore, "
+                    "it might have been moved alongside other related files."
+                )
+                continue
+            if expand_archives and is_expandable(src_path):
+                # Counted as moved already, archives are organized at the end.
+                archive_records.append(record)
+                if progress:
+                    progress.add(ProgressStage.MOVE, record.size)
+                continue
+
+            organize_file(
+                src_path,
+                media_datetime,
+                dest_dir,
+                dry_run,
+                on_duplicate,
+                locks=locks,
+                catalog=catalog,
+                date_source=routing.lookup(record.name).get_date_source(
+                    media_datetime, fast
+                ),
+                folder_format=folder_format,
+                routing=routing,
             )
-            move_file(
-                src_filepath=src_path,
-                dst_filepath=dst_path,
-                dry_run=dry_run,
-                on_duplicate=on_duplicate,
+            if progress:
+                progress.add(ProgressStage.MOVE, record.size)
+        # Out of time, stops reading the dates of the queued files.
+        dated_records.close()
+
+        if budget.is_out_of_time():
+            # Left for the next run along with the rest.
+            budget.put_back(archive_records)
+            archive_records.clear()
+        for archive_path in organize_archives(
+            [record.path for record in archive_records],
+            dest_dir,
+            fast,
+            dry_run,
+            on_duplicate,
+            locks=locks,
+            catalog=catalog,
+            folder_format=folder_format,
+            routing=routing,
+        ):
+            organize_file(
+                archive_path,
+                None,
+                dest_dir,
+                dry_run,
+                on_duplicate,
+                locks=locks,
+                catalog=catalog,
+                folder_format=folder_format,
+                routing=routing,
             )
-            continue
+        finish_run(budget, snapshots, progress)
 
-        print(f"[ WARNING ] {src_path} Unknown type.")
 
-        if src_path.suffix:
-            dst_path = add_path_extension(
-                src_path, base_dir=dest_dir / config.UNSORT_FOLDER_NAME
-            )
-        move_file(
-            src_filepath=src_path,
-            dst_filepath=dst_path,
-            dry_run=dry_run,
-            on_duplicate=on_duplicate,
+def exclude_destination(
+    rules: WalkRules, source_dir: Path, dest_dir: Path, routing: RoutingTable
+) -> None:
+    """Skip the organized files of a destination lying in the source.
+
+    A destination inside the source is skipped whole. A destination
+    which is the source itself keeps its category and state folders
+    skipped, only the files around them are organized.
+    """
+    if nested_dest := find_nested_destination(source_dir, dest_dir):
+        print(f"[ INFO ] destination {dest_dir} is inside the source, skipping it")
+        rules.exclude_dir(nested_dest)
+    elif source_dir.resolve() == dest_dir.resolve():
+        print(f"[ INFO ] destination {dest_dir} is the source, skipping its folders")
+        for folder in routing.get_folders() | {config.STATE_FOLDER_NAME}:
+            rules.exclude_dir(source_dir / folder)
+
+
+def finish_run(
+    budget: RunBudget, snapshots: SnapshotStore | None, progress: Progress | None
+) -> None:
+    """Report what the run left, and save the snapshots unless it stopped early.
+
+    The source is not walked to its end to count what a stopped run left,
+    the pre-count of the progress gives the total when it is done.
+    """
+    left_files, left_bytes = budget.finish()
+    if budget.exhausted and budget.walked_all:
+        print(
+            f"[ INFO ] {budget.exhausted} budget used up after {budget.done_files} "
+            f"files, {left_files} files ({format_megabytes(left_bytes)}) remain "
+            "in the source"
+        )
+    elif budget.exhausted and progress and progress.total_files is not None:
+        left_files = max(left_files, progress.total_files - budget.done_files)
+        left_bytes = max(left_bytes, (progress.total_bytes or 0) - budget.done_bytes)
+        print(
+            f"[ INFO ] {budget.exhausted} budget used up after {budget.done_files} "
+            f"files, about {left_files} files ({format_megabytes(left_bytes)}) "
+            "remain in the source by the pre-count"
+        )
+    elif budget.exhausted:
+        print(
+            f"[ INFO ] {budget.exhausted} budget used up after {budget.done_files} "
+            f"files, at least {left_files} files ({format_megabytes(left_bytes)}) "
+            "remain in the source, the rest of the source was not counted"
+        )
+    if snapshots and budget.exhausted:
+        print("[ INFO ] stopped early, the source snapshots are not saved")
+    elif snapshots:
+        snapshots.save()
+        print(
+            f"[ INFO ] listed {snapshots.listed} folders, skipped "
+            f"{snapshots.skipped} unchanged ones"
+            + (", full scan" if snapshots.verify else "")
+        )
+
+
+def watch_source(  # pylint: disable=too-many-arguments,too-many-locals
+    source_dir: Path,
+    dest_dir: Path,
+    fast: bool = False,
+    dry_run: bool = True,
+    on_duplicate: OnDuplicate = OnDuplicate.CREATE_UNIQ_FILENAME_IF_CONTENT_MISMATCH,
+    *,
+    device_profile: DeviceProfile = DeviceProfile.AUTO,
+    settle: float = config.WATCH_SETTLE_SECONDS,
+    batch_size: int = config.WATCH_BATCH_SIZE,
+    routing: RoutingTable | None = None,
+    rules: WalkRules | None = None,
+) -> None:
+    """Organize the source, then every file arriving in it until interrupted.
+
+    The source is watched before it is organized once, so files arriving
+    meanwhile are not missed. Arriving files are organized in small
+    batches once they settled, see `media_organizer.watcher`.
+
+    Folders and files skipped by the given walk rules, by default the
+    folders of `config.DEFAULT_EXCLUDES`, are not watched either.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from media_organizer.watcher import PendingFiles, SourceWatcher
+
+    scheduler: IoScheduler = IoScheduler(dest_dir=dest_dir, device_profile=device_profile)
+    locks: DestinationLocks = DestinationLocks(dest_dir)
+    routing = routing or get_default_routing()
+    rules = rules if rules is not None else WalkRules()
+    exclude_destination(rules, source_dir, dest_dir, routing)
+    with SourceWatcher(
+        source_dir, rules=rules, pending=PendingFiles(settle=settle)
+    ) as watcher:
+        move_from_source(
+            source_dir,
+            dest_dir,
+            fast,
+            dry_run,
+            on_duplicate,
+            device_profile=device_profile,
+            rules=rules,
+            routing=routing,
         )
+        print(f"[ INFO ] watching {source_dir} for new files")
+        with Catalog(dest_dir) if not dry_run else nullcontext() as catalog:
+            folder_format: str = (
+                catalog.get_folder_format()
+                if catalog
+                else Catalog.read_folder_format(dest_dir)
+            )
+            for groups in watcher.iter_batches(batch_size):
+                records: list[FileRecord] = []
+                for path in (path for group in groups for path in group):
+                    try:
+                        record: FileRecord = FileRecord.from_path(path)
+                    except FileNotFoundError:
+                        continue
+                    if rules.is_included_size(record.size):
+                        records.append(record)
+
+                dated_records = scheduler.read_dates(
+                    iter(records),
+                    read_date=partial(routing.read_date, fast=fast),
+                    needs_date=routing.needs_date,
+                )
+                for record, media_datetime in dated_records:
+                    # Sidecars are moved alongside their photo.
+                    if record.path.exists():
+                        organize_file(
+                            record.path,
+                            media_datetime,
+                            dest_dir,
+                            dry_run,
+                            on_duplicate,
+                            locks=locks,
+                            catalog=catalog,
+                            date_source=routing.lookup(record.name).get_date_source(
+                                media_datetime, fast
+                            ),
+                            folder_format=folder_format,
+                            routing=routing,
+                        )
+                if catalog:
+                    catalog.commit()
+                # Moves are not left unsynced while waiting for new files.
+                if durable_batch := get_active_batch():
+                    durable_batch.flush()
 
 
-@click.command()
+@click.group(cls=DefaultCommandGroup)
+def main() -> None:
+    """Organize media files by creation date.
+
+    Runs the organize command unless another command is given.
+    """
+
+
+@main.command()
 @click.argument(
     "source_dir", type=click.Path(exists=True, file_okay=False, dir_okay=True)
 )
@@ -245,11 +587,188 @@ def move_from_source(
     default=OnDuplicate.CREATE_UNIQ_FILENAME_IF_CONTENT_MISMATCH,
     help="What to do when file with same name already exists.",
 )
-def main(
-    source_dir: str, dest_dir: str, fast: bool, dry_run: bool, on_duplicate: OnDuplicate
+@click.option(
+    "--device-profile",
+    type=click.Choice(
+        [DeviceProfile.AUTO, DeviceProfile.SSD, DeviceProfile.HDD], case_sensitive=True
+    ),
+    default=DeviceProfile.AUTO,
+    help="I/O concurrency profile of the source and destination devices. "
+    "auto detects it per device from /sys/block/*/queue/rotational.",
+)
+@click.option(
+    "--max-memory",
+    type=ByteSizeParamType(),
+    default=f"{config.DEFAULT_MAX_MEMORY // 1024**2}M",
+    show_default=True,
+    help="Memory budget for large intermediate state, e.g. 256M or 2G. "
+    "State above the budget is spilled to temporary files.",
+)
+@click.option(
+    "--shard",
+    type=ShardParamType(),
+    default=None,
+    help="Only organize shard i of N of the source, zero based, e.g. 0/4. "
+    "Runs of other shards can share the same destination at the same time.",
+)
+@click.option(
+    "--shard-by",
+    type=click.Choice([ShardStrategy.PATH, ShardStrategy.SUBTREE], case_sensitive=True),
+    default=ShardStrategy.PATH,
+    help="Split the source by hash of the file paths or of the top level folders.",
+)
+@click.option(
+    "--expand-archives",
+    is_flag=True,
+    help="Organize the files inside zip and tar archives too, "
+    "then move the archives to the archives folder.",
+)
+@click.option(
+    "--progress/--no-progress",
+    default=True,
+    show_default=True,
+    help="Show files and bytes done, throughput and ETA on stderr. "
+    "Written as a log line every few seconds when stderr is not a terminal.",
+)
+@click.option(
+    "--include",
+    multiple=True,
+    metavar="GLOB",
+    help="Only organize files matching this glob, e.g. '*.jpg'. Repeatable. "
+    "Globs with a slash match paths relative to the source.",
+)
+@click.option(
+    "--exclude",
+    multiple=True,
+    metavar="GLOB",
+    help="Skip folders and files matching this glob, e.g. 'Exports'. Repeatable. "
+    "Excluded folders are never listed.",
+)
+@click.option(
+    "--no-default-excludes",
+    is_flag=True,
+    help="Also walk " + ", ".join(config.DEFAULT_EXCLUDES) + " folders.",
+)
+@click.option(
+    "--min-size",
+    type=ByteSizeParamType(),
+    default="0",
+    help="Skip files smaller than this size, e.g. 10K.",
+)
+@click.option(
+    "--max-size",
+    type=ByteSizeParamType(),
+    default=None,
+    help="Skip files larger than this size, e.g. 4G.",
+)
+@click.option(
+    "--routing",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+    default=None,
+    callback=load_routing_option,
+    help="TOML routing config of the file categories. Defaults to "
+    "~/.config/media_organizer/routing.toml if it exists, else the built-in one.",
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help="Only list the source folders changed since the last incremental run. "
+    "Every folder is listed again once a day.",
+)
+@click.option(
+    "--full-scan",
+    is_flag=True,
+    help="With --incremental, list every source folder and refresh the snapshots.",
+)
+@click.option(
+    "--durable",
+    is_flag=True,
+    help="Make the moves survive a crash or power loss, syncing the touched "
+    "folders once per batch of moves.",
+)
+@click.option(
+    "--durable-batch-size",
+    type=click.IntRange(min=1),
+    default=config.DURABLE_BATCH_OPERATIONS,
+    show_default=True,
+    help="With --durable, number of moves synced together.",
+)
+@click.option(
+    "--durable-batch-seconds",
+    type=click.FloatRange(min=0),
+    default=config.DURABLE_BATCH_SECONDS,
+    show_default=True,
+    help="With --durable, seconds after which a batch of moves is synced.",
+)
+@click.option(
+    "--time-budget",
+    type=DurationParamType(),
+    default=None,
+    help="Stop organizing after this time, e.g. 45m or 2h, and report what remains.",
+)
+@click.option(
+    "--max-files",
+    type=click.IntRange(min=0),
+    default=None,
+    help="Stop organizing after this number of files.",
+)
+@click.option(
+    "--max-bytes",
+    type=ByteSizeParamType(),
+    default=None,
+    help="Stop organizing before exceeding this size of files, e.g. 50G.",
+)
+@click.option(
+    "--priority",
+    type=click.Choice(
+        [Priority.WALK, Priority.NEWEST, Priority.SMALLEST], case_sensitive=True
+    ),
+    default=Priority.WALK,
+    show_default=True,
+    help="Order of the files within each category. Other orders than walk "
+    "walk the whole source before moving files.",
+)
+@click.option(
+    "--first",
+    multiple=True,
+    metavar="CATEGORY",
+    help="Organize the files of this routing category first, e.g. photos. "
+    "Repeatable, in order.",
+)
+# pylint: disable-next=too-many-arguments,too-many-positional-arguments,too-many-locals
+def organize(
+    source_dir: str,
+    dest_dir: str,
+    fast: bool,
+    dry_run: bool,
+    on_duplicate: OnDuplicate,
+    device_profile: DeviceProfile,
+    max_memory: int,
+    shard: Shard | None,
+    shard_by: ShardStrategy,
+    expand_archives: bool,
+    progress: bool,
+    include: tuple[str, ...],
+    exclude: tuple[str, ...],
+    no_default_excludes: bool,
+    min_size: int,
+    max_size: int | None,
+    routing: RoutingTable,
+    incremental: bool,
+    full_scan: bool,
+    durable: bool,
+    durable_batch_size: int,
+    durable_batch_seconds: float,
+    time_budget: float | None,
+    max_files: int | None,
+    max_bytes: int | None,
+    priority: Priority,
+    first: tuple[str, ...],
 ) -> None:
     """Organize files by type of file, file extension or creation date.
 
+    This is the default command, ``media_organizer SOURCE_DIR`` runs it.
+
     Folder structure:
         Media files are moved into folders structured as
         <destination>/<year>/<date>. Files that do not
@@ -278,14 +797,480 @@ def main(
     """
     source_dir_path: Path = Path(source_dir)
     dest_dir_path: Path = Path(dest_dir)
+    run_progress: Progress | None = Progress() if progress else None
+    rules: WalkRules = WalkRules(
+        include=include,
+        exclude=exclude if no_default_excludes else config.DEFAULT_EXCLUDES + exclude,
+        min_size=min_size,
+        max_size=max_size,
+    )
+    try:
+        check_categories(routing, first)
+    except ValueError as error:
+        raise click.BadParameter(str(error), param_hint="--first") from error
+    budget: RunBudget | None = (
+        RunBudget(time_budget, max_files, max_bytes)
+        if (time_budget, max_files, max_bytes) != (None, None, None)
+        else None
+    )
 
-    move_from_source(
-        source_dir_path,
-        dest_dir_path,
-        fast,
-        dry_run,
-        on_duplicate,
+    durable_batch: DurableBatch | None = (
+        DurableBatch(durable_batch_size, durable_batch_seconds)
+        if durable and not dry_run
+        else None
     )
+    with (
+        use_batch(durable_batch) if durable_batch else nullcontext(),
+        run_progress.share_terminal() if run_progress else nullcontext(),
+    ):
+        move_from_source(
+            source_dir_path,
+            dest_dir_path,
+            fast,
+            dry_run,
+            on_duplicate,
+            device_profile=device_profile,
+            max_memory=max_memory,
+            shard=shard,
+            shard_by=shard_by,
+            expand_archives=expand_archives,
+            progress=run_progress,
+            rules=rules,
+            routing=routing,
+            incremental=incremental,
+            full_scan=full_scan,
+            budget=budget,
+            priority=priority,
+            first=first,
+        )
+    if durable_batch:
+        print(
+            f"[ INFO ] synced {durable_batch.synced_folders} folders "
+            f"in {durable_batch.flushes} batches"
+        )
+    if run_progress:
+        run_progress.finish()
+
+
+@main.command()
+@click.argument(
+    "source_dir", type=click.Path(exists=True, file_okay=False, dir_okay=True)
+)
+@click.argument(
+    "dest_dir",
+    type=click.Path(file_okay=False, dir_okay=True),
+    default=lambda: str(config.get_default_destinition()),
+)
+@click.option("--fast", is_flag=True, help="Use fast mode. Less accurate but faster.")
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    help="Perform a dry run without actual moving. "
+    "Only print out the action that would be taken.",
+)
+@click.option(
+    "--on-duplicate",
+    type=click.Choice(
+        [
+            OnDuplicate.CREATE_UNIQ_FILENAME_IF_CONTENT_MISMATCH,
+            OnDuplicate.CREATE_UNIQ_FILENAME,
+            OnDuplicate.OVERWRITE,
+            OnDuplicate.SKIP,
+        ],
+        case_sensitive=True,
+    ),
+    default=OnDuplicate.CREATE_UNIQ_FILENAME_IF_CONTENT_MISMATCH,
+    help="What to do when file with same name already exists.",
+)
+@click.option(
+    "--device-profile",
+    type=click.Choice(
+        [DeviceProfile.AUTO, DeviceProfile.SSD, DeviceProfile.HDD], case_sensitive=True
+    ),
+    default=DeviceProfile.AUTO,
+    help="I/O concurrency profile of the source and destination devices.",
+)
+@click.option(
+    "--settle",
+    type=click.FloatRange(0),
+    default=config.WATCH_SETTLE_SECONDS,
+    show_default=True,
+    help="Seconds a file must stay unchanged before it is organized.",
+)
+@click.option(
+    "--batch-size",
+    type=click.IntRange(1),
+    default=config.WATCH_BATCH_SIZE,
+    show_default=True,
+    help="Maximum number of files, with their sidecars, organized together.",
+)
+@click.option(
+    "--routing",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+    default=None,
+    callback=load_routing_option,
+    help="TOML routing config of the file categories. Defaults to "
+    "~/.config/media_organizer/routing.toml if it exists, else the built-in one.",
+)
+@click.option(
+    "--durable",
+    is_flag=True,
+    help="Make the moves survive a crash or power loss, syncing the touched "
+    "folders once per batch of moves.",
+)
+@click.option(
+    "--durable-batch-size",
+    type=click.IntRange(min=1),
+    default=config.DURABLE_BATCH_OPERATIONS,
+    show_default=True,
+    help="With --durable, number of moves synced together.",
+)
+@click.option(
+    "--durable-batch-seconds",
+    type=click.FloatRange(min=0),
+    default=config.DURABLE_BATCH_SECONDS,
+    show_default=True,
+    help="With --durable, seconds after which a batch of moves is synced.",
+)
+@click.option(
+    "--exclude",
+    multiple=True,
+    metavar="GLOB",
+    help="Skip folders and files matching this glob, e.g. 'Exports'. Repeatable. "
+    "Excluded folders are never watched.",
+)
+@click.option(
+    "--no-default-excludes",
+    is_flag=True,
+    help="Also watch " + ", ".join(config.DEFAULT_EXCLUDES) + " folders.",
+)
+def watch(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    source_dir: str,
+    dest_dir: str,
+    fast: bool,
+    dry_run: bool,
+    on_duplicate: OnDuplicate,
+    device_profile: DeviceProfile,
+    settle: float,
+    batch_size: int,
+    routing: RoutingTable,
+    durable: bool,
+    durable_batch_size: int,
+    durable_batch_seconds: float,
+    exclude: tuple[str, ...],
+    no_default_excludes: bool,
+) -> None:
+    """Organize the source, then keep organizing files arriving in it.
+
+    New files are noticed with inotify instead of walking the source
+    again, Linux only. A file is organized once it was closed by its
+    writer or moved into the source, and saw no change for the settle
+    time. A photo waits for its .xmp sidecar, so both end up in the same
+    folder. Stop with Ctrl+C.
+    """
+    durable_batch: DurableBatch | None = (
+        DurableBatch(durable_batch_size, durable_batch_seconds)
+        if durable and not dry_run
+        else None
+    )
+    try:
+        with use_batch(durable_batch) if durable_batch else nullcontext():
+            watch_source(
+                Path(source_dir),
+                Path(dest_dir),
+                fast,
+                dry_run,
+                on_duplicate,
+                device_profile=device_profile,
+                settle=settle,
+                batch_size=batch_size,
+                routing=routing,
+                rules=WalkRules(
+                    exclude=(
+                        exclude
+                        if no_default_excludes
+                        else config.DEFAULT_EXCLUDES + exclude
+                    )
+                ),
+            )
+    except KeyboardInterrupt:
+        print("[ INFO ] stopped watching")
+
+
+@main.command("near-duplicates")
+@click.argument(
+    "source_dirs",
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path),
+)
+@click.option(
+    "--algorithm",
+    type=click.Choice([HashAlgorithm.DHASH, HashAlgorithm.PHASH], case_sensitive=True),
+    default=HashAlgorithm.DHASH,
+    help="Perceptual hash algorithm.",
+)
+@click.option(
+    "--radius",
+    type=click.IntRange(0, 64),
+    default=config.NEAR_DUPLICATE_RADIUS,
+    show_default=True,
+    help="Maximum number of differing hash bits between near duplicates.",
+)
+@click.option(
+    "--review-dir",
+    type=click.Path(file_okay=False, dir_okay=True, path_type=Path),
+    default=None,
+    help="Move every copy but the largest file of each group into this folder.",
+)
+@click.option(
+    "--workers", type=click.IntRange(1), default=None, help="Hashing processes."
+)
+@click.option(
+    "--dry-run", is_flag=True, help="Only print the moves to the review folder."
+)
+def near_duplicates(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    source_dirs: tuple[Path, ...],
+    algorithm: HashAlgorithm,
+    radius: int,
+    review_dir: Path | None,
+    workers: int | None,
+    dry_run: bool,
+) -> None:
+    """Report photos that are re-saved or resized copies of each other.
+
+    Photos are compared by perceptual hash, copies that exact content
+    hashes miss are found as well. Groups are printed with the photo
+    most likely to be the original first.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from media_organizer.near_duplicates import (
+        find_near_duplicates,
+        iter_photos,
+        move_to_review,
+        pick_original,
+    )
+
+    groups: list[list[Path]] = find_near_duplicates(
+        iter_photos(source_dirs), algorithm=algorithm, radius=radius, workers=workers
+    )
+    for group_number, group in enumerate(groups, start=1):
+        original: Path = pick_original(group)
+        print(f"[ INFO ] near duplicates group {group_number:05d}")
+        print(f"  keep {original}")
+        for photo_path in group:
+            if photo_path != original:
+                print(f"  copy {photo_path}")
+
+    if review_dir:
+        move_to_review(groups, review_dir=review_dir, dry_run=dry_run)
+
+
+@main.command("dedupe")
+@click.argument(
+    "roots",
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path),
+)
+@click.option(
+    "--action",
+    type=click.Choice(
+        [
+            DedupeAction.REPORT,
+            DedupeAction.DELETE,
+            DedupeAction.HARDLINK,
+            DedupeAction.TRASH,
+        ],
+        case_sensitive=True,
+    ),
+    default=DedupeAction.REPORT,
+    help="What to do with every copy but the kept file.",
+)
+@click.option(
+    "--trash-dir",
+    type=click.Path(file_okay=False, dir_okay=True, path_type=Path),
+    default=None,
+    help="Folder duplicates are moved to by the trash action.",
+)
+@click.option("--workers", type=click.IntRange(1), default=None, help="Hashing threads.")
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    help="Cache hashes per file stat signature, so reruns only hash changed files.",
+)
+@click.option(
+    "--max-memory",
+    type=ByteSizeParamType(),
+    default=f"{config.DEFAULT_MAX_MEMORY // 1024**2}M",
+    show_default=True,
+    help="Memory budget for grouping files by size.",
+)
+@click.option("--dry-run", is_flag=True, help="Only print the actions.")
+def dedupe_command(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    roots: tuple[Path, ...],
+    action: DedupeAction,
+    trash_dir: Path | None,
+    workers: int | None,
+    cache: bool,
+    max_memory: int,
+    dry_run: bool,
+) -> None:
+    """Find files with identical content in the given folders.
+
+    Unlike the on-duplicate handling of organize, identical files with
+    different names are found, e.g. IMG_0001.JPG and IMG_0001 (1).JPG.
+    Files in folders given first are kept, pass the organized library
+    first and the new source second.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from media_organizer.dedupe import HashCache, dedupe
+
+    if action == DedupeAction.TRASH and trash_dir is None:
+        raise click.UsageError("--action trash requires --trash-dir.")
+
+    hash_cache: HashCache | None = (
+        HashCache(config.get_default_cache_dir() / config.HASH_CACHE_FILE_NAME)
+        if cache
+        else None
+    )
+    try:
+        dedupe(
+            list(roots),
+            action=action,
+            trash_dir=trash_dir,
+            dry_run=dry_run,
+            workers=workers,
+            cache=hash_cache,
+            max_memory=max_memory,
+        )
+    finally:
+        if hash_cache:
+            hash_cache.close()
+
+
+@main.command("catalog")
+@click.argument(
+    "dest_dir",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path),
+)
+@click.option("--fast", is_flag=True, help="Use modification times instead of metadata.")
+@click.option(
+    "--device-profile",
+    type=click.Choice(
+        [DeviceProfile.AUTO, DeviceProfile.SSD, DeviceProfile.HDD], case_sensitive=True
+    ),
+    default=DeviceProfile.AUTO,
+    help="I/O concurrency profile of the destination device.",
+)
+@click.option(
+    "--routing",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+    default=None,
+    callback=load_routing_option,
+    help="TOML routing config of the file categories. Defaults to "
+    "~/.config/media_organizer/routing.toml if it exists, else the built-in one.",
+)
+def catalog_command(
+    dest_dir: Path, fast: bool, device_profile: DeviceProfile, routing: RoutingTable
+) -> None:
+    """Record the photos and videos already organized in the destination.
+
+    Organizing keeps the catalog up to date, this command is only needed
+    once for destinations organized before the catalog existed. It reads
+    the date of every file.
+    """
+    recorded: int = build_catalog(
+        dest_dir, fast=fast, device_profile=device_profile, routing=routing
+    )
+    print(f"[ INFO ] recorded {recorded} files in the catalog of {dest_dir}")
+
+
+@main.command()
+@click.argument(
+    "dest_dir",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path),
+)
+@click.option(
+    "--date",
+    "date_prefix",
+    required=True,
+    help="Start of the ISO date of the files, e.g. 2021-06 or 2021-06-13.",
+)
+def query(dest_dir: Path, date_prefix: str) -> None:
+    """Print the organized files of the given date, read from the catalog."""
+    if not get_catalog_path(dest_dir).exists():
+        raise click.UsageError(f"{dest_dir} has no catalog, run the catalog command.")
+    with Catalog(dest_dir) as catalog:
+        for entry in catalog.query(date_prefix):
+            print(dest_dir / entry.path)
+
+
+@main.command()
+@click.argument(
+    "dest_dir",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path),
+)
+@click.option(
+    "--format",
+    "folder_format",
+    required=True,
+    help="strftime format of the date folders, "
+    f"e.g. %Y/%Y_%m for monthly folders. Default layout: {config.DATE_FOLDER_FORMAT}",
+)
+@click.option("--dry-run", is_flag=True, help="Only print the moves.")
+@click.option(
+    "--routing",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False),
+    default=None,
+    callback=load_routing_option,
+    help="TOML routing config of the file categories. Defaults to "
+    "~/.config/media_organizer/routing.toml if it exists, else the built-in one.",
+)
+def relayout_command(
+    dest_dir: Path, folder_format: str, dry_run: bool, routing: RoutingTable
+) -> None:
+    """Move the organized files into date folders of a new format.
+
+    The new folders are computed from the catalog, no metadata is read.
+    Files organized afterwards follow the new format too.
+    """
+    if not get_catalog_path(dest_dir).exists():
+        raise click.UsageError(f"{dest_dir} has no catalog, run the catalog command.")
+    try:
+        check_folder_format(folder_format)
+    except ValueError as error:
+        raise click.BadParameter(str(error), param_hint="--format") from error
+
+    moved, missing = relayout(dest_dir, folder_format, dry_run=dry_run, routing=routing)
+    print(f"[ INFO ] moved {moved} files, {missing} cataloged files were missing")
+
+
+@main.command()
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=lambda: str(config.get_socket_path()),
+    help=f"Unix socket to listen on, defaults to ${config.SOCKET_PATH_ENV}.",
+)
+@click.option(
+    "--exiftool-workers",
+    type=click.IntRange(0),
+    default=config.EXIFTOOL_WORKERS,
+    show_default=True,
+    help="Number of exiftool processes kept running between commands.",
+)
+def serve(socket_path: Path, exiftool_workers: int) -> None:
+    """Keep the organizer warm and run commands sent by media_organizer_client.
+
+    Useful for hooks running the organizer once per import, the client
+    skips the interpreter, import and exiftool startup of every run.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from media_organizer.server import serve as serve_forever
+
+    serve_forever(socket_path, exiftool_workers=exiftool_workers)
 
 
 # TODO: Allow the script to work in threads or multi processes.
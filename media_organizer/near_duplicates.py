@@ -0,0 +1,102 @@
+"""Find re-saved and resized copies of the same photo.
+
+Exact content hashes miss copies that were re-compressed, resized or
+exported again. Photos whose perceptual hashes are within a small
+Hamming radius are grouped together, the hashes are indexed in a
+BK-tree so every lookup only visits a fraction of the library.
+"""
+
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from media_organizer import config
+from media_organizer.bk_tree import BKTree
+from media_organizer.enums import HashAlgorithm, OnDuplicate
+from media_organizer.file_utils import move_file
+from media_organizer.perceptual_hash import iter_photo_hashes
+from media_organizer.walker import walk_source
+
+
+def iter_photos(source_dirs: Iterable[Path]) -> Iterator[Path]:
+    """Yield every photo which can be perceptually hashed in the given folders."""
+    for source_dir in source_dirs:
+        for record in walk_source(source_dir):
+            if record.suffix in config.PERCEPTUAL_HASH_EXTENSIONS:
+                yield record.path
+
+
+def _find_root(parents: list[int], index: int) -> int:
+    """Return the root of the given index in the union-find forest."""
+    while parents[index] != index:
+        parents[index] = parents[parents[index]]
+        index = parents[index]
+    return index
+
+
+def find_near_duplicates(
+    photo_paths: Iterable[Path],
+    algorithm: HashAlgorithm = HashAlgorithm.DHASH,
+    radius: int = config.NEAR_DUPLICATE_RADIUS,
+    workers: int | None = None,
+) -> list[list[Path]]:
+    """Group the given photos which are near duplicates of each other.
+
+    Near duplicates are transitive, if A is close to B and B is close
+    to C, all three end up in the same group.
+
+    Args:
+        photo_paths: Photos to compare with each other.
+        algorithm: Perceptual hash algorithm.
+        radius: Maximum number of differing hash bits of near duplicates.
+        workers: Number of hashing processes, defaults to the number of CPUs.
+
+    Returns:
+        Groups of at least two photos, in the order the photos were given.
+    """
+    tree: BKTree[int] = BKTree()
+    paths: list[Path] = []
+    parents: list[int] = []
+    for photo_path, hash_value in iter_photo_hashes(photo_paths, algorithm, workers):
+        if hash_value is None:
+            continue
+        index: int = len(paths)
+        paths.append(photo_path)
+        parents.append(index)
+        for _, other_index in tree.query(hash_value, radius):
+            parents[_find_root(parents, other_index)] = _find_root(parents, index)
+        tree.add(hash_value, index)
+
+    groups: dict[int, list[Path]] = {}
+    for index, photo_path in enumerate(paths):
+        groups.setdefault(_find_root(parents, index), []).append(photo_path)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def pick_original(group: list[Path]) -> Path:
+    """Return the photo of the group most likely to be the original.
+
+    Copies are usually smaller, re-compressed or downscaled, so the
+    largest file is kept.
+    """
+    return max(group, key=lambda photo_path: photo_path.stat().st_size)
+
+
+def move_to_review(
+    groups: list[list[Path]], review_dir: Path, dry_run: bool = True
+) -> None:
+    """Move every photo but the original of each group into the review folder.
+
+    Each group gets its own numbered sub folder, so related copies stay
+    together for reviewing.
+    """
+    for group_number, group in enumerate(groups, start=1):
+        original: Path = pick_original(group)
+        for photo_path in group:
+            if photo_path == original:
+                continue
+            move_file(
+                src_filepath=photo_path,
+                dst_filepath=review_dir / f"{group_number:05d}" / photo_path.name,
+                dry_run=dry_run,
+                on_duplicate=OnDuplicate.CREATE_UNIQ_FILENAME,
+            )
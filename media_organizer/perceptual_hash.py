@@ -0,0 +1,147 @@
+"""Perceptual hashes of photos.
+
+Unlike content hashes, perceptual hashes of a re-saved or resized copy
+of a photo are equal or differ in only a few bits. Photos are decoded
+at reduced scale (JPEG draft mode) and hashed in batches with numpy,
+the batches are spread across a process pool.
+"""
+
+import os
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import cache
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+
+from media_organizer import config
+from media_organizer.enums import HashAlgorithm
+
+HASH_SIZE: int = 8
+"""Hashes are HASH_SIZE x HASH_SIZE bits, i.e. 64 bit integers."""
+
+PHASH_SCALE: int = 4
+"""The pHash DCT runs on images PHASH_SCALE times larger than the hash."""
+
+
+def get_sample_size(algorithm: HashAlgorithm) -> tuple[int, int]:
+    """Return the (width, height) photos are shrunk to before hashing."""
+    if algorithm == HashAlgorithm.DHASH:
+        return HASH_SIZE + 1, HASH_SIZE
+    return HASH_SIZE * PHASH_SCALE, HASH_SIZE * PHASH_SCALE
+
+
+def load_gray_pixels(photo_path: Path, size: tuple[int, int]) -> np.ndarray:
+    """Decode the given photo in grayscale and shrink it to the given size.
+
+    JPEG photos are decoded at reduced scale using draft mode, which
+    skips most of the decoding work of large photos.
+
+    Raises:
+        OSError: The photo cannot be read or decoded.
+    """
+    with Image.open(photo_path) as img:
+        img.draft("L", (size[0] * 4, size[1] * 4))
+        gray = img.convert("L").resize(size, Image.Resampling.LANCZOS)
+        return np.asarray(gray, dtype=np.float32)
+
+
+def _pack_bits(bits: np.ndarray) -> list[int]:
+    """Pack every row of 64 booleans into an integer."""
+    packed: np.ndarray = np.packbits(bits.reshape(len(bits), -1), axis=1)
+    return [int(value) for value in packed.view(">u8").reshape(-1)]
+
+
+def dhash_batch(pixels: np.ndarray) -> list[int]:
+    """Return the difference hash of every image of the given batch.
+
+    Args:
+        pixels: Grayscale images of shape (N, HASH_SIZE, HASH_SIZE + 1).
+    """
+    return _pack_bits(pixels[:, :, 1:] > pixels[:, :, :-1])
+
+
+@cache
+def _dct_matrix(size: int) -> np.ndarray:
+    """Return the orthonormal DCT-II matrix of the given size."""
+    rows: np.ndarray = np.arange(size)[:, None]
+    cols: np.ndarray = np.arange(size)[None, :]
+    matrix: np.ndarray = np.cos(np.pi * (2 * cols + 1) * rows / (2 * size))
+    matrix[0] /= np.sqrt(2)
+    return (matrix * np.sqrt(2 / size)).astype(np.float32)
+
+
+def phash_batch(pixels: np.ndarray) -> list[int]:
+    """Return the DCT based perceptual hash of every image of the given batch.
+
+    Args:
+        pixels: Grayscale images of shape (N, S, S) with S = HASH_SIZE * PHASH_SCALE.
+    """
+    dct: np.ndarray = _dct_matrix(pixels.shape[1])
+    coefficients: np.ndarray = dct @ pixels @ dct.T
+    low: np.ndarray = coefficients[:, :HASH_SIZE, :HASH_SIZE].reshape(len(pixels), -1)
+    # The DC coefficient only carries the mean brightness.
+    medians: np.ndarray = np.median(low[:, 1:], axis=1)
+    return _pack_bits(low > medians[:, None])
+
+
+def hash_photos(
+    photo_paths: list[Path], algorithm: HashAlgorithm
+) -> list[tuple[Path, int | None]]:
+    """Return the perceptual hash of every given photo, None if unreadable."""
+    size: tuple[int, int] = get_sample_size(algorithm)
+    loaded_paths: list[Path] = []
+    samples: list[np.ndarray] = []
+    for photo_path in photo_paths:
+        try:
+            samples.append(load_gray_pixels(photo_path, size))
+        except (OSError, UnidentifiedImageError, ValueError) as error:
+            print(f"[ WARNING ] cannot decode {photo_path}, error: {error}")
+            continue
+        loaded_paths.append(photo_path)
+
+    hashes: dict[Path, int] = {}
+    if samples:
+        batch: np.ndarray = np.stack(samples)
+        batch_hashes: list[int] = (
+            dhash_batch(batch) if algorithm == HashAlgorithm.DHASH else phash_batch(batch)
+        )
+        hashes = dict(zip(loaded_paths, batch_hashes))
+    return [(photo_path, hashes.get(photo_path)) for photo_path in photo_paths]
+
+
+def iter_photo_hashes(
+    photo_paths: Iterable[Path],
+    algorithm: HashAlgorithm = HashAlgorithm.DHASH,
+    workers: int | None = None,
+    batch_size: int = config.PERCEPTUAL_HASH_BATCH_SIZE,
+) -> Iterator[tuple[Path, int | None]]:
+    """Hash the given photos in batches spread across a process pool.
+
+    At most twice as many batches as workers are in flight, so the
+    given paths are consumed lazily.
+
+    Args:
+        photo_paths: Photos to hash.
+        algorithm: Perceptual hash algorithm.
+        workers: Number of processes, defaults to the number of CPUs.
+        batch_size: Number of photos hashed together by one process.
+
+    Yields:
+        Every photo path alongside its hash, None if it cannot be decoded.
+    """
+    paths_iter: Iterator[Path] = iter(photo_paths)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        max_pending: int = 2 * workers
+        pending: list[Future[list[tuple[Path, int | None]]]] = []
+        while True:
+            while len(pending) < max_pending and (
+                batch := list(islice(paths_iter, batch_size))
+            ):
+                pending.append(executor.submit(hash_photos, batch, algorithm))
+            if not pending:
+                return
+            yield from pending.pop(0).result()
@@ -0,0 +1,280 @@
+"""Live progress of a run: files and bytes done, throughput per stage and ETA.
+
+Counting a file only adds to two integers and compares the clock with
+the next refresh time, the progress is rendered at most once per
+refresh interval. On a terminal a single status line is redrawn on
+stderr, otherwise a log line is printed every few seconds. While the
+status line is shown, see `Progress.share_terminal`, it is cleared
+before anything is printed to stdout and redrawn at the next refresh.
+
+Totals come from a pre-count walking the source in a background thread
+while the run already starts. Until it finished, no ETA is shown.
+"""
+
+import io
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager, redirect_stdout
+from datetime import timedelta
+from pathlib import Path
+from typing import TextIO
+
+from media_organizer import config
+from media_organizer.enums import ProgressStage
+from media_organizer.walker import FileRecord, WalkRules, walk_source
+
+
+def format_megabytes(size: float) -> str:
+    """Return the given number of bytes in megabytes, e.g. ``12.3 MB``."""
+    return f"{size / 1024**2:.1f} MB"
+
+
+class StageCounter:  # pylint: disable=too-few-public-methods
+    """Files and bytes done by one stage, with their smoothed throughput."""
+
+    __slots__ = (
+        "files",
+        "bytes",
+        "files_rate",
+        "bytes_rate",
+        "_last_files",
+        "_last_bytes",
+    )
+
+    def __init__(self) -> None:
+        self.files: int = 0
+        self.bytes: int = 0
+        self.files_rate: float | None = None
+        self.bytes_rate: float | None = None
+        self._last_files: int = 0
+        self._last_bytes: int = 0
+
+    def update_rates(self, elapsed: float) -> None:
+        """Measure the throughput since the last update, elapsed seconds ago."""
+        if elapsed <= 0:
+            return
+        files_rate: float = (self.files - self._last_files) / elapsed
+        bytes_rate: float = (self.bytes - self._last_bytes) / elapsed
+        self._last_files, self._last_bytes = self.files, self.bytes
+        if self.files_rate is None or self.bytes_rate is None:
+            self.files_rate, self.bytes_rate = files_rate, bytes_rate
+            return
+        weight: float = config.PROGRESS_RATE_SMOOTHING
+        self.files_rate = weight * files_rate + (1 - weight) * self.files_rate
+        self.bytes_rate = weight * bytes_rate + (1 - weight) * self.bytes_rate
+
+
+class Progress:  # pylint: disable=too-many-instance-attributes
+    """Progress of the files of a run through the stages of `ProgressStage`."""
+
+    def __init__(
+        self,
+        stream: TextIO | None = None,
+        interval: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize the progress, the clock starts now.
+
+        Args:
+            stream: Where the progress is written, stderr by default.
+            interval: Seconds between renders, by default depending on
+                whether the stream is a terminal.
+            clock: Monotonic clock, replaced in tests.
+        """
+        self.stream: TextIO = stream if stream is not None else sys.stderr
+        self.is_tty: bool = self.stream.isatty()
+        if interval is None:
+            interval = (
+                config.PROGRESS_REFRESH_SECONDS
+                if self.is_tty
+                else config.PROGRESS_LOG_INTERVAL_SECONDS
+            )
+        self.interval: float = interval
+        self.clock: Callable[[], float] = clock
+        self.counters: dict[ProgressStage, StageCounter] = {
+            stage: StageCounter() for stage in ProgressStage
+        }
+        self.total_files: int | None = None
+        self.total_bytes: int | None = None
+        self._start: float = clock()
+        self._last_render: float = self._start
+        self._next_render: float = self._start + interval
+        self._line_shown: bool = False
+        self._stream_lock: threading.Lock = threading.Lock()
+
+    def start_precount(
+        self,
+        source_dir: Path,
+        keep: Callable[[FileRecord], bool] | None = None,
+        rules: WalkRules | None = None,
+    ) -> threading.Thread:
+        """Count the files and bytes of the source in a background thread.
+
+        See `precount` for the arguments.
+        """
+        thread = threading.Thread(
+            target=self.precount,
+            args=(source_dir, keep, rules),
+            name="precount",
+            daemon=True,
+        )
+        thread.start()
+        return thread
+
+    def precount(
+        self,
+        source_dir: Path,
+        keep: Callable[[FileRecord], bool] | None = None,
+        rules: WalkRules | None = None,
+    ) -> None:
+        """Count the files and bytes of the source, setting the totals.
+
+        Args:
+            source_dir: The walked source.
+            keep: Filter telling which files the run organizes, e.g. the
+                files of its shard. All files by default.
+            rules: Folders and files skipped by the run's walk.
+        """
+        files: int = 0
+        size: int = 0
+        for record in walk_source(source_dir, rules):
+            if keep is None or keep(record):
+                files += 1
+                size += record.size
+        self.total_files, self.total_bytes = files, size
+
+    def add(self, stage: ProgressStage, size: int) -> None:
+        """Count one file of the given size done by the given stage."""
+        counter: StageCounter = self.counters[stage]
+        counter.files += 1
+        counter.bytes += size
+        now: float = self.clock()
+        if now >= self._next_render:
+            self.render(now)
+
+    def track(
+        self, records: Iterable[FileRecord], stage: ProgressStage
+    ) -> Iterator[FileRecord]:
+        """Yield the given records, counting them for the given stage."""
+        for record in records:
+            self.add(stage, record.size)
+            yield record
+
+    def get_eta(self) -> timedelta | None:
+        """Return the time left at the current pace, None if unknown."""
+        done: StageCounter = self.counters[ProgressStage.MOVE]
+        if self.total_bytes and done.bytes_rate:
+            seconds: float = max(0, self.total_bytes - done.bytes) / done.bytes_rate
+        elif self.total_files and done.files_rate:
+            seconds = max(0, self.total_files - done.files) / done.files_rate
+        else:
+            return None
+        return timedelta(seconds=round(seconds))
+
+    def format_line(self) -> str:
+        """Return the current progress as a single line."""
+        done: StageCounter = self.counters[ProgressStage.MOVE]
+        if self.total_files is None or self.total_bytes is None:
+            parts: list[str] = [
+                f"{done.files} files, {format_megabytes(done.bytes)} (counting)"
+            ]
+        else:
+            percent: float = (
+                100 * done.bytes / self.total_bytes
+                if self.total_bytes
+                else 100 * done.files / max(1, self.total_files)
+            )
+            parts = [
+                f"{done.files}/{self.total_files} files, "
+                f"{format_megabytes(done.bytes)}/{format_megabytes(self.total_bytes)} "
+                f"({percent:.0f}%)"
+            ]
+        for stage, counter in self.counters.items():
+            parts.append(
+                f"{stage} {counter.files_rate or 0:.0f} files/s "
+                f"{format_megabytes(counter.bytes_rate or 0)}/s"
+            )
+        eta: timedelta | None = self.get_eta()
+        parts.append(f"ETA {eta if eta is not None else '?'}")
+        return " | ".join(parts)
+
+    def render(self, now: float) -> None:
+        """Measure the throughputs and write the progress."""
+        for counter in self.counters.values():
+            counter.update_rates(now - self._last_render)
+        self._last_render = now
+        self._next_render = now + self.interval
+        line: str = self.format_line()
+        with self._stream_lock:
+            if self.is_tty:
+                # Printed lines first, the status line stays below them.
+                sys.stdout.flush()
+                self.stream.write(f"\r{line}\x1b[K")
+                self._line_shown = True
+            else:
+                self.stream.write(f"[ PROGRESS ] {line}\n")
+            self.stream.flush()
+
+    def clear_line(self) -> None:
+        """Erase the status line from the terminal, if shown."""
+        with self._stream_lock:
+            if self._line_shown:
+                self.stream.write("\r\x1b[K")
+                self.stream.flush()
+                self._line_shown = False
+
+    @contextmanager
+    def share_terminal(self) -> Iterator[None]:
+        """Clear the status line before anything is printed to stdout in the context."""
+        if not self.is_tty:
+            yield
+            return
+        with redirect_stdout(StatusLineClearingWriter(sys.stdout, self)):
+            yield
+
+    def finish(self) -> None:
+        """Write the summary of the whole run."""
+        elapsed: float = max(self.clock() - self._start, 1e-9)
+        done: StageCounter = self.counters[ProgressStage.MOVE]
+        summary: str = (
+            f"{done.files} files, {format_megabytes(done.bytes)} "
+            f"in {timedelta(seconds=round(elapsed))} "
+            f"({done.files / elapsed:.0f} files/s, "
+            f"{format_megabytes(done.bytes / elapsed)}/s)"
+        )
+        if self.is_tty:
+            self.stream.write(f"\r{summary}\x1b[K\n")
+            self._line_shown = False
+        else:
+            self.stream.write(f"[ PROGRESS ] done: {summary}\n")
+        self.stream.flush()
+
+
+class StatusLineClearingWriter(io.TextIOBase):
+    """Stdout of a run clearing the progress status line before every write."""
+
+    def __init__(self, wrapped: TextIO, progress: Progress) -> None:
+        super().__init__()
+        self.wrapped: TextIO = wrapped
+        self.progress: Progress = progress
+
+    @property
+    def encoding(self) -> str:  # type: ignore[override]
+        """Return the encoding of the wrapped stdout."""
+        return self.wrapped.encoding
+
+    def write(self, text: str) -> int:
+        """Clear the status line, then write the given text."""
+        self.progress.clear_line()
+        return self.wrapped.write(text)
+
+    def flush(self) -> None:
+        self.wrapped.flush()
+
+    def isatty(self) -> bool:
+        return self.wrapped.isatty()
+
+    def fileno(self) -> int:
+        return self.wrapped.fileno()
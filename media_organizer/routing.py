@@ -0,0 +1,222 @@
+"""Routing of files into the category folders of the destination.
+
+Categories, their extensions, date strategies and folder templates are
+read from a TOML file, ``routing.toml`` next to this module by default.
+The file is compiled once into a single dict from extension to
+`Route`, so routing a file is one dict lookup.
+"""
+
+import os
+import tomllib
+from dataclasses import dataclass
+from datetime import datetime
+from functools import cache
+from importlib import resources
+from pathlib import Path
+from typing import Any, Final
+
+from media_organizer import config
+from media_organizer.date_fetcher import get_accurate_media_date, get_fast_date
+from media_organizer.enums import DateSource
+from media_organizer.walker import FileRecord
+
+EXTENSION_PLACEHOLDER: Final[str] = "{ext}"
+"""Replaced by the extension of the file, without the dot, in templates."""
+
+
+def check_folder_format(folder_format: str) -> None:
+    """Raise a ValueError if the given format does not give relative folders."""
+    folder: Path = Path(
+        datetime(2000, 1, 2, 3, 4, 5).strftime(
+            folder_format.replace(EXTENSION_PLACEHOLDER, "ext")
+        )
+    )
+    if folder.is_absolute() or ".." in folder.parts:
+        raise ValueError(f"{folder_format!r} must give folders below the destination.")
+
+
+@dataclass(frozen=True, slots=True)
+class Route:
+    """Where the files of one category go and how they are dated."""
+
+    category: str
+    folder: str
+    """Category folder, relative to the destination."""
+
+    date_strategy: DateSource = DateSource.NONE
+    template: str | None = None
+    """Folders below the category folder, None for the destination's date format."""
+
+    sidecars: bool = False
+    """Move darktable sidecars along with the files."""
+
+    @property
+    def is_dated(self) -> bool:
+        """Return True if files of the category are organized by date."""
+        return self.date_strategy != DateSource.NONE
+
+    def read_date(self, file_path: Path, fast: bool) -> datetime | None:
+        """Read the date of the given file following the date strategy."""
+        if self.date_strategy == DateSource.NONE:
+            return None
+        if fast or self.date_strategy == DateSource.MTIME:
+            return get_fast_date(file_path)
+        return get_accurate_media_date(file_path)
+
+    def get_date_source(self, date: datetime | None, fast: bool) -> DateSource:
+        """Return where a date read by `read_date` comes from."""
+        if date is None:
+            return DateSource.NONE
+        return DateSource.MTIME if fast else self.date_strategy
+
+    def get_template(
+        self, file_name: str, folder_format: str = config.DATE_FOLDER_FORMAT
+    ) -> str:
+        """Return the folder template of a file of the given name.
+
+        Args:
+            file_name: Name of the file, its extension replaces ``{ext}``.
+            folder_format: Date folder format of the destination, used
+                when the route has no template.
+        """
+        template: str = self.template if self.template is not None else folder_format
+        extension: str = os.path.splitext(file_name)[1].lstrip(".")
+        return template.replace(EXTENSION_PLACEHOLDER, extension)
+
+    def get_folder(
+        self,
+        dest_dir: Path,
+        file_name: str,
+        date: datetime | None,
+        folder_format: str = config.DATE_FOLDER_FORMAT,
+    ) -> Path:
+        """Return the folder a file of the given name and date goes into.
+
+        Files of dated categories without a date, and files of undated
+        categories without a template, go into the category folder
+        itself. See `get_template` for the arguments.
+        """
+        base_dir: Path = dest_dir / self.folder
+        if date is not None:
+            return base_dir / date.strftime(self.get_template(file_name, folder_format))
+        if self.is_dated or self.template is None:
+            return base_dir
+        return base_dir / self.get_template(file_name)
+
+
+class RoutingTable:
+    """Routes of every known extension, and of the others."""
+
+    def __init__(self, routes: dict[str, Route], fallback: Route) -> None:
+        self.routes: dict[str, Route] = routes
+        self.fallback: Route = fallback
+
+    @classmethod
+    def from_toml(cls, raw_config: dict[str, Any]) -> "RoutingTable":
+        """Compile the given parsed TOML routing config.
+
+        Raises:
+            ValueError: The config is invalid, e.g. an extension belongs
+                to two categories or a date strategy is unknown.
+        """
+        routes: dict[str, Route] = {}
+        for category, raw_route in raw_config.get("categories", {}).items():
+            route: Route = parse_route(category, raw_route)
+            for extension in raw_route.get("extensions", []):
+                extension = extension.lower()
+                if not extension.startswith("."):
+                    extension = f".{extension}"
+                if extension in routes:
+                    raise ValueError(
+                        f"{extension} belongs to both {routes[extension].category} "
+                        f"and {category}."
+                    )
+                routes[extension] = route
+        fallback: Route = parse_route(
+            "fallback",
+            raw_config.get(
+                "fallback",
+                {"folder": config.UNSORT_FOLDER_NAME, "template": EXTENSION_PLACEHOLDER},
+            ),
+        )
+        return cls(routes, fallback)
+
+    def lookup(self, file_name: str) -> Route:
+        """Return the route of the given file name or extension."""
+        suffix: str = os.path.splitext(file_name)[1]
+        route: Route | None = self.routes.get(suffix)
+        if route is None:
+            route = self.routes.get(suffix.lower(), self.fallback)
+        return route
+
+    def needs_date(self, record: FileRecord) -> bool:
+        """Return True if the given file is organized by its date."""
+        return self.lookup(record.name).is_dated
+
+    def read_date(self, file_path: Path, fast: bool) -> datetime | None:
+        """Read the date of the given file following the date strategy of its route."""
+        return self.lookup(file_path.name).read_date(file_path, fast)
+
+    def get_dated_routes(self) -> dict[str, Route]:
+        """Return the routes of the categories organized by date, by folder."""
+        return {route.folder: route for route in self.routes.values() if route.is_dated}
+
+    def get_folders(self) -> set[str]:
+        """Return the category folders of every route, the fallback included."""
+        return {route.folder for route in self.routes.values()} | {self.fallback.folder}
+
+
+def parse_route(category: str, raw_route: dict[str, Any]) -> Route:
+    """Return the route of the given category of a TOML routing config."""
+    try:
+        folder: str = raw_route["folder"]
+        date_strategy: DateSource = DateSource(raw_route.get("date", DateSource.NONE))
+    except KeyError as error:
+        raise ValueError(f"category {category} has no {error}.") from error
+    except ValueError as error:
+        raise ValueError(
+            f"category {category} has an unknown date strategy, {error}."
+        ) from error
+    check_folder_format(folder)
+    template: str | None = raw_route.get("template")
+    if template is not None:
+        check_folder_format(template)
+    return Route(
+        category=category,
+        folder=folder,
+        date_strategy=date_strategy,
+        template=template,
+        sidecars=bool(raw_route.get("sidecars", False)),
+    )
+
+
+def load_routing(routing_path: Path | None = None) -> RoutingTable:
+    """Load and compile the given TOML routing config.
+
+    Without a path, the user's routing config is used if it exists,
+    otherwise the default one, see `config.get_user_routing_path`.
+
+    Raises:
+        ValueError: The config is invalid.
+    """
+    if routing_path is None:
+        user_path: Path = config.get_user_routing_path()
+        if not user_path.exists():
+            return get_default_routing()
+        routing_path = user_path
+    with open(routing_path, "rb") as routing_file:
+        try:
+            return RoutingTable.from_toml(tomllib.load(routing_file))
+        except (tomllib.TOMLDecodeError, ValueError) as error:
+            raise ValueError(f"invalid routing config {routing_path}: {error}") from error
+
+
+@cache
+def get_default_routing() -> RoutingTable:
+    """Return the routing table of the ``routing.toml`` shipped with the package."""
+    raw_config: str = (
+        resources.files("media_organizer")
+        .joinpath(config.ROUTING_FILE_NAME)
+        .read_text(encoding="utf-8")
+    )
+    return RoutingTable.from_toml(tomllib.loads(raw_config))
@@ -0,0 +1,183 @@
+"""Serve commands from a long lived organizer process.
+
+Hooks like a camera import udev rule run the organizer once per card.
+Instead of paying interpreter startup, imports and exiftool startup on
+every run, ``media_organizer serve`` keeps them warm and runs commands
+sent by the thin client in `media_organizer.client` over a Unix socket.
+
+Protocol: the client sends one JSON line ``{"argv": [...], "cwd": "..."}``.
+The server answers with JSON lines ``{"output": "..."}`` while the command
+runs and a last line ``{"exit_code": 0}``.
+"""
+
+import importlib
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import traceback
+from contextlib import ExitStack, redirect_stderr, redirect_stdout
+from pathlib import Path
+from typing import Any, Final
+
+import click
+
+from media_organizer.exiftool import ExifToolPool, use_pool
+
+PRELOADED_MODULES: Final[list[str]] = [
+    "piexif",
+    "imohash",
+    "media_organizer.dedupe",
+    "media_organizer.near_duplicates",
+]
+"""Modules imported lazily by the commands, imported once by the server."""
+
+
+class ResponseWriter(io.TextIOBase):
+    """Text stream sending everything written to it to the client."""
+
+    def __init__(self, stream: io.BufferedIOBase) -> None:
+        super().__init__()
+        self.stream: io.BufferedIOBase = stream
+
+    def send(self, response: dict[str, Any]) -> None:
+        """Send the given response as one JSON line."""
+        self.stream.write(json.dumps(response).encode("utf-8") + b"\n")
+        self.stream.flush()
+
+    def write(self, text: str) -> int:  # type: ignore[override]
+        # click probes streams with an empty bytes write to detect binary ones.
+        if not isinstance(text, str):
+            raise TypeError(f"write() argument must be str, not {type(text).__name__}")
+        if text:
+            self.send({"output": text})
+        return len(text)
+
+    def isatty(self) -> bool:
+        return False
+
+
+def run_command(argv: list[str], cwd: str, output: io.TextIOBase) -> int:
+    """Run the given command line in this process and return its exit code.
+
+    Requests are handled one at a time, so the working directory and the
+    standard streams can be switched for the duration of the command.
+    """
+    # Imported here, the command line module imports this module lazily.
+    # pylint: disable-next=import-outside-toplevel,cyclic-import
+    from media_organizer.media_organizer import main
+
+    if argv[:1] == ["serve"]:
+        output.write("Error: the server cannot start another server.\n")
+        return 2
+
+    previous_cwd: str = os.getcwd()
+    with redirect_stdout(output), redirect_stderr(output):
+        try:
+            os.chdir(cwd)
+            result = main.main(
+                args=argv, prog_name="media_organizer", standalone_mode=False
+            )
+            return result if isinstance(result, int) else 0
+        except click.exceptions.Exit as error:
+            return error.exit_code
+        except click.ClickException as error:
+            error.show()
+            return error.exit_code
+        except click.Abort:
+            output.write("Aborted!\n")
+            return 1
+        except Exception:  # pylint: disable=broad-exception-caught
+            traceback.print_exc(file=output)
+            return 1
+        finally:
+            os.chdir(previous_cwd)
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """Run one command sent by a client."""
+
+    def handle(self) -> None:
+        try:
+            request: dict[str, Any] = json.loads(self.rfile.readline())
+            argv: list[str] = [str(arg) for arg in request["argv"]]
+            cwd: str = str(request["cwd"])
+        except (ValueError, KeyError, TypeError) as error:
+            print(f"[ WARNING ] invalid request, error: {error}")
+            return
+
+        writer: ResponseWriter = ResponseWriter(self.wfile)
+        print(f"[ INFO ] running media_organizer {' '.join(argv)} in {cwd}")
+        try:
+            exit_code: int = run_command(argv, cwd, writer)
+            writer.send({"exit_code": exit_code})
+        except BrokenPipeError:
+            print("[ WARNING ] client disconnected before the command finished")
+
+
+def is_server_running(socket_path: Path) -> bool:
+    """Return True if a server accepts connections on the given socket."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(str(socket_path))
+        except OSError:
+            return False
+    return True
+
+
+def create_server(socket_path: Path) -> socketserver.UnixStreamServer:
+    """Bind a server to the given socket, only accessible by the current user.
+
+    Raises:
+        click.ClickException: Another server is already running.
+    """
+    if socket_path.exists():
+        if is_server_running(socket_path):
+            raise click.ClickException(f"A server is already running on {socket_path}.")
+        socket_path.unlink()
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    previous_umask: int = os.umask(0o177)
+    try:
+        return socketserver.UnixStreamServer(str(socket_path), RequestHandler)
+    finally:
+        os.umask(previous_umask)
+
+
+def _raise_keyboard_interrupt(*_: Any) -> None:
+    """Stop serving on SIGTERM like on Ctrl+C."""
+    raise KeyboardInterrupt
+
+
+def serve(socket_path: Path, exiftool_workers: int) -> None:
+    """Serve commands on the given socket until interrupted.
+
+    Args:
+        socket_path: Unix socket the clients connect to.
+        exiftool_workers: Number of exiftool processes kept running,
+            0 starts exiftool once per file like the standalone command.
+    """
+    for module_name in PRELOADED_MODULES:
+        importlib.import_module(module_name)
+
+    with ExitStack() as stack:
+        if exiftool_workers:
+            try:
+                pool: ExifToolPool = ExifToolPool(size=exiftool_workers)
+            except FileNotFoundError:
+                print("[ WARNING ] exiftool not found, serving without exiftool workers")
+            else:
+                stack.callback(pool.close)
+                stack.enter_context(use_pool(pool))
+
+        server: socketserver.UnixStreamServer = create_server(socket_path)
+        stack.callback(socket_path.unlink, missing_ok=True)
+        stack.enter_context(server)
+
+        signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+        print(f"[ INFO ] serving on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("[ INFO ] stopping the server")
@@ -0,0 +1,204 @@
+"""Snapshots of the source directories, to only list folders that changed.
+
+Adding, removing or renaming an entry of a directory updates the
+modification time of that directory, and only of that directory. A
+walk with snapshots stats every directory, but only lists the ones whose
+modification time or inode changed since the last run. The
+subdirectories of unchanged directories are taken from their snapshot,
+so they are still visited: a change deep down the tree does not show on
+its parents.
+
+Changes within a file, or timestamps set back by hand, do not show on
+the directory. Every ``config.SNAPSHOT_FULL_SCAN_SECONDS`` the whole
+source is listed again, refreshing every snapshot.
+
+Snapshots are stored in the state folder of the destination, one set
+per source, walk rules and shard, see `get_snapshot_scope`.
+"""
+
+import os
+import sqlite3
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+from media_organizer import config
+
+SUBDIRS_SEPARATOR: str = "/"
+"""Separates the subdirectory names of a snapshot, never part of a name."""
+
+
+def get_snapshots_path(dest_dir: Path) -> Path:
+    """Return the snapshots file of the given destination."""
+    return dest_dir / config.STATE_FOLDER_NAME / config.SNAPSHOTS_FILE_NAME
+
+
+def get_snapshot_scope(source_dir: Path, *walk_keys: str) -> str:
+    """Return the key of the snapshots of the walks of the given source.
+
+    Args:
+        source_dir: The walked source.
+        walk_keys: Identify what the walk skips, e.g. its walk rules and
+            its shard. Files skipped by other rules or shards were not
+            organized, their folders must be listed again by such walks.
+    """
+    return "|".join((str(source_dir.resolve()), *walk_keys))
+
+
+@dataclass(frozen=True, slots=True)
+class DirSnapshot:
+    """A directory as it was when last listed."""
+
+    mtime_ns: int
+    ino: int
+    entries: int
+    """Number of listed entries, skipped ones included."""
+
+    subdirs: tuple[str, ...]
+    """Names of the walked subdirectories."""
+
+    def matches(self, dir_stat: os.stat_result) -> bool:
+        """Return True if the directory did not change since the snapshot."""
+        return dir_stat.st_mtime_ns == self.mtime_ns and dir_stat.st_ino == self.ino
+
+
+class SnapshotStore:  # pylint: disable=too-many-instance-attributes
+    """Directory snapshots of the walks of one source, see `get_snapshot_scope`.
+
+    The snapshots seen by a walk are only stored by `save`, once every
+    walked file was organized.
+    """
+
+    def __init__(
+        self,
+        dest_dir: Path,
+        scope: str,
+        full_scan: bool = False,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Open the snapshots of the given scope.
+
+        Args:
+            dest_dir: The destination holding the snapshots.
+            scope: The key of the walk, see `get_snapshot_scope`.
+            full_scan: List every directory, even if a full scan is not due.
+            clock: Wall clock, replaced in tests.
+        """
+        snapshots_path: Path = get_snapshots_path(dest_dir)
+        snapshots_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection: sqlite3.Connection = sqlite3.connect(snapshots_path, timeout=60)
+        self.connection.executescript(
+            "CREATE TABLE IF NOT EXISTS dirs ("
+            "scope TEXT, path TEXT, mtime_ns INTEGER, ino INTEGER, entries INTEGER, "
+            "subdirs TEXT, PRIMARY KEY (scope, path));"
+            "CREATE TABLE IF NOT EXISTS scans (scope TEXT PRIMARY KEY, full_scan REAL);"
+        )
+        self.scope: str = scope
+        self.now: float = clock()
+        row = self.connection.execute(
+            "SELECT full_scan FROM scans WHERE scope = ?", (scope,)
+        ).fetchone()
+        self.verify: bool = (
+            full_scan
+            or row is None
+            or self.now - row[0] >= config.SNAPSHOT_FULL_SCAN_SECONDS
+        )
+        """List every directory, reporting the changes the snapshots missed."""
+
+        self.listed: int = 0
+        self.skipped: int = 0
+        self.missed: int = 0
+        self._seen: list[tuple[str, int, int, int, str]] = []
+
+    def __enter__(self) -> "SnapshotStore":
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def get(self, relative_dir: str) -> DirSnapshot | None:
+        """Return the snapshot of the given directory, relative to the source."""
+        row = self.connection.execute(
+            "SELECT mtime_ns, ino, entries, subdirs FROM dirs "
+            "WHERE scope = ? AND path = ?",
+            (self.scope, relative_dir),
+        ).fetchone()
+        if row is None:
+            return None
+        mtime_ns, ino, entries, subdirs = row
+        return DirSnapshot(
+            mtime_ns,
+            ino,
+            entries,
+            tuple(subdirs.split(SUBDIRS_SEPARATOR) if subdirs else ()),
+        )
+
+    def keep(self, relative_dir: str, snapshot: DirSnapshot) -> None:
+        """Keep the snapshot of a directory skipped because it did not change."""
+        self.skipped += 1
+        self._add(relative_dir, snapshot)
+
+    def record(  # pylint: disable=too-many-arguments
+        self,
+        relative_dir: str,
+        dir_stat: os.stat_result,
+        previous: DirSnapshot | None,
+        *,
+        subdirs: Iterable[str],
+        entries: int,
+    ) -> None:
+        """Record a listed directory.
+
+        Args:
+            relative_dir: The directory, relative to the source.
+            dir_stat: Its stat data, taken before listing it.
+            previous: Its snapshot of the previous run, if any.
+            subdirs: Names of its walked subdirectories.
+            entries: Number of its entries.
+        """
+        self.listed += 1
+        if previous and previous.matches(dir_stat) and previous.entries != entries:
+            self.missed += 1
+            print(f"[ WARNING ] snapshot missed changes in {relative_dir or '.'}")
+        # Entries added in the same clock tick as the listing would not
+        # change the modification time, such directories are listed again.
+        if self.now - dir_stat.st_mtime < config.SNAPSHOT_SETTLE_SECONDS:
+            return
+        self._add(
+            relative_dir,
+            DirSnapshot(dir_stat.st_mtime_ns, dir_stat.st_ino, entries, tuple(subdirs)),
+        )
+
+    def _add(self, relative_dir: str, snapshot: DirSnapshot) -> None:
+        """Stage the snapshot of a directory seen by the walk."""
+        self._seen.append(
+            (
+                relative_dir,
+                snapshot.mtime_ns,
+                snapshot.ino,
+                snapshot.entries,
+                SUBDIRS_SEPARATOR.join(snapshot.subdirs),
+            )
+        )
+
+    def save(self) -> None:
+        """Replace the stored snapshots by the ones seen by the walk.
+
+        Directories not seen anymore, e.g. removed ones, are dropped.
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM dirs WHERE scope = ?", (self.scope,))
+            self.connection.executemany(
+                "INSERT INTO dirs VALUES (?, ?, ?, ?, ?, ?)",
+                ((self.scope, *row) for row in self._seen),
+            )
+            if self.verify:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO scans VALUES (?, ?)", (self.scope, self.now)
+                )
+        self._seen.clear()
+
+    def close(self) -> None:
+        """Close the snapshots, unsaved ones are dropped."""
+        self.connection.close()
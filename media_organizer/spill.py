@@ -0,0 +1,146 @@
+"""Keep large intermediate state within a memory budget.
+
+Stages holding plans, candidates or indexes over the whole source use
+these helpers. Items are kept in memory until the budget is reached,
+then written to temporary files and streamed back when iterated.
+"""
+
+import heapq
+import os
+import pickle
+import tempfile
+from collections.abc import Callable, Iterable, Iterator
+from itertools import islice
+from pathlib import Path
+from typing import IO, Any, Generic, TypeVar
+
+from media_organizer import config
+
+T = TypeVar("T")
+
+
+def get_max_items(max_memory: int, item_size: int = config.FILE_RECORD_SIZE) -> int:
+    """Return how many items of the given size fit into the given memory budget."""
+    return max(1, max_memory // item_size)
+
+
+def _dump_items(items: Iterable[Any], spill_dir: Path | None) -> IO[bytes]:
+    """Write the given items to a new temporary file, rewound for reading."""
+    # pylint: disable-next=consider-using-with
+    spill_file: IO[bytes] = tempfile.TemporaryFile(dir=spill_dir)
+    for item in items:
+        pickle.dump(item, spill_file, protocol=pickle.HIGHEST_PROTOCOL)
+    spill_file.seek(0)
+    return spill_file
+
+
+def _load_items(spill_file: IO[bytes]) -> Iterator[Any]:
+    """Yield the items written by ``_dump_items``."""
+    spill_file.seek(0)
+    while True:
+        try:
+            yield pickle.load(spill_file)
+        except EOFError:
+            return
+
+
+class SpillList(Generic[T]):
+    """Append only list keeping at most ``max_items`` items in memory.
+
+    Items above the limit are written to a temporary file. Iterating
+    yields the items in insertion order, spilled ones first.
+    """
+
+    def __init__(self, max_items: int, spill_dir: Path | None = None) -> None:
+        self.max_items: int = max_items
+        self.spill_dir: Path | None = spill_dir
+        self._items: list[T] = []
+        self._spill_file: IO[bytes] | None = None
+        self._length: int = 0
+
+    def append(self, item: T) -> None:
+        """Append the given item, spilling the in-memory items when full."""
+        self._items.append(item)
+        self._length += 1
+        if len(self._items) >= self.max_items:
+            self._spill()
+
+    def _spill(self) -> None:
+        """Move the in-memory items to the end of the spill file."""
+        if self._spill_file is None:
+            # pylint: disable-next=consider-using-with
+            self._spill_file = tempfile.TemporaryFile(dir=self.spill_dir)
+        self._spill_file.seek(0, os.SEEK_END)
+        for item in self._items:
+            pickle.dump(item, self._spill_file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._items.clear()
+
+    @property
+    def is_spilled(self) -> bool:
+        """Return True if some of the items live on disk."""
+        return self._spill_file is not None
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[T]:
+        if self._spill_file is not None:
+            yield from _load_items(self._spill_file)
+        yield from list(self._items)
+
+    def close(self) -> None:
+        """Drop all items and remove the spill file."""
+        self._items.clear()
+        self._length = 0
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def __enter__(self) -> "SpillList[T]":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def sorted_spill(
+    items: Iterable[T],
+    key: Callable[[T], Any],
+    max_items: int,
+    reverse: bool = False,
+    spill_dir: Path | None = None,
+) -> Iterator[T]:
+    """Sort the given items keeping at most ``max_items`` of them in memory.
+
+    The items are sorted in runs of ``max_items`` and every run except
+    the last one is written to a temporary file. The runs are then
+    merged lazily, so the memory stays bounded by ``max_items`` plus
+    one item per run.
+
+    Args:
+        items: Items to sort, consumed lazily.
+        key: Sort key of an item.
+        max_items: Maximum number of items sorted in memory at once.
+        reverse: Sort in descending order.
+        spill_dir: Folder of the temporary files, system default if None.
+
+    Yields:
+        The items in sorted order.
+    """
+    items_iter: Iterator[T] = iter(items)
+    run_files: list[IO[bytes]] = []
+    try:
+        while run := list(islice(items_iter, max_items)):
+            run.sort(key=key, reverse=reverse)
+            if not run_files and len(run) < max_items:
+                # Everything fits in memory, no need to touch the disk.
+                yield from run
+                return
+            run_files.append(_dump_items(run, spill_dir))
+            del run
+        yield from heapq.merge(
+            *(_load_items(run_file) for run_file in run_files), key=key, reverse=reverse
+        )
+    finally:
+        for run_file in run_files:
+            run_file.close()
@@ -0,0 +1,287 @@
+"""Stream files of a source directory as compact records.
+
+``Path.rglob`` keeps every path it yielded in a set to avoid duplicates,
+which grows without bounds on sources with millions of files. The walker
+here only keeps the directories left to visit in memory and yields
+small ``FileRecord`` objects carrying the stat data of each file.
+"""
+
+import fnmatch
+import os
+import re
+import sys
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from media_organizer import config
+from media_organizer.snapshots import DirSnapshot, SnapshotStore
+
+
+class FileRecord:  # pylint: disable=too-few-public-methods
+    """Compact record of a file found while walking a source directory.
+
+    Directory prefixes are interned, so all files of a folder share
+    one ``parent`` string. The ``Path`` object is only built on demand.
+    """
+
+    __slots__ = ("parent", "name", "size", "mtime", "dev", "ino")
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self, parent: str, name: str, size: int, mtime: float, dev: int, ino: int
+    ) -> None:
+        self.parent: str = parent
+        self.name: str = name
+        self.size: int = size
+        self.mtime: float = mtime
+        self.dev: int = dev
+        self.ino: int = ino
+
+    @classmethod
+    def from_path(cls, path: Path) -> "FileRecord":
+        """Create a record by stat'ing the given file path."""
+        file_stat: os.stat_result = path.stat()
+        return cls(
+            parent=sys.intern(str(path.parent)),
+            name=path.name,
+            size=file_stat.st_size,
+            mtime=file_stat.st_mtime,
+            dev=file_stat.st_dev,
+            ino=file_stat.st_ino,
+        )
+
+    @property
+    def path(self) -> Path:
+        """Return the path of the file."""
+        return Path(self.parent, self.name)
+
+    @property
+    def suffix(self) -> str:
+        """Return the lower cased file extension, e.g. ".jpg"."""
+        _, suffix = os.path.splitext(self.name)
+        return suffix.lower()
+
+    def __repr__(self) -> str:
+        return f"FileRecord({os.path.join(self.parent, self.name)!r}, size={self.size})"
+
+
+def compile_globs(patterns: Iterable[str]) -> tuple[re.Pattern | None, re.Pattern | None]:
+    """Compile shell globs into one regex for names and one for relative paths.
+
+    Globs without a slash match names, globs with a slash match paths
+    relative to the walked source. None when there is no glob of a kind.
+    """
+    name_globs: list[str] = []
+    path_globs: list[str] = []
+    for pattern in patterns:
+        pattern = pattern.strip("/")
+        (path_globs if "/" in pattern else name_globs).append(fnmatch.translate(pattern))
+    return (
+        re.compile("|".join(name_globs)) if name_globs else None,
+        re.compile("|".join(path_globs)) if path_globs else None,
+    )
+
+
+def find_nested_destination(source_dir: Path, dest_dir: Path) -> Path | None:
+    """Return the destination as a folder of the source if it lies below it.
+
+    The returned path starts with the source as given, so it names the
+    same folder as the paths found while walking the source, once
+    normalized, see `WalkRules.exclude_dir`.
+    """
+    source: Path = source_dir.resolve()
+    dest: Path = dest_dir.resolve()
+    if dest == source or not dest.is_relative_to(source):
+        return None
+    return source_dir / dest.relative_to(source)
+
+
+class WalkRules:  # pylint: disable=too-many-instance-attributes
+    """Folders and files skipped by `walk_source`, compiled once.
+
+    Patterns are shell globs. Globs without a slash match the name of a
+    folder or file at any depth, like ``node_modules`` or ``*.lrdata``,
+    globs with a slash match the path relative to the source, like
+    ``Exports/*``. Excluded folders are never listed.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        include: Iterable[str] = (),
+        exclude: Iterable[str] = config.DEFAULT_EXCLUDES,
+        min_size: int = 0,
+        max_size: int | None = None,
+        excluded_dirs: Iterable[Path] = (),
+    ) -> None:
+        """Compile the rules.
+
+        Args:
+            include: Only files matching one of these globs are yielded,
+                every file if empty. Folders are not pruned by them.
+            exclude: Folders and files matching one of these globs are
+                skipped.
+            min_size: Smaller files are skipped.
+            max_size: Larger files are skipped, no limit if None.
+            excluded_dirs: Folders skipped whatever their name, e.g. the
+                destination when it lies in the source.
+        """
+        self.include: tuple[str, ...] = tuple(include)
+        self.exclude: tuple[str, ...] = tuple(exclude)
+        self.include_names, self.include_paths = compile_globs(self.include)
+        self.exclude_names, self.exclude_paths = compile_globs(self.exclude)
+        self.min_size: int = min_size
+        self.max_size: int | None = max_size
+        self.excluded_dirs: set[str] = set()
+        for folder in excluded_dirs:
+            self.exclude_dir(folder)
+
+    @property
+    def fingerprint(self) -> str:
+        """Return a text identifying the rules, equal for equal rules."""
+        return repr(
+            (
+                sorted(self.include),
+                sorted(self.exclude),
+                self.min_size,
+                self.max_size,
+                sorted(self.excluded_dirs),
+            )
+        )
+
+    def exclude_dir(self, folder: Path) -> None:
+        """Skip the given folder, given as a path below the walked source.
+
+        Paths are compared normalized: ``Path(".") / "organized"`` is
+        ``organized`` while the walk of ``.`` finds ``./organized``.
+        """
+        self.excluded_dirs.add(os.path.normpath(folder))
+
+    def is_excluded(self, name: str, relative_path: str) -> bool:
+        """Return True if the folder or file matches an exclude glob."""
+        return bool(
+            (self.exclude_names and self.exclude_names.match(name))
+            or (self.exclude_paths and self.exclude_paths.match(relative_path))
+        )
+
+    def is_excluded_dir(self, path: str, name: str, relative_path: str) -> bool:
+        """Return True if the given folder must not be listed."""
+        return bool(
+            self.excluded_dirs and os.path.normpath(path) in self.excluded_dirs
+        ) or self.is_excluded(name, relative_path)
+
+    def is_included_file(self, name: str, relative_path: str) -> bool:
+        """Return True if the given file passes the globs."""
+        if self.is_excluded(name, relative_path):
+            return False
+        if self.include_names is None and self.include_paths is None:
+            return True
+        return bool(
+            (self.include_names and self.include_names.match(name))
+            or (self.include_paths and self.include_paths.match(relative_path))
+        )
+
+    def is_included_size(self, size: int) -> bool:
+        """Return True if the given file size passes the size filter."""
+        return size >= self.min_size and (self.max_size is None or size <= self.max_size)
+
+
+def check_snapshot(
+    current_dir: str, relative_dir: str, snapshots: SnapshotStore, pending_dirs: list[str]
+) -> tuple[os.stat_result, DirSnapshot | None] | None:
+    """Check a folder of a walk with snapshots before listing it.
+
+    The subfolders of a folder unchanged since its snapshot are added to
+    the pending folders, the folder itself is not listed.
+
+    Returns:
+        The stat data and the previous snapshot of a folder to list, None
+        if the folder is not listed.
+    """
+    try:
+        dir_stat: os.stat_result = os.stat(current_dir)
+    except FileNotFoundError:
+        return None
+    except OSError as error:
+        print(f"[ WARNING ] cannot stat folder {current_dir}, error: {error}")
+        return None
+    previous: DirSnapshot | None = snapshots.get(relative_dir)
+    if previous and not snapshots.verify and previous.matches(dir_stat):
+        snapshots.keep(relative_dir, previous)
+        pending_dirs.extend(os.path.join(current_dir, name) for name in previous.subdirs)
+        return None
+    return dir_stat, previous
+
+
+def walk_source(
+    source_dir: Path,
+    rules: WalkRules | None = None,
+    snapshots: SnapshotStore | None = None,
+) -> Iterator[FileRecord]:
+    """Yield a record for every regular file below the given directory.
+
+    Symbolic links to directories are not followed, like ``Path.rglob``.
+    Folders that cannot be read are reported and skipped.
+
+    Args:
+        source_dir: Directory to walk recursively.
+        rules: Folders and files to skip, nothing is skipped if None.
+        snapshots: Snapshots of the previous walk, folders unchanged
+            since are not listed, see `media_organizer.snapshots`.
+
+    Yields:
+        Records of the files, folder by folder.
+    """
+    prefix_size: int = len(os.path.join(source_dir, ""))
+    pending_dirs: list[str] = [str(source_dir)]
+    while pending_dirs:
+        current_dir: str = sys.intern(pending_dirs.pop())
+        relative_dir: str = current_dir[prefix_size:]
+        snapshot_state: tuple[os.stat_result, DirSnapshot | None] | None = None
+        if snapshots is not None:
+            snapshot_state = check_snapshot(
+                current_dir, relative_dir, snapshots, pending_dirs
+            )
+            if snapshot_state is None:
+                continue
+
+        entries: int = 0
+        subdirs: list[str] = []
+        try:
+            with os.scandir(current_dir) as dir_entries:
+                for entry in dir_entries:
+                    entries += 1
+                    relative_path: str = entry.path[prefix_size:]
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if rules is None or not rules.is_excluded_dir(
+                                entry.path, entry.name, relative_path
+                            ):
+                                pending_dirs.append(entry.path)
+                                subdirs.append(entry.name)
+                            continue
+                        if not entry.is_file():
+                            continue
+                        if rules and not rules.is_included_file(
+                            entry.name, relative_path
+                        ):
+                            continue
+                        file_stat: os.stat_result = entry.stat()
+                    except OSError as error:
+                        print(f"[ WARNING ] cannot stat {entry.path}, error: {error}")
+                        continue
+                    if rules and not rules.is_included_size(file_stat.st_size):
+                        continue
+                    yield FileRecord(
+                        parent=current_dir,
+                        name=entry.name,
+                        size=file_stat.st_size,
+                        mtime=file_stat.st_mtime,
+                        dev=file_stat.st_dev,
+                        ino=file_stat.st_ino,
+                    )
+        except OSError as error:
+            print(f"[ WARNING ] cannot list folder {current_dir}, error: {error}")
+            continue
+        if snapshots is not None and snapshot_state is not None:
+            snapshots.record(
+                relative_dir, *snapshot_state, subdirs=subdirs, entries=entries
+            )
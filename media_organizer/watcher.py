@@ -0,0 +1,236 @@
+"""Watch a source folder and hand over files once they stopped changing.
+
+Files are reported by inotify when a writer closed them or when they
+were moved into the source, so uploads are picked up without walking
+the source again. A file is only handed over when it saw no new event
+for a settle time, and together with its darktable ``.xmp`` sidecar,
+which is often written right after the photo.
+"""
+
+import os
+import select
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Final
+
+from media_organizer import config
+from media_organizer.date_fetcher import DARKTABLE_EXT_FORMAT
+from media_organizer.inotify import (
+    IN_CLOSE_WRITE,
+    IN_CREATE,
+    IN_DELETE,
+    IN_MOVED_FROM,
+    IN_MOVED_TO,
+    IN_Q_OVERFLOW,
+    Inotify,
+    InotifyEvent,
+)
+from media_organizer.walker import WalkRules
+
+WATCH_MASK: Final[int] = (
+    IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE | IN_CREATE
+)
+"""Events watched on every folder of the source."""
+
+
+def get_group_key(path: Path) -> Path:
+    """Return the key shared by a photo and its sidecar, see `find_xmp_config`."""
+    return path.with_suffix("")
+
+
+class PendingFiles:
+    """Files waiting to stop changing, grouped with their sidecars.
+
+    Times are wall clock times, so they can be compared with the
+    modification times of the files.
+    """
+
+    def __init__(
+        self,
+        settle: float = config.WATCH_SETTLE_SECONDS,
+        sidecar_wait: float = config.WATCH_SIDECAR_WAIT_SECONDS,
+    ) -> None:
+        self.settle: float = settle
+        self.sidecar_wait: float = sidecar_wait
+        self._groups: dict[Path, dict[Path, float]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(group) for group in self._groups.values())
+
+    def add(self, path: Path, now: float) -> None:
+        """Record an event on the given file, restarting its settle time."""
+        self._groups.setdefault(get_group_key(path), {})[path] = now
+
+    def discard(self, path: Path) -> None:
+        """Forget the given file, e.g. when it was removed or moved away."""
+        key: Path = get_group_key(path)
+        group: dict[Path, float] | None = self._groups.get(key)
+        if group is not None:
+            group.pop(path, None)
+            if not group:
+                del self._groups[key]
+
+    def get_ready_time(self, group: dict[Path, float]) -> float:
+        """Return when the given group has settled.
+
+        A sidecar alone waits longer for its photo.
+        """
+        last_event: float = max(group.values())
+        if all(path.suffix.lower() == DARKTABLE_EXT_FORMAT for path in group):
+            return last_event + self.sidecar_wait
+        return last_event + self.settle
+
+    def get_next_ready_time(self) -> float | None:
+        """Return when the next group settles, None if nothing is pending."""
+        return min(map(self.get_ready_time, self._groups.values()), default=None)
+
+    def pop_ready(self, now: float, limit: int) -> list[list[Path]]:
+        """Remove and return up to the given number of settled groups.
+
+        Files modified without an event, e.g. appended to by a writer
+        which never closed them, start their settle time again. Every
+        group lists its media files before its sidecar.
+        """
+        ready: list[list[Path]] = []
+        for key, group in list(self._groups.items()):
+            if len(ready) >= limit:
+                break
+            if self.get_ready_time(group) > now:
+                continue
+            if modified := self._get_recent_modification(group, now):
+                for path in group:
+                    group[path] = max(group[path], modified)
+                continue
+            del self._groups[key]
+            ready.append(
+                sorted(
+                    group, key=lambda path: path.suffix.lower() == DARKTABLE_EXT_FORMAT
+                )
+            )
+        return ready
+
+    def _get_recent_modification(self, group: dict[Path, float], now: float) -> float:
+        """Return the latest modification within the settle time, 0 if none."""
+        latest: float = 0
+        for path in group:
+            try:
+                mtime: float = path.stat().st_mtime
+            except OSError:
+                continue
+            if now - self.settle < mtime <= now:
+                latest = max(latest, mtime)
+        return latest
+
+
+class SourceWatcher:
+    """Watch every folder of a source for new files."""
+
+    def __init__(
+        self,
+        source_dir: Path,
+        rules: WalkRules | None = None,
+        pending: PendingFiles | None = None,
+    ) -> None:
+        """Start watching the source.
+
+        Args:
+            source_dir: The folder to watch, with its subfolders.
+            rules: Folders and files skipped like by `walk_source`, the
+                default excludes if None.
+            pending: Where the reported files wait to settle.
+        """
+        self.source_dir: Path = source_dir
+        self.rules: WalkRules = rules if rules is not None else WalkRules()
+        self.pending: PendingFiles = pending if pending is not None else PendingFiles()
+        self._prefix: str = os.path.join(source_dir, "")
+        self.inotify: Inotify = Inotify()
+        self.watch_tree(source_dir, add_files=False)
+
+    def __enter__(self) -> "SourceWatcher":
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop watching the source."""
+        self.inotify.close()
+
+    def relative_path(self, path: Path) -> str:
+        """Return the given path relative to the source, as the walk rules match it."""
+        return str(path).removeprefix(self._prefix)
+
+    def is_excluded(self, folder: Path) -> bool:
+        """Return True if the given folder must not be watched."""
+        if folder == self.source_dir:
+            return False
+        return folder.name == config.STATE_FOLDER_NAME or self.rules.is_excluded_dir(
+            str(folder), folder.name, self.relative_path(folder)
+        )
+
+    def add_file(self, path: Path, now: float) -> None:
+        """Add the given file as pending, unless skipped by the walk rules."""
+        if self.rules.is_included_file(path.name, self.relative_path(path)):
+            self.pending.add(path, now)
+
+    def watch_tree(self, root: Path, add_files: bool, now: float | None = None) -> None:
+        """Watch the given folder and its sub folders.
+
+        Args:
+            root: Folder to watch.
+            add_files: Add the files already in the folders as pending,
+                for folders created or moved into the source, whose
+                files may predate their watch.
+            now: Time of the event which revealed the folder.
+        """
+        now = time.time() if now is None else now
+        folders: list[Path] = [root]
+        while folders:
+            folder: Path = folders.pop()
+            if self.is_excluded(folder):
+                continue
+            try:
+                self.inotify.add_watch(folder, WATCH_MASK)
+                entries: list[os.DirEntry] = list(os.scandir(folder))
+            except OSError as error:
+                print(f"[ WARNING ] cannot watch folder {folder}, error: {error}")
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    folders.append(Path(entry.path))
+                elif add_files and entry.is_file(follow_symlinks=False):
+                    self.add_file(Path(entry.path), now)
+
+    def handle_event(self, event: InotifyEvent, now: float) -> None:
+        """Update the pending files with the given event."""
+        if event.mask & IN_Q_OVERFLOW:
+            print("[ WARNING ] too many events, rescanning the source")
+            self.watch_tree(self.source_dir, add_files=True, now=now)
+        elif event.is_dir:
+            if event.mask & (IN_CREATE | IN_MOVED_TO):
+                self.watch_tree(event.path, add_files=True, now=now)
+        elif event.mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            self.add_file(event.path, now)
+        elif event.mask & (IN_MOVED_FROM | IN_DELETE):
+            self.pending.discard(event.path)
+
+    def wait_for_events(self, timeout: float | None) -> None:
+        """Wait up to the given seconds for events and handle them."""
+        readable, _, _ = select.select([self.inotify.fd], [], [], timeout)
+        if readable:
+            now: float = time.time()
+            for event in self.inotify.read_events():
+                self.handle_event(event, now)
+
+    def iter_batches(
+        self, batch_size: int = config.WATCH_BATCH_SIZE
+    ) -> Iterator[list[list[Path]]]:
+        """Yield batches of settled file groups, forever."""
+        while True:
+            while batch := self.pending.pop_ready(time.time(), limit=batch_size):
+                yield batch
+            ready_time: float | None = self.pending.get_next_ready_time()
+            self.wait_for_events(
+                None if ready_time is None else max(0.0, ready_time - time.time())
+            )
@@ -0,0 +1,203 @@
+"""Test organizing the members of archives."""
+
+import io
+import tarfile
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from media_organizer import archives
+from media_organizer.archives import (
+    is_expandable,
+    organize_archive,
+    organize_archives,
+    write_member,
+)
+from media_organizer.catalog import Catalog
+from media_organizer.coordination import DestinationLocks
+from media_organizer.enums import DateSource, OnDuplicate
+from media_organizer.media_organizer import move_from_source
+from tests.create_img import create_mock_image
+
+HEADER_DATE: datetime = datetime(2020, 1, 2, 3, 4, 6)
+"""Modification time of every archive member."""
+
+
+def create_members(tmp_path: Path) -> dict[str, bytes]:
+    """Return archive members: a photo with EXIF data, its sidecar and a text."""
+    photo_path: Path = tmp_path / "IMG_0001.jpg"
+    create_mock_image(str(photo_path), "2021:06:13 10:00:00")
+    return {
+        "album/IMG_0001.xmp": b"<xmp/>",
+        "album/IMG_0001.jpg": photo_path.read_bytes(),
+        "notes/readme.txt": b"notes",
+    }
+
+
+def create_zip(archive_path: Path, members: dict[str, bytes]) -> None:
+    """Create a zip archive with the given members."""
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        for name, data in members.items():
+            info = zipfile.ZipInfo(name, date_time=HEADER_DATE.timetuple()[:6])
+            archive.writestr(info, data)
+
+
+def create_tar(archive_path: Path, members: dict[str, bytes]) -> None:
+    """Create a compressed tar archive with the given members."""
+    with tarfile.open(archive_path, "w:gz") as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(HEADER_DATE.timestamp())
+            archive.addfile(info, io.BytesIO(data))
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("Takeout.zip", True),
+        ("export.TAR.GZ", True),
+        ("export.tgz", True),
+        ("backup.gz", False),
+        ("IMG_0001.jpg", False),
+    ],
+)
+def test_is_expandable(name: str, expected: bool):
+    """Zip and tar archives are expanded, lone compressed files are not."""
+    assert is_expandable(Path(name)) == expected
+
+
+@pytest.mark.parametrize(
+    "create_archive, name", [(create_zip, "a.zip"), (create_tar, "a.tgz")]
+)
+@pytest.mark.parametrize(
+    "fast, folder", [(False, "2021/2021_06_13"), (True, "2020/2020_01_02")]
+)
+def test_organize_archive(
+    tmp_path: Path, create_archive, name: str, fast: bool, folder: str
+):
+    """Members are written into their folders, the sidecar follows its photo."""
+    archive_path: Path = tmp_path / name
+    create_archive(archive_path, create_members(tmp_path))
+    dest_dir: Path = tmp_path / "dest"
+
+    with Catalog(dest_dir) as catalog:
+        organized: int = organize_archive(
+            archive_path,
+            dest_dir,
+            fast=fast,
+            dry_run=False,
+            locks=DestinationLocks(dest_dir),
+            catalog=catalog,
+        )
+        entries = list(catalog.query("20"))
+
+    assert organized == 3
+    photo_dir: Path = dest_dir / "photos" / folder
+    assert sorted(path.name for path in photo_dir.iterdir()) == [
+        "IMG_0001.jpg",
+        "IMG_0001.xmp",
+    ]
+    assert (dest_dir / "docs/txt/readme.txt").read_bytes() == b"notes"
+    assert not (dest_dir / "docs/xmp/IMG_0001.xmp").exists()
+    assert (photo_dir / "IMG_0001.jpg").stat().st_mtime == HEADER_DATE.timestamp()
+    assert {entry.path.name for entry in entries} == {"IMG_0001.jpg", "IMG_0001.xmp"}
+    assert {entry.date_source for entry in entries} == {
+        DateSource.MTIME if fast else DateSource.EXIF
+    }
+
+
+def test_organize_archive_duplicates(tmp_path: Path):
+    """Identical members are dropped, different ones get a unique name."""
+    archive_path: Path = tmp_path / "a.zip"
+    create_zip(archive_path, {"a/readme.txt": b"notes", "b/readme.txt": b"other"})
+    dest_dir: Path = tmp_path / "dest"
+    docs_dir: Path = dest_dir / "docs/txt"
+    docs_dir.mkdir(parents=True)
+    (docs_dir / "readme.txt").write_bytes(b"notes")
+
+    organize_archive(
+        archive_path,
+        dest_dir,
+        dry_run=False,
+        on_duplicate=OnDuplicate.CREATE_UNIQ_FILENAME_IF_CONTENT_MISMATCH,
+        locks=DestinationLocks(dest_dir),
+    )
+
+    assert sorted(path.name for path in docs_dir.iterdir()) == [
+        "readme.txt",
+        "readme_01.txt",
+    ]
+    assert (docs_dir / "readme_01.txt").read_bytes() == b"other"
+
+
+def test_organize_archives_colliding_members(tmp_path: Path):
+    """Archives expanded at once keep every member of the same name."""
+    archive_paths: list[Path] = [tmp_path / "a.zip", tmp_path / "b.zip"]
+    for archive_path in archive_paths:
+        create_zip(
+            archive_path,
+            {
+                f"notes/readme_{index}.txt": f"{archive_path.name} {index}".encode()
+                for index in range(20)
+            },
+        )
+    dest_dir: Path = tmp_path / "dest"
+
+    expanded: list[Path] = organize_archives(
+        archive_paths,
+        dest_dir,
+        dry_run=False,
+        locks=DestinationLocks(dest_dir),
+        workers=2,
+    )
+
+    assert expanded == archive_paths
+    assert len(list((dest_dir / "docs/txt").iterdir())) == 40
+
+
+def test_write_member_created_meanwhile(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    """A destination created by another run after the check is not overwritten."""
+    dst_path: Path = tmp_path / "readme.txt"
+    dst_path.write_bytes(b"first")
+    create_unique_filepath = archives.create_unique_filepath
+
+    def create_meanwhile(filepath: Path) -> Path:
+        unique_path: Path = create_unique_filepath(filepath)
+        if unique_path.name == "readme_01.txt":
+            unique_path.write_bytes(b"other run")
+        return unique_path
+
+    monkeypatch.setattr(archives, "create_unique_filepath", create_meanwhile)
+    written: Path | None = write_member(
+        io.BytesIO(b"ond"),
+        b"sec",
+        "a.zip:readme.txt",
+        dst_path,
+        on_duplicate=OnDuplicate.CREATE_UNIQ_FILENAME,
+        locks=DestinationLocks(tmp_path),
+    )
+
+    assert written == tmp_path / "readme_02.txt"
+    assert written.read_bytes() == b"second"
+    assert (tmp_path / "readme_01.txt").read_bytes() == b"other run"
+
+
+def test_move_from_source_expand_archives(tmp_path: Path):
+    """Archives are moved to the archives folder once their members are organized."""
+    source_dir: Path = tmp_path / "source"
+    source_dir.mkdir()
+    create_zip(source_dir / "Takeout.zip", create_members(tmp_path))
+    (source_dir / "broken.zip").write_bytes(b"not a zip")
+    dest_dir: Path = tmp_path / "dest"
+
+    move_from_source(source_dir, dest_dir, fast=True, dry_run=True, expand_archives=True)
+    assert not (dest_dir / "photos").exists()
+
+    move_from_source(source_dir, dest_dir, fast=True, dry_run=False, expand_archives=True)
+
+    assert (dest_dir / "photos/2020/2020_01_02/IMG_0001.jpg").exists()
+    assert (dest_dir / "archives/zip/Takeout.zip").exists()
+    assert (source_dir / "broken.zip").exists()
@@ -0,0 +1,38 @@
+"""Test the BK-tree index of hashes."""
+
+import random
+
+import pytest
+
+from media_organizer.bk_tree import BKTree, hamming_distance
+
+
+class TestBKTree:
+    """Test bk_tree.py"""
+
+    def test_hamming_distance(self):
+        """Distance is the number of differing bits."""
+        assert hamming_distance(0b1011, 0b0001) == 2
+        assert hamming_distance(2**64 - 1, 0) == 64
+
+    @pytest.mark.parametrize("radius", [0, 3, 10])
+    def test_query_matches_brute_force(self, radius: int):
+        """Queries return exactly the items a linear scan would return."""
+        rng = random.Random(42)
+        hashes: list[int] = [rng.getrandbits(16) for _ in range(500)]
+        tree: BKTree[int] = BKTree()
+        for index, hash_value in enumerate(hashes):
+            tree.add(hash_value, index)
+
+        assert len(tree) == len(hashes)
+        for query in hashes[:50]:
+            expected = sorted(
+                index
+                for index, hash_value in enumerate(hashes)
+                if hamming_distance(query, hash_value) <= radius
+            )
+            matches = tree.query(query, radius)
+            assert sorted(index for _, index in matches) == expected
+            assert [distance for distance, _ in matches] == sorted(
+                distance for distance, _ in matches
+            )
@@ -0,0 +1,159 @@
+"""Test the prioritized runs within a time or size budget."""
+
+import os
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+
+import pytest
+
+from media_organizer.budget import RunBudget, order_records, parse_duration
+from media_organizer.enums import Priority
+from media_organizer.media_organizer import move_from_source
+from media_organizer.routing import get_default_routing
+from media_organizer.snapshots import get_snapshots_path
+from media_organizer.walker import FileRecord
+
+FILES: dict[str, tuple[int, float]] = {
+    "notes.txt": (10, 400),
+    "IMG_0001.jpg": (300, 100),
+    "report.pdf": (20, 300),
+    "IMG_0002.jpg": (200, 200),
+    "clip.mp4": (500, 500),
+}
+"""Size and modification time of the walked files, in walk order."""
+
+
+def create_records() -> list[FileRecord]:
+    """Return records of the walked files."""
+    return [
+        FileRecord("/source", name, size, mtime, dev=1, ino=index)
+        for index, (name, (size, mtime)) in enumerate(FILES.items())
+    ]
+
+
+def test_parse_duration():
+    """Durations are given in seconds, minutes, hours or days."""
+    assert parse_duration("90") == 90
+    assert parse_duration("1.5h") == 5400
+    with pytest.raises(ValueError):
+        parse_duration("soon")
+
+
+@pytest.mark.parametrize(
+    "priority, first, max_files, names",
+    [
+        (Priority.WALK, (), None, list(FILES)),
+        (
+            Priority.NEWEST,
+            ("photos",),
+            None,
+            ["IMG_0002.jpg", "IMG_0001.jpg", "clip.mp4", "notes.txt", "report.pdf"],
+        ),
+        (
+            Priority.SMALLEST,
+            (),
+            2,
+            ["notes.txt", "report.pdf", "IMG_0001.jpg", "IMG_0002.jpg", "clip.mp4"],
+        ),
+    ],
+)
+def test_order_records(
+    priority: Priority, first: tuple[str, ...], max_files: int | None, names: list[str]
+):
+    """Chosen categories go first, files beyond the bounded heap follow unordered."""
+    ordered = order_records(
+        create_records(),
+        get_default_routing(),
+        priority,
+        first,
+        max_items=2,
+        max_files=max_files,
+    )
+
+    assert [record.name for record in ordered] == names
+
+
+def test_order_records_unknown_category():
+    """Categories must be routed."""
+    with pytest.raises(ValueError, match="unknown categories selfies"):
+        order_records([], get_default_routing(), first=("selfies",), max_items=2)
+
+
+def test_run_budget():
+    """The budget stops the walk at the file exceeding it and counts the walked rest."""
+    budget = RunBudget(max_bytes=350)
+    records = iter(create_records())
+    for record in budget.limit(budget.count_walked(records)):
+        budget.add_done(record)
+
+    assert (budget.done_files, budget.done_bytes, budget.exhausted) == (3, 330, "bytes")
+    assert budget.finish() == (1, 200)
+    assert not budget.walked_all
+    assert next(records).name == "clip.mp4"
+
+
+def test_run_budget_time():
+    """Files queued when the time is up remain too."""
+    now: list[float] = [0.0]
+    budget = RunBudget(seconds=10, clock=lambda: now[0])
+    queued = budget.limit(budget.count_walked(create_records()))
+    budget.add_done(next(queued))
+    next(queued)
+    now[0] = 10
+
+    assert budget.is_out_of_time()
+    assert budget.finish() == (1, 300)
+
+
+def test_move_from_source_budget(tmp_path: Path, capsys: pytest.CaptureFixture):
+    """Newest files go first, an incremental run stopped early lists everything again."""
+    source_dir: Path = tmp_path / "source"
+    source_dir.mkdir()
+    for name, (_, mtime) in FILES.items():
+        (source_dir / name).write_bytes(b"data")
+        os.utime(source_dir / name, (mtime, mtime))
+    dest_dir: Path = tmp_path / "dest"
+
+    move_from_source(
+        source_dir,
+        dest_dir,
+        fast=True,
+        dry_run=False,
+        incremental=True,
+        budget=RunBudget(max_files=2),
+        priority=Priority.NEWEST,
+    )
+
+    assert sorted(path.name for path in source_dir.iterdir()) == [
+        "IMG_0001.jpg",
+        "IMG_0002.jpg",
+        "report.pdf",
+    ]
+    assert "3 files (0.0 MB) remain in the source" in capsys.readouterr().out
+    with closing(sqlite3.connect(get_snapshots_path(dest_dir))) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM dirs").fetchone() == (0,)
+
+
+def test_move_from_source_budget_walk_order(
+    tmp_path: Path, capsys: pytest.CaptureFixture
+):
+    """In walk order the rest of the source is neither walked nor counted."""
+    source_dir: Path = tmp_path / "source"
+    source_dir.mkdir()
+    for name in FILES:
+        (source_dir / name).write_bytes(b"data")
+
+    move_from_source(
+        source_dir,
+        tmp_path / "dest",
+        fast=True,
+        dry_run=False,
+        budget=RunBudget(max_files=2),
+    )
+
+    assert len(list(source_dir.iterdir())) == 3
+    assert (
+        "at least 1 files (0.0 MB) remain in the source, the rest of the source "
+        "was not counted" in capsys.readouterr().out
+    )
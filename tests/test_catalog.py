@@ -0,0 +1,158 @@
+"""Test the catalog of organized files."""
+
+import os
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from media_organizer import catalog as catalog_module
+from media_organizer import config
+from media_organizer.catalog import (
+    Catalog,
+    build_catalog,
+    get_catalog_path,
+    relayout,
+)
+from media_organizer.enums import DateSource
+from media_organizer.media_organizer import move_from_source
+from media_organizer.routing import check_folder_format
+
+
+def create_source(source_dir: Path) -> None:
+    """Create photos and a sidecar with modification times in June and July 2021."""
+    files: dict[str, datetime] = {
+        "IMG_0001.JPG": datetime(2021, 6, 13, 10, 0),
+        "IMG_0001.xmp": datetime(2021, 6, 13, 10, 0),
+        "IMG_0002.JPG": datetime(2021, 6, 20, 12, 0),
+        "IMG_0003.JPG": datetime(2021, 7, 1, 8, 0),
+    }
+    source_dir.mkdir()
+    for name, mtime in files.items():
+        path: Path = source_dir / name
+        path.write_bytes(name.encode())
+        os.utime(path, (mtime.timestamp(), mtime.timestamp()))
+
+
+@pytest.fixture(name="dest_dir")
+def fixture_dest_dir(tmp_path: Path) -> Path:
+    """Return a destination organized in fast mode."""
+    source_dir: Path = tmp_path / "source"
+    dest_dir: Path = tmp_path / "dest"
+    create_source(source_dir)
+    move_from_source(source_dir, dest_dir, fast=True, dry_run=False)
+    return dest_dir
+
+
+def test_organize_records_files(dest_dir: Path):
+    """Moved files are recorded with their date and its source."""
+    with Catalog(dest_dir) as catalog:
+        june: list = list(catalog.query("2021-06"))
+        day: list = list(catalog.query("2021-06-13"))
+
+    assert [entry.path.name for entry in june] == [
+        "IMG_0001.JPG",
+        "IMG_0001.xmp",
+        "IMG_0002.JPG",
+    ]
+    assert {entry.path.name for entry in day} == {"IMG_0001.JPG", "IMG_0001.xmp"}
+    entry = june[-1]
+    assert entry.path == Path("photos/2021/2021_06_20/IMG_0002.JPG")
+    assert entry.base == Path("photos")
+    assert entry.size == len(b"IMG_0002.JPG")
+    assert entry.date == datetime(2021, 6, 20, 12, 0)
+    assert entry.date_source == DateSource.MTIME
+
+
+def test_dry_run_has_no_catalog(tmp_path: Path):
+    """Dry runs do not create the catalog."""
+    source_dir: Path = tmp_path / "source"
+    create_source(source_dir)
+
+    move_from_source(source_dir, tmp_path / "dest", fast=True, dry_run=True)
+
+    assert not get_catalog_path(tmp_path / "dest").exists()
+
+
+def test_relayout(dest_dir: Path, tmp_path: Path):
+    """Files move into the new folders, later runs follow the new format."""
+    moved, missing = relayout(dest_dir, "%Y/%Y_%m", dry_run=False)
+
+    assert (moved, missing) == (4, 0)
+    assert sorted(
+        str(path.relative_to(dest_dir / "photos"))
+        for path in (dest_dir / "photos").rglob("*")
+    ) == [
+        "2021",
+        "2021/2021_06",
+        "2021/2021_06/IMG_0001.JPG",
+        "2021/2021_06/IMG_0001.xmp",
+        "2021/2021_06/IMG_0002.JPG",
+        "2021/2021_07",
+        "2021/2021_07/IMG_0003.JPG",
+    ]
+    with Catalog(dest_dir) as catalog:
+        assert catalog.get_folder_format() == "%Y/%Y_%m"
+        assert {entry.path for entry in catalog.query("2021-07")} == {
+            Path("photos/2021/2021_07/IMG_0003.JPG")
+        }
+
+    new_source: Path = tmp_path / "new_source"
+    new_source.mkdir()
+    new_photo: Path = new_source / "IMG_0004.JPG"
+    new_photo.write_bytes(b"new")
+    os.utime(new_photo, (datetime(2021, 7, 2).timestamp(),) * 2)
+    move_from_source(new_source, dest_dir, fast=True, dry_run=False)
+
+    assert (dest_dir / "photos/2021/2021_07/IMG_0004.JPG").exists()
+
+
+def test_relayout_missing_files(dest_dir: Path):
+    """Files removed from the destination are dropped from the catalog."""
+    (dest_dir / "photos/2021/2021_07_01/IMG_0003.JPG").unlink()
+
+    assert relayout(dest_dir, "%Y", dry_run=False) == (3, 1)
+    with Catalog(dest_dir) as catalog:
+        assert not list(catalog.query("2021-07"))
+
+
+def test_relayout_interrupted(dest_dir: Path, monkeypatch: pytest.MonkeyPatch):
+    """Files moved before a crash keep their new path in the catalog."""
+    move_file = catalog_module.move_file
+    moves: list[Path | None] = []
+
+    def crash_after_first_move(**kwargs) -> Path | None:
+        if moves:
+            raise KeyboardInterrupt
+        moves.append(move_file(**kwargs))
+        return moves[-1]
+
+    monkeypatch.setattr(catalog_module, "move_file", crash_after_first_move)
+    # Killed, the uncommitted changes are lost.
+    monkeypatch.setattr(Catalog, "close", lambda self: self.connection.close())
+    with pytest.raises(KeyboardInterrupt):
+        relayout(dest_dir, "%Y", dry_run=False)
+    monkeypatch.undo()
+
+    with Catalog(dest_dir) as catalog:
+        assert catalog.get_folder_format() == "%Y"
+    assert relayout(dest_dir, "%Y", dry_run=False) == (3, 0)
+    with Catalog(dest_dir) as catalog:
+        assert len(list(catalog.query("2021"))) == 4
+
+
+def test_build_catalog(dest_dir: Path):
+    """Destinations organized without a catalog are recorded once."""
+    get_catalog_path(dest_dir).unlink()
+
+    assert build_catalog(dest_dir, fast=True) == 4
+    with Catalog(dest_dir) as catalog:
+        assert len(list(catalog.query("2021"))) == 4
+
+
+@pytest.mark.parametrize("folder_format", ["../%Y", "/tmp/%Y"])
+def test_check_folder_format(folder_format: str):
+    """Formats leaving the category folder are rejected."""
+    with pytest.raises(ValueError):
+        check_folder_format(folder_format)
+    check_folder_format(config.DATE_FOLDER_FORMAT)
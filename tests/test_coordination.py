@@ -0,0 +1,125 @@
+"""Test coordinating several runs sharing one destination."""
+
+import multiprocessing
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from media_organizer.coordination import DestinationLocks, Shard, is_in_shard
+from media_organizer.enums import OnDuplicate, ShardStrategy
+from media_organizer.file_utils import move_file
+from media_organizer.walker import FileRecord, walk_source
+
+TMPFS_DIR: Path = Path("/dev/shm")
+FILES_PER_WORKER: int = 25
+
+
+def move_worker(source_dir: Path, dst_filepath: Path) -> None:
+    """Move all files of the given source to the same destination filename."""
+    locks = DestinationLocks(dst_filepath.parent.parent)
+    for src_filepath in sorted(source_dir.iterdir()):
+        move_file(
+            src_filepath=src_filepath,
+            dst_filepath=dst_filepath,
+            dry_run=False,
+            on_duplicate=OnDuplicate.CREATE_UNIQ_FILENAME_IF_CONTENT_MISMATCH,
+            locks=locks,
+        )
+
+
+class TestCoordination:
+    """Test coordination.py"""
+
+    @pytest.mark.parametrize("raw_shard, expected", [("0/1", (0, 1)), ("3/4", (3, 4))])
+    def test_shard_parse(self, raw_shard: str, expected: tuple[int, int]):
+        """Shards are given as i/N."""
+        assert Shard.parse(raw_shard) == Shard(*expected)
+
+    @pytest.mark.parametrize("raw_shard", ["", "1", "4/4", "-1/4", "a/b", "0/0"])
+    def test_shard_parse_invalid(self, raw_shard: str):
+        """Invalid shards raise ValueError."""
+        with pytest.raises(ValueError):
+            Shard.parse(raw_shard)
+
+    @pytest.mark.parametrize("strategy", [ShardStrategy.PATH, ShardStrategy.SUBTREE])
+    def test_shards_are_disjoint(self, tmp_path: Path, strategy: ShardStrategy):
+        """Every file lands in exactly one shard, sidecars next to their photo."""
+        for folder in ("a", "b", "c/d"):
+            (tmp_path / folder).mkdir(parents=True)
+            for index in range(10):
+                for name in (f"IMG{index}.ARW", f"IMG{index}.ARW.xmp", f"IMG{index}.xmp"):
+                    (tmp_path / folder / name).touch()
+        records: list[FileRecord] = list(walk_source(tmp_path))
+
+        shards: dict[Path, int] = {}
+        for index in range(3):
+            shard = Shard(index=index, count=3)
+            for record in records:
+                if is_in_shard(record, tmp_path, shard=shard, strategy=strategy):
+                    assert record.path not in shards
+                    shards[record.path] = index
+
+        assert len(shards) == len(records)
+        for path, index in shards.items():
+            photo_path: Path = path.with_name(path.name.split(".")[0] + ".ARW")
+            assert shards[photo_path] == index
+
+    def test_concurrent_moves_never_overwrite(self):
+        """Concurrent processes moving to the same filename keep every file."""
+        base_dir: Path | None = TMPFS_DIR if TMPFS_DIR.is_dir() else None
+        with tempfile.TemporaryDirectory(dir=base_dir) as tmp_dir:
+            dst_filepath: Path = Path(tmp_dir) / "dest" / "2024_10_21" / "media.jpg"
+            source_dirs: list[Path] = []
+            for worker in range(4):
+                source_dir: Path = Path(tmp_dir) / f"source_{worker}"
+                source_dir.mkdir()
+                for index in range(FILES_PER_WORKER):
+                    (source_dir / f"{index:02d}.jpg").write_text(f"{worker}-{index}")
+                source_dirs.append(source_dir)
+
+            context = multiprocessing.get_context("spawn")
+            with context.Pool(len(source_dirs)) as pool:
+                pool.starmap(
+                    move_worker,
+                    [(source_dir, dst_filepath) for source_dir in source_dirs],
+                )
+
+            contents: list[str] = [
+                path.read_text() for path in dst_filepath.parent.iterdir()
+            ]
+            assert sorted(contents) == sorted(
+                f"{worker}-{index}"
+                for worker in range(len(source_dirs))
+                for index in range(FILES_PER_WORKER)
+            )
+            locks_dir: Path = DestinationLocks(dst_filepath.parent.parent).locks_dir
+            assert not list(locks_dir.iterdir())
+
+    def test_lock_excludes_threads(self, tmp_path: Path):
+        """Threads of one process never hold the same folder lock at once."""
+        locks = DestinationLocks(tmp_path)
+        # Threads holding the lock now, and at most.
+        holders: list[int] = [0, 0]
+        count_lock = threading.Lock()
+
+        def hold_lock() -> None:
+            for _ in range(5):
+                with locks.lock(tmp_path / "2024_10_21"):
+                    with count_lock:
+                        holders[0] += 1
+                        holders[1] = max(holders)
+                    time.sleep(0.001)
+                    with count_lock:
+                        holders[0] -= 1
+
+        threads = [threading.Thread(target=hold_lock) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert holders == [0, 1]
+        assert not list(locks.locks_dir.iterdir())
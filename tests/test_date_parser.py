@@ -0,0 +1,70 @@
+"""Test parsing the raw dates found in EXIF data."""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from media_organizer.date_parser import DateParser, clean_raw_date, parse_exif_date
+
+CET: timezone = timezone(timedelta(hours=1))
+
+
+@pytest.mark.parametrize(
+    "raw_date, expected",
+    [
+        ("2023:05:20 15:45:50", datetime(2023, 5, 20, 15, 45, 50)),
+        ("2023:05:20 15:45:50\x00\x00\x00", datetime(2023, 5, 20, 15, 45, 50)),
+        (" 2023:05:20 15:45:50 ", datetime(2023, 5, 20, 15, 45, 50)),
+        ("2023:05:20 15:45:50.25", datetime(2023, 5, 20, 15, 45, 50, 250000)),
+        ("2023:05:20 15:45:50+01:00", datetime(2023, 5, 20, 15, 45, 50, tzinfo=CET)),
+        ("2023:05:20 15:45:50+0100", datetime(2023, 5, 20, 15, 45, 50, tzinfo=CET)),
+        (
+            "2023:05:20 15:45:50Z",
+            datetime(2023, 5, 20, 15, 45, 50, tzinfo=timezone.utc),
+        ),
+        ("2023-05-20T15:45:50", datetime(2023, 5, 20, 15, 45, 50)),
+        ("0000:00:00 00:00:00", None),
+        ("    :  :     :  :  ", None),
+        ("2023:00:00 00:00:00", None),
+        ("2023:05:20 15:45:50 junk", None),
+        ("2023:05:20", None),
+        ("", None),
+    ],
+)
+def test_parse_exif_date(raw_date: str, expected: datetime | None):
+    """Canonical, fractional, offset and malformed camera dates."""
+    assert DateParser().parse(raw_date) == expected
+    assert parse_exif_date(raw_date) == expected
+
+
+def test_parse_sub_sec_and_offset():
+    """SubSecTimeOriginal and OffsetTimeOriginal complete the date."""
+    parser = DateParser()
+
+    assert parser.parse("2023:05:20 15:45:50", sub_sec="123\x00", offset="+01:00") == (
+        datetime(2023, 5, 20, 15, 45, 50, 123000, tzinfo=CET)
+    )
+    assert parser.parse("2023:05:20 15:45:50Z", offset="+01:00") == datetime(
+        2023, 5, 20, 15, 45, 50, tzinfo=timezone.utc
+    )
+    assert parser.parse("2023:05:20 15:45:50", sub_sec="  ", offset="   ") == datetime(
+        2023, 5, 20, 15, 45, 50
+    )
+
+
+def test_last_format_is_tried_first():
+    """The fallback format which matched last is remembered."""
+    parser = DateParser()
+
+    parser.parse("2023-05-20 15:45:50")
+    assert parser.last_format == "%Y-%m-%d %H:%M:%S"
+    parser.parse("2023:05:20 15:45:50")
+    assert parser.last_format == "%Y-%m-%d %H:%M:%S"
+    parser.parse("2023-05-20T15:45:50")
+    assert parser.last_format == "%Y-%m-%dT%H:%M:%S"
+
+
+def test_clean_raw_date():
+    """Padding is removed and placeholders are empty."""
+    assert clean_raw_date("2023:05:20 15:45:50\x00garbage") == "2023:05:20 15:45:50"
+    assert clean_raw_date("0000:00:00 00:00:00\x00") == ""
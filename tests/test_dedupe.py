@@ -0,0 +1,110 @@
+"""Test finding identical files across the collection."""
+
+from pathlib import Path
+
+import pytest
+
+from media_organizer import config, dedupe
+from media_organizer.dedupe import HashCache, find_duplicates, iter_roots
+from media_organizer.enums import DedupeAction
+
+
+@pytest.fixture(name="small_partial_hash")
+def fixture_small_partial_hash(monkeypatch):
+    """Hash only 4 bytes of head and tail, so the full hash step is exercised."""
+    monkeypatch.setattr(config, "PARTIAL_HASH_SIZE", 4)
+
+
+def create_tree(root: Path) -> dict[str, Path]:
+    """Create files sharing sizes, heads and tails but not always content."""
+    contents: dict[str, bytes] = {
+        "IMG_0001.JPG": b"head-AAAA-tail",
+        "IMG_0001 (1).JPG": b"head-AAAA-tail",
+        "whatsapp/IMG-2024-WA0001.jpg": b"head-AAAA-tail",
+        "same_head_tail.jpg": b"head-BBBB-tail",
+        "same_size.jpg": b"other-content!",
+        "empty_1.txt": b"",
+        "empty_2.txt": b"",
+    }
+    paths: dict[str, Path] = {}
+    for name, content in contents.items():
+        paths[name] = root / name
+        paths[name].parent.mkdir(parents=True, exist_ok=True)
+        paths[name].write_bytes(content)
+    return paths
+
+
+def group_names(groups: list[list]) -> list[list[str]]:
+    """Return the sorted file names of every group."""
+    return sorted(sorted(record.name for record in group) for group in groups)
+
+
+@pytest.mark.usefixtures("small_partial_hash")
+def test_find_duplicates(tmp_path: Path):
+    """Only files with identical content are grouped, empty files are ignored."""
+    paths = create_tree(tmp_path)
+    (tmp_path / "hardlink.JPG").hardlink_to(paths["IMG_0001.JPG"])
+
+    groups = list(find_duplicates(iter_roots([tmp_path]), workers=2, max_memory=1))
+
+    assert len(groups) == 1
+    assert len(groups[0]) == 3
+    assert {record.ino for record in groups[0]} == {
+        paths[name].stat().st_ino
+        for name in ("IMG_0001.JPG", "IMG_0001 (1).JPG", "whatsapp/IMG-2024-WA0001.jpg")
+    }
+
+
+@pytest.mark.usefixtures("small_partial_hash")
+def test_find_duplicates_cache(monkeypatch, tmp_path: Path):
+    """Hashes of unchanged files are taken from the cache."""
+    create_tree(tmp_path / "root")
+    cache = HashCache(tmp_path / "cache" / "hashes.sqlite")
+    first = group_names(
+        list(find_duplicates(iter_roots([tmp_path / "root"]), cache=cache))
+    )
+
+    def fail(*args):
+        raise AssertionError(f"hashed again: {args}")
+
+    monkeypatch.setattr(dedupe, "partial_hash", fail)
+    monkeypatch.setattr(dedupe, "full_hash", fail)
+    second = group_names(
+        list(find_duplicates(iter_roots([tmp_path / "root"]), cache=cache))
+    )
+    cache.close()
+
+    assert (
+        first == second == [["IMG-2024-WA0001.jpg", "IMG_0001 (1).JPG", "IMG_0001.JPG"]]
+    )
+
+
+@pytest.mark.parametrize(
+    "action", [DedupeAction.DELETE, DedupeAction.HARDLINK, DedupeAction.TRASH]
+)
+def test_dedupe_actions(tmp_path: Path, action: DedupeAction):
+    """The file in the first root is kept, the copies are acted on."""
+    library: Path = tmp_path / "library"
+    source: Path = tmp_path / "source"
+    library_paths = create_tree(library)
+    source_paths = create_tree(source)
+    kept: Path = library_paths["IMG_0001.JPG"]
+
+    dedupe.dedupe(
+        [library, source], action=action, trash_dir=tmp_path / "trash", dry_run=False
+    )
+
+    duplicates: list[Path] = [
+        path
+        for paths in (library_paths, source_paths)
+        for name, path in paths.items()
+        if name != "same_size.jpg" and not name.startswith(("empty", "same_head"))
+        if path != kept
+    ]
+    assert kept.exists()
+    if action == DedupeAction.HARDLINK:
+        assert all(path.stat().st_ino == kept.stat().st_ino for path in duplicates)
+    else:
+        assert not any(path.exists() for path in duplicates)
+    if action == DedupeAction.TRASH:
+        assert (tmp_path / "trash" / "whatsapp" / "IMG-2024-WA0001.jpg").exists()
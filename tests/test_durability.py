@@ -0,0 +1,109 @@
+"""Test the durable moves with batched folder syncs."""
+
+import errno
+import os
+from pathlib import Path
+
+import pytest
+
+from media_organizer import durability, file_utils
+from media_organizer.durability import DurableBatch, use_batch
+from media_organizer.enums import OnDuplicate
+from media_organizer.file_utils import move_file
+from media_organizer.media_organizer import move_from_source
+
+
+class FakeClock:  # pylint: disable=too-few-public-methods
+    """Clock advanced by hand."""
+
+    def __init__(self) -> None:
+        self.now: float = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(name="synced")
+def fixture_synced(monkeypatch: pytest.MonkeyPatch) -> list[Path]:
+    """Record the synced paths instead of syncing them."""
+    synced: list[Path] = []
+    monkeypatch.setattr(durability, "fsync_path", synced.append)
+    monkeypatch.setattr(file_utils, "fsync_path", synced.append)
+    return synced
+
+
+def test_durable_batch_bounds(tmp_path: Path, synced: list[Path]):
+    """Touched folders are synced once per batch, when full or old enough."""
+    clock = FakeClock()
+    batch = DurableBatch(max_operations=3, max_delay=10, clock=clock)
+
+    batch.touch(tmp_path / "a", tmp_path / "b")
+    batch.touch(tmp_path / "a")
+    assert not synced
+    batch.touch(tmp_path / "a")
+    assert sorted(synced) == [tmp_path / "a", tmp_path / "b"]
+
+    batch.touch(tmp_path / "c")
+    clock.now = 10
+    batch.touch(tmp_path / "c")
+    assert synced[2:] == [tmp_path / "c"]
+    assert batch.flushes == 2
+
+    batch.flush()
+    assert batch.flushes == 2
+
+
+def test_move_file_across_devices(
+    tmp_path: Path, synced: list[Path], monkeypatch: pytest.MonkeyPatch
+):
+    """Copies are synced before their rename, sources removed after the flush."""
+    rename_noreplace = file_utils.rename_noreplace
+
+    def rename_other_device(src_path: Path, dst_path: Path) -> None:
+        """Rename files of the temporary copy, fail like on another device."""
+        if src_path.parent != dst_path.parent:
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        rename_noreplace(src_path, dst_path)
+
+    monkeypatch.setattr(file_utils, "rename_noreplace", rename_other_device)
+    src_path: Path = tmp_path / "source" / "IMG_0001.jpg"
+    src_path.parent.mkdir()
+    src_path.write_bytes(b"photo")
+    dst_path: Path = tmp_path / "dest" / "photos" / "IMG_0001.jpg"
+
+    with use_batch(DurableBatch()) as batch:
+        assert move_file(src_path, dst_path, dry_run=False) == dst_path
+        assert dst_path.read_bytes() == b"photo"
+        assert src_path.exists()
+        assert synced == [dst_path.with_name(f".IMG_0001.jpg.{os.getpid()}.partial")]
+        # Seen again, e.g. by the walk, the source is already moved.
+        assert move_file(src_path, dst_path, dry_run=False) is None
+
+    assert not src_path.exists()
+    assert set(synced[1:]) == {tmp_path, tmp_path / "dest", dst_path.parent}
+    assert batch.flushes == 1
+    assert [path.name for path in dst_path.parent.iterdir()] == ["IMG_0001.jpg"]
+
+
+def test_move_from_source_durable(tmp_path: Path, synced: list[Path]):
+    """Durable runs sync the source and destination folders of the moves."""
+    source_dir: Path = tmp_path / "source"
+    source_dir.mkdir()
+    (source_dir / "notes.txt").write_bytes(b"notes")
+    (source_dir / "dup").mkdir()
+    (source_dir / "dup" / "notes.txt").write_bytes(b"notes")
+    dest_dir: Path = tmp_path / "dest"
+
+    with use_batch(DurableBatch()):
+        move_from_source(
+            source_dir,
+            dest_dir,
+            fast=True,
+            dry_run=False,
+            on_duplicate=OnDuplicate.CREATE_UNIQ_FILENAME_IF_CONTENT_MISMATCH,
+        )
+        assert len(list(source_dir.rglob("notes.txt"))) == 1
+
+    assert not list(source_dir.rglob("notes.txt"))
+    assert (dest_dir / "docs/txt/notes.txt").exists()
+    assert {source_dir, dest_dir / "docs/txt", dest_dir / "docs"} <= set(synced)
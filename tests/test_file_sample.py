@@ -0,0 +1,100 @@
+"""Test reading files once into a shared head and tail sample."""
+
+import builtins
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+import piexif
+import pytest
+
+from media_organizer import config, file_sample
+from media_organizer.date_fetcher import get_accurate_media_date
+from media_organizer.dedupe import full_hash
+from media_organizer.enums import FileKind
+from media_organizer.file_sample import FileSample, get_partial_hash, sniff_kind
+from media_organizer.file_utils import is_files_equal
+
+from .create_img import create_mock_image
+
+
+@pytest.fixture(name="opened")
+def fixture_opened(monkeypatch: pytest.MonkeyPatch) -> list[Path]:
+    """Record the files opened for reading, with an empty partial hash cache."""
+    opened: list[Path] = []
+    open_file = builtins.open
+
+    def record_open(file, mode="r", **kwargs):
+        if mode == "rb":
+            opened.append(Path(file))
+        return open_file(file, mode, **kwargs)
+
+    monkeypatch.setattr(builtins, "open", record_open)
+    monkeypatch.setattr(file_sample, "_partial_hashes", OrderedDict())
+    return opened
+
+
+@pytest.mark.parametrize(
+    "head, kind",
+    [
+        (b"\xff\xd8\xff\xe1", FileKind.JPEG),
+        (b"II*\x00\x08\x00", FileKind.TIFF),
+        (b"RIFF\x00\x00\x00\x00WEBPVP8 ", FileKind.WEBP),
+        (b"\x00\x00\x00\x18ftypheic", FileKind.ISO_MEDIA),
+        (b"PK\x03\x04", FileKind.ZIP),
+        (b"notes", FileKind.UNKNOWN),
+    ],
+)
+def test_sniff_kind(head: bytes, kind: FileKind):
+    """Formats are recognized by the magic bytes of their head."""
+    assert sniff_kind(head) == kind
+
+
+def test_partial_hash(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    """Small files are hashed whole, larger ones by their head and tail."""
+    monkeypatch.setattr(config, "PARTIAL_HASH_SIZE", 4)
+    small: Path = tmp_path / "small.bin"
+    small.write_bytes(b"12345678")
+    large: Path = tmp_path / "large.bin"
+    large.write_bytes(b"head-middle-tail")
+    same_ends: Path = tmp_path / "same_ends.bin"
+    same_ends.write_bytes(b"head-MIDDLE-tail")
+
+    assert FileSample.read(small).partial_hash == full_hash(small)
+    sample: FileSample = FileSample.read(large, head_size=8)
+    assert (sample.head, sample.tail, sample.content) == (b"head-mid", b"tail", None)
+    assert sample.partial_hash == FileSample.read(same_ends).partial_hash
+    assert sample.partial_hash != full_hash(large)
+
+
+def test_file_read_once(tmp_path: Path, opened: list[Path]):
+    """The date, the comparison with the destination and the catalog share one read."""
+    photo: Path = tmp_path / "IMG_0001.jpg"
+    create_mock_image(str(photo), "2023:05:20 15:45:50")
+    copy: Path = tmp_path / "copy.jpg"
+    copy.write_bytes(photo.read_bytes())
+    opened.clear()
+
+    date: datetime | None = get_accurate_media_date(photo)
+    assert date is not None
+    assert date.year == 2023
+    moved: Path = photo.rename(tmp_path / "moved.jpg")
+    assert is_files_equal(moved, copy)
+    get_partial_hash(moved)
+
+    assert opened == [photo, copy]
+
+
+def test_skip_formats_without_exif(
+    tmp_path: Path, opened: list[Path], monkeypatch: pytest.MonkeyPatch
+):
+    """Formats piexif cannot read are not given to it."""
+    monkeypatch.setattr(piexif, "load", pytest.fail)
+    monkeypatch.setattr(
+        "media_organizer.date_fetcher.extract_creation_date", lambda path: None
+    )
+    video: Path = tmp_path / "clip.mp4"
+    video.write_bytes(b"\x00\x00\x00\x18ftypisom" + bytes(64))
+
+    assert get_accurate_media_date(video) is None
+    assert opened == [video]
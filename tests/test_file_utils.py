@@ -0,0 +1,69 @@
+"""Test file utilities."""
+
+from pathlib import Path
+
+import pytest
+
+from media_organizer.enums import OnDuplicate
+from media_organizer.file_utils import (
+    is_files_equal,
+    move_file,
+    parse_byte_size,
+    rename_noreplace,
+)
+
+
+class TestFileUtils:
+    """Test file_utils.py"""
+
+    @pytest.mark.parametrize(
+        "raw_size, expected",
+        [("512", 512), ("2K", 2048), ("1.5M", 1536 * 1024), ("2GiB", 2 * 1024**3)],
+    )
+    def test_parse_byte_size(self, raw_size: str, expected: int):
+        """Human readable sizes are parsed into bytes."""
+        assert parse_byte_size(raw_size) == expected
+
+    @pytest.mark.parametrize("raw_size", ["", "M", "-1K", "ten"])
+    def test_parse_byte_size_invalid(self, raw_size: str):
+        """Invalid sizes raise ValueError."""
+        with pytest.raises(ValueError):
+            parse_byte_size(raw_size)
+
+    def test_rename_noreplace(self, tmp_path: Path):
+        """The destination is never overwritten."""
+        src_path: Path = tmp_path / "src.jpg"
+        dst_path: Path = tmp_path / "dst.jpg"
+        src_path.write_text("src")
+        dst_path.write_text("dst")
+
+        with pytest.raises(FileExistsError):
+            rename_noreplace(src_path, dst_path)
+        assert dst_path.read_text() == "dst"
+
+        dst_path.unlink()
+        rename_noreplace(src_path, dst_path)
+        assert not src_path.exists()
+        assert dst_path.read_text() == "src"
+
+    @pytest.mark.parametrize(
+        "src_content, dst_content, expected",
+        [("same", "same", True), ("same", "diff", False), ("short", "longer", False)],
+    )
+    def test_is_files_equal(
+        self, tmp_path: Path, src_content: str, dst_content: str, expected: bool
+    ):
+        """Files are equal only if their content is equal."""
+        (tmp_path / "src").write_text(src_content)
+        (tmp_path / "dst").write_text(dst_content)
+        assert is_files_equal(tmp_path / "src", tmp_path / "dst") is expected
+
+    @pytest.mark.parametrize("on_duplicate", list(OnDuplicate))
+    def test_move_file_onto_itself(self, tmp_path: Path, on_duplicate: OnDuplicate):
+        """A file already at its destination is neither removed nor renamed."""
+        path: Path = tmp_path / "notes.txt"
+        path.write_text("notes")
+
+        assert move_file(path, path, dry_run=False, on_duplicate=on_duplicate) == path
+        assert path.read_text() == "notes"
+        assert [child.name for child in tmp_path.iterdir()] == ["notes.txt"]
@@ -0,0 +1,93 @@
+"""Test scheduling file reads per storage device."""
+
+import os
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from media_organizer import io_scheduler
+from media_organizer.enums import DeviceProfile
+from media_organizer.io_scheduler import (
+    IoScheduler,
+    get_device_id,
+    order_for_rotational,
+    read_rotational,
+)
+from media_organizer.walker import FileRecord, walk_source
+
+
+class TestIoScheduler:
+    """Test io_scheduler.py"""
+
+    @pytest.mark.parametrize("rotational, expected", [("1\n", True), ("0\n", False)])
+    def test_read_rotational_disk(self, tmp_path: Path, rotational: str, expected: bool):
+        """Rotational flag is read from the queue folder of the disk."""
+        queue_dir: Path = tmp_path / "8:0" / "queue"
+        queue_dir.mkdir(parents=True)
+        (queue_dir / "rotational").write_text(rotational)
+
+        assert read_rotational(os.makedev(8, 0), sys_dev_block=tmp_path) is expected
+
+    def test_read_rotational_partition(self, tmp_path: Path):
+        """Partitions use the queue folder of their parent disk."""
+        disk_dir: Path = tmp_path / "devices" / "sda"
+        (disk_dir / "queue").mkdir(parents=True)
+        (disk_dir / "queue" / "rotational").write_text("1\n")
+        (disk_dir / "sda1").mkdir()
+        block_dir: Path = tmp_path / "block"
+        block_dir.mkdir()
+        (block_dir / "8:1").symlink_to(disk_dir / "sda1")
+
+        assert read_rotational(os.makedev(8, 1), sys_dev_block=block_dir) is True
+
+    def test_read_rotational_unknown_device(self, tmp_path: Path):
+        """Devices missing in sysfs, like tmpfs, have unknown rotational state."""
+        assert read_rotational(os.makedev(0, 42), sys_dev_block=tmp_path) is None
+
+    def test_get_device_id_missing_destination(self, tmp_path: Path):
+        """Missing destination folders resolve to the device of their parent."""
+        assert get_device_id(tmp_path / "not" / "created") == tmp_path.stat().st_dev
+
+    def test_order_for_rotational(self, monkeypatch, tmp_path: Path):
+        """Files are ordered by physical offset, unknown offsets come last."""
+        paths: list[Path] = [tmp_path / name for name in ("a", "b", "c")]
+        for path in paths:
+            path.write_text(path.name)
+        offsets: dict[str, int | None] = {"a": 300, "b": None, "c": 100}
+        monkeypatch.setattr(
+            io_scheduler, "get_physical_offset", lambda path: offsets[path.name]
+        )
+
+        ordered = order_for_rotational([FileRecord.from_path(path) for path in paths])
+
+        assert [record.name for record in ordered] == ["c", "a", "b"]
+
+    @pytest.mark.parametrize("device_profile", [DeviceProfile.SSD, DeviceProfile.HDD])
+    def test_read_dates(self, tmp_path: Path, device_profile: DeviceProfile):
+        """Every path is yielded once, only media files get their date read."""
+        for name in ("a.jpg", "b.jpg", "c.txt"):
+            (tmp_path / name).write_text(name)
+        date: datetime = datetime(2024, 10, 21, 17, 56, 55)
+        read_paths: list[Path] = []
+
+        def read_date(path: Path) -> datetime:
+            read_paths.append(path)
+            return date
+
+        scheduler = IoScheduler(dest_dir=tmp_path / "dest", device_profile=device_profile)
+        result = {
+            record.path: record_date
+            for record, record_date in scheduler.read_dates(
+                walk_source(tmp_path),
+                read_date=read_date,
+                needs_date=lambda record: record.suffix == ".jpg",
+            )
+        }
+
+        assert result == {
+            tmp_path / "a.jpg": date,
+            tmp_path / "b.jpg": date,
+            tmp_path / "c.txt": None,
+        }
+        assert sorted(read_paths) == [tmp_path / "a.jpg", tmp_path / "b.jpg"]
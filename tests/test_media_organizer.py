@@ -7,7 +7,8 @@ import pytest
 from py._path.local import LocalPath
 
 from media_organizer import media_organizer
-from media_organizer.media_organizer import OnDuplicate, create_unique_filepath
+from media_organizer.file_utils import create_unique_filepath
+from media_organizer.media_organizer import OnDuplicate
 from tests.create_img import create_mock_image
 
 
@@ -150,3 +151,51 @@ class TestMediaOrganizer:
         mock_exists.side_effect = mock_exists_side_effect
         result = create_unique_filepath(dest_path)
         assert result == expected_result
+
+    @pytest.mark.parametrize("relative", [False, True])
+    def test_media_organizer_nested_destination(
+        self,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture,
+        relative: bool,
+    ):
+        """A destination inside the source is not organized again."""
+        source_dir: Path = tmp_path / "source"
+        dest_dir: Path = source_dir / "organized"
+        (dest_dir / "docs" / "txt").mkdir(parents=True)
+        (dest_dir / "docs" / "txt" / "old.txt").write_text("old")
+        (source_dir / "new.txt").write_text("new")
+        if relative:
+            monkeypatch.chdir(source_dir)
+
+        media_organizer.move_from_source(
+            Path(".") if relative else source_dir,
+            Path("organized") if relative else dest_dir,
+            dry_run=False,
+        )
+
+        assert sorted(
+            str(path.relative_to(dest_dir)) for path in dest_dir.rglob("*.txt")
+        ) == ["docs/txt/new.txt", "docs/txt/old.txt"]
+        assert "old.txt" not in capsys.readouterr().out
+
+    def test_media_organizer_destination_is_source(
+        self, tmp_path: Path, capsys: pytest.CaptureFixture
+    ):
+        """Organizing a library into itself leaves its organized files alone."""
+        (tmp_path / "docs" / "txt").mkdir(parents=True)
+        (tmp_path / "docs" / "txt" / "old.txt").write_text("old")
+        (tmp_path / "unsort" / "bin").mkdir(parents=True)
+        (tmp_path / "unsort" / "bin" / "old.bin").write_text("old")
+        (tmp_path / "new.txt").write_text("new")
+
+        media_organizer.move_from_source(tmp_path, tmp_path, dry_run=False)
+
+        assert sorted(path.name for path in (tmp_path / "docs" / "txt").iterdir()) == [
+            "new.txt",
+            "old.txt",
+        ]
+        assert (tmp_path / "unsort" / "bin" / "old.bin").read_text() == "old"
+        assert not (tmp_path / "new.txt").exists()
+        assert "old." not in capsys.readouterr().out
@@ -0,0 +1,57 @@
+"""Test perceptual hashing and finding near duplicate photos."""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from media_organizer.bk_tree import hamming_distance
+from media_organizer.enums import HashAlgorithm
+from media_organizer.near_duplicates import find_near_duplicates, move_to_review
+from media_organizer.perceptual_hash import hash_photos
+
+
+def create_photo(file_path: Path, seed: int, size: int = 512, quality: int = 95) -> Path:
+    """Create a photo with smooth random structure, like a real scene."""
+    rng = np.random.default_rng(seed)
+    pattern = rng.integers(0, 256, (8, 8, 3), dtype=np.uint8)
+    img = Image.fromarray(pattern).resize((size, size), Image.Resampling.BICUBIC)
+    img.save(file_path, "JPEG", quality=quality)
+    return file_path
+
+
+@pytest.mark.parametrize("algorithm", [HashAlgorithm.DHASH, HashAlgorithm.PHASH])
+def test_hash_photos_resized_copy(tmp_path: Path, algorithm: HashAlgorithm):
+    """Resized and re-compressed copies get close hashes, other photos do not."""
+    original = create_photo(tmp_path / "original.jpg", seed=1)
+    copy = create_photo(tmp_path / "copy.jpg", seed=1, size=200, quality=40)
+    other = create_photo(tmp_path / "other.jpg", seed=2)
+    broken = tmp_path / "broken.jpg"
+    broken.write_text("not a photo")
+
+    hashes = dict(hash_photos([original, copy, other, broken], algorithm))
+
+    assert hashes[broken] is None
+    original_hash, copy_hash, other_hash = hashes[original], hashes[copy], hashes[other]
+    assert original_hash is not None
+    assert copy_hash is not None
+    assert other_hash is not None
+    assert hamming_distance(original_hash, copy_hash) <= 8
+    assert hamming_distance(original_hash, other_hash) > 8
+
+
+def test_find_near_duplicates(tmp_path: Path):
+    """Copies are grouped, the largest file stays and the rest goes to review."""
+    original = create_photo(tmp_path / "IMG_0001.jpg", seed=1)
+    copy = create_photo(tmp_path / "IMG_0001 (1).jpg", seed=1, size=200, quality=40)
+    other = create_photo(tmp_path / "IMG_0002.jpg", seed=2)
+
+    groups = find_near_duplicates([original, copy, other], workers=1)
+
+    assert [sorted(group) for group in groups] == [sorted([original, copy])]
+
+    move_to_review(groups, review_dir=tmp_path / "review", dry_run=False)
+    assert original.exists()
+    assert other.exists()
+    assert (tmp_path / "review" / "00001" / copy.name).exists()
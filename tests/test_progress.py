@@ -0,0 +1,98 @@
+"""Test the live progress of runs."""
+
+import io
+import threading
+from datetime import timedelta
+from pathlib import Path
+
+from media_organizer.enums import ProgressStage
+from media_organizer.media_organizer import move_from_source
+from media_organizer.progress import Progress
+
+
+class FakeClock:  # pylint: disable=too-few-public-methods
+    """Clock advanced by hand."""
+
+    def __init__(self) -> None:
+        self.now: float = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_progress_throttled_log_lines():
+    """Log lines are only written once per interval, with throughput and ETA."""
+    clock = FakeClock()
+    stream = io.StringIO()
+    progress = Progress(stream=stream, interval=10, clock=clock)
+    progress.total_files, progress.total_bytes = 100, 100 * 1024**2
+
+    for _ in range(20):
+        clock.now += 0.1
+        progress.add(ProgressStage.MOVE, 1024**2)
+    assert not stream.getvalue()
+
+    clock.now = 10
+    progress.add(ProgressStage.MOVE, 1024**2)
+
+    line: str = stream.getvalue()
+    assert line.startswith("[ PROGRESS ] 21/100 files, 21.0 MB/100.0 MB (21%)")
+    assert "move 2 files/s 2.1 MB/s" in line
+    assert progress.get_eta() == timedelta(seconds=38)
+    assert line.count("\n") == 1
+
+
+def test_progress_unknown_totals():
+    """Without totals, the progress is counting and has no ETA."""
+    progress = Progress(stream=io.StringIO(), interval=10, clock=FakeClock())
+
+    progress.add(ProgressStage.WALK, 10)
+
+    assert progress.get_eta() is None
+    assert progress.format_line().startswith("0 files, 0.0 MB (counting)")
+
+
+def test_move_from_source_progress(tmp_path: Path):
+    """The pre-count sets the totals, every stage sees every file."""
+    source_dir: Path = tmp_path / "source"
+    source_dir.mkdir()
+    for index in range(3):
+        (source_dir / f"notes_{index}.txt").write_bytes(b"notes")
+    stream = io.StringIO()
+    progress = Progress(stream=stream)
+
+    move_from_source(
+        source_dir, tmp_path / "dest", fast=True, dry_run=True, progress=progress
+    )
+    for thread in threading.enumerate():
+        if thread.name == "precount":
+            thread.join()
+    progress.finish()
+
+    assert (progress.total_files, progress.total_bytes) == (3, 15)
+    assert [counter.files for counter in progress.counters.values()] == [3, 3, 3]
+    assert stream.getvalue().startswith("[ PROGRESS ] done: 3 files")
+
+
+def test_status_line_cleared_before_output(capsys):
+    """Lines printed while the status line is shown do not run into it."""
+
+    class TerminalStream(io.StringIO):
+        """Stream pretending to be a terminal."""
+
+        def isatty(self) -> bool:
+            return True
+
+    stream = TerminalStream()
+    clock = FakeClock()
+    progress = Progress(stream=stream, interval=1, clock=clock)
+
+    with progress.share_terminal():
+        clock.now = 1
+        progress.add(ProgressStage.MOVE, 10)
+        print("mv a b")
+        print("mv c d")
+
+    assert stream.getvalue().endswith("\x1b[K\r\x1b[K")
+    assert stream.getvalue().count("\r\x1b[K") == 1
+    assert capsys.readouterr().out == "mv a b\nmv c d\n"
@@ -0,0 +1,119 @@
+"""Test the routing of files into category folders."""
+
+import os
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from media_organizer.enums import DateSource
+from media_organizer.media_organizer import move_from_source
+from media_organizer.routing import RoutingTable, get_default_routing, load_routing
+
+CUSTOM_ROUTING: str = """
+[fallback]
+folder = "misc"
+
+[categories.scans]
+folder = "scans"
+date = "mtime"
+template = "%Y/{ext}"
+extensions = ["tif", ".PDF"]
+"""
+
+
+@pytest.mark.parametrize(
+    "name, category, folder",
+    [
+        ("IMG_0001.jpg", "photos", "photos"),
+        ("IMG_0001.HEIC", "photos", "photos"),
+        ("P1000001.RW2", "photos", "photos"),
+        ("PA010001.orf", "photos", "photos"),
+        ("clip.MOV", "videos", "videos"),
+        ("song.mp3", "audio", "audio"),
+        ("notes.txt", "docs", "docs"),
+        ("export.tar.gz", "archives", "archives"),
+        ("model.stl", "fallback", "unsort"),
+        ("Makefile", "fallback", "unsort"),
+    ],
+)
+def test_default_routing_lookup(name: str, category: str, folder: str):
+    """Extensions are matched whatever their case, unknown ones fall back."""
+    route = get_default_routing().lookup(name)
+    assert (route.category, route.folder) == (category, folder)
+
+
+def test_route_get_folder():
+    """Templates give the extension folders, dated routes the date folders."""
+    routing: RoutingTable = get_default_routing()
+    dest_dir = Path("dest")
+    date = datetime(2021, 6, 13)
+
+    assert routing.lookup("notes.TXT").get_folder(dest_dir, "notes.TXT", None) == Path(
+        "dest/docs/TXT"
+    )
+    assert routing.lookup("Makefile").get_folder(dest_dir, "Makefile", None) == Path(
+        "dest/unsort"
+    )
+    photo = routing.lookup("a.jpg")
+    assert photo.get_folder(dest_dir, "a.jpg", date) == Path(
+        "dest/photos/2021/2021_06_13"
+    )
+    assert photo.get_folder(dest_dir, "a.jpg", None) == Path("dest/photos")
+
+
+@pytest.mark.parametrize(
+    "raw_routing, message",
+    [
+        (
+            '[categories.a]\nfolder = "a"\nextensions = [".jpg"]\n'
+            '[categories.b]\nfolder = "b"\nextensions = [".JPG"]\n',
+            "both a and b",
+        ),
+        ('[categories.a]\nfolder = "a"\ndate = "gps"\n', "unknown date strategy"),
+        ('[categories.a]\nextensions = [".jpg"]\n', "has no 'folder'"),
+        ('[categories.a]\nfolder = "../a"\n', "below the destination"),
+        ("[categories", "invalid routing config"),
+    ],
+)
+def test_load_routing_invalid(tmp_path: Path, raw_routing: str, message: str):
+    """Invalid configs are rejected with the reason."""
+    routing_path: Path = tmp_path / "routing.toml"
+    routing_path.write_text(raw_routing, encoding="utf-8")
+
+    with pytest.raises(ValueError, match=message):
+        load_routing(routing_path)
+
+
+def test_load_routing_user_config(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    """The user's routing config replaces the default one."""
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+    assert load_routing() is get_default_routing()
+
+    user_path: Path = tmp_path / "media_organizer" / "routing.toml"
+    user_path.parent.mkdir()
+    user_path.write_text(CUSTOM_ROUTING, encoding="utf-8")
+
+    assert load_routing().lookup("scan.tif").category == "scans"
+
+
+def test_move_from_source_custom_routing(tmp_path: Path):
+    """Files follow the folders and date strategy of a custom routing config."""
+    routing_path: Path = tmp_path / "routing.toml"
+    routing_path.write_text(CUSTOM_ROUTING, encoding="utf-8")
+    routing: RoutingTable = load_routing(routing_path)
+    source_dir: Path = tmp_path / "source"
+    source_dir.mkdir()
+    scan_path: Path = source_dir / "scan.pdf"
+    scan_path.write_bytes(b"scan")
+    timestamp: float = datetime(2019, 3, 4).timestamp()
+    os.utime(scan_path, (timestamp, timestamp))
+    (source_dir / "IMG_0001.jpg").write_bytes(b"not a photo")
+    dest_dir: Path = tmp_path / "dest"
+
+    scan_route = routing.lookup("scan.pdf")
+    assert scan_route.get_date_source(datetime(2019, 3, 4), False) == DateSource.MTIME
+    move_from_source(source_dir, dest_dir, dry_run=False, routing=routing)
+
+    assert (dest_dir / "scans/2019/pdf/scan.pdf").exists()
+    assert (dest_dir / "misc/IMG_0001.jpg").exists()
@@ -0,0 +1,135 @@
+"""Test the organizer server, its thin client and the exiftool pool."""
+
+import subprocess
+import sys
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from media_organizer import client, server
+from media_organizer.exiftool import ExifToolPool, get_active_pool, use_pool
+
+FAKE_EXIFTOOL: str = f"""#!{sys.executable}
+import sys
+
+for line in sys.stdin:
+    line = line.rstrip("\\n")
+    if line == "-stay_open":
+        continue
+    if line == "False":
+        break
+    if line == "-execute":
+        print("{{ready}}", flush=True)
+    else:
+        print("arg:" + line)
+"""
+
+
+@pytest.fixture(name="fake_exiftool")
+def fixture_fake_exiftool(tmp_path: Path) -> str:
+    """Return a fake exiftool echoing its arguments in stay_open mode."""
+    executable: Path = tmp_path / "exiftool"
+    executable.write_text(FAKE_EXIFTOOL)
+    executable.chmod(0o755)
+    return str(executable)
+
+
+@pytest.fixture(name="socket_path")
+def fixture_socket_path(tmp_path: Path) -> Iterator[Path]:
+    """Run the serve command in another process and return its socket.
+
+    The server redirects the process wide stdout, so it cannot share a
+    process with the client.
+    """
+    socket_path: Path = tmp_path / "server.sock"
+    # pylint: disable-next=consider-using-with
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "media_organizer.media_organizer",
+            "serve",
+            "--socket",
+            str(socket_path),
+            "--exiftool-workers",
+            "0",
+        ],
+        stdout=subprocess.DEVNULL,
+    )
+    deadline: float = time.monotonic() + 30
+    while not server.is_server_running(socket_path):
+        assert process.poll() is None and time.monotonic() < deadline
+        time.sleep(0.05)
+    yield socket_path
+    process.terminate()
+    process.wait(timeout=30)
+    assert not socket_path.exists()
+
+
+def test_exiftool_pool_reuses_processes(fake_exiftool: str):
+    """Commands run on the running processes, newlines are rejected."""
+    pool = ExifToolPool(size=2, executable=fake_exiftool)
+    try:
+        assert pool.execute("-s3", "photo.jpg") == "arg:-s3\narg:photo.jpg\n"
+        assert pool.execute("video.mp4") == "arg:video.mp4\n"
+        with pytest.raises(ValueError):
+            pool.execute("new\nline.jpg")
+    finally:
+        pool.close()
+
+
+def test_use_pool_restores_previous_pool(fake_exiftool: str):
+    """The date fetchers only see the pool inside the context."""
+    pool = ExifToolPool(size=1, executable=fake_exiftool)
+    try:
+        assert get_active_pool() is None
+        with use_pool(pool):
+            assert get_active_pool() is pool
+        assert get_active_pool() is None
+    finally:
+        pool.close()
+
+
+def test_client_runs_organize_on_server(
+    socket_path: Path, tmp_path: Path, monkeypatch, capsys
+):
+    """Relative paths are resolved in the client's folder, output is streamed back."""
+    source_dir: Path = tmp_path / "source"
+    dest_dir: Path = tmp_path / "dest"
+    source_dir.mkdir()
+    (source_dir / "notes.txt").write_text("not a media file")
+    monkeypatch.chdir(tmp_path)
+
+    exit_code: int = client.send_command(["organize", "source", "dest"], socket_path)
+
+    assert exit_code == 0
+    assert (dest_dir / "docs" / "txt" / "notes.txt").exists()
+    assert not (source_dir / "notes.txt").exists()
+    assert "notes.txt" in capsys.readouterr().out
+
+
+def test_client_gets_usage_errors(socket_path: Path, capsys):
+    """Usage errors are printed and returned like the standalone command."""
+    exit_code: int = client.send_command(["organize", "/does/not/exist"], socket_path)
+
+    assert exit_code == 2
+    assert "does not exist" in capsys.readouterr().out
+
+
+def test_server_refuses_to_serve_again(socket_path: Path):
+    """Neither a client nor a second server can start another server."""
+    assert client.send_command(["serve"], socket_path) == 2
+    with pytest.raises(Exception, match="already running"):
+        server.create_server(socket_path)
+
+
+def test_client_falls_back_to_standalone(tmp_path: Path, monkeypatch):
+    """Without a server, the client runs the command itself."""
+    monkeypatch.setenv("MEDIA_ORGANIZER_SOCKET", str(tmp_path / "missing.sock"))
+    monkeypatch.setattr(sys, "argv", ["media_organizer_client", "--help"])
+
+    with pytest.raises(SystemExit) as exit_info:
+        client.main()
+    assert exit_info.value.code == 0
@@ -0,0 +1,101 @@
+"""Test the incremental walks with directory snapshots."""
+
+import os
+import time
+from pathlib import Path
+
+from media_organizer import config
+from media_organizer.media_organizer import move_from_source
+from media_organizer.snapshots import SnapshotStore
+from media_organizer.walker import walk_source
+
+PAST: float = time.time() - 3600
+"""Modification time of the created folders, older than the settle time."""
+
+
+def create_tree(source_dir: Path) -> None:
+    """Create nested folders with one file each, modified an hour ago."""
+    for folder in ("", "2020", "2020/june", "2021"):
+        (source_dir / folder).mkdir(parents=True, exist_ok=True)
+        (source_dir / folder / "notes.txt").write_bytes(b"notes")
+    for folder in ("2020/june", "2020", "2021", ""):
+        os.utime(source_dir / folder, (PAST, PAST))
+
+
+def walk_names(source_dir: Path, store: SnapshotStore) -> set[str]:
+    """Walk the source with the given snapshots, returning the relative file paths."""
+    return {
+        str(record.path.relative_to(source_dir))
+        for record in walk_source(source_dir, snapshots=store)
+    }
+
+
+def test_walk_source_snapshots(tmp_path: Path):
+    """Unchanged folders are not listed, their subfolders still are."""
+    source_dir: Path = tmp_path / "source"
+    create_tree(source_dir)
+
+    with SnapshotStore(tmp_path, "scope") as store:
+        assert len(walk_names(source_dir, store)) == 4
+        assert (store.listed, store.skipped, store.verify) == (4, 0, True)
+        store.save()
+
+    (source_dir / "2020/june/new.txt").write_bytes(b"new")
+    with SnapshotStore(tmp_path, "scope") as store:
+        assert walk_names(source_dir, store) == {
+            "2020/june/notes.txt",
+            "2020/june/new.txt",
+        }
+        assert (store.listed, store.skipped, store.verify) == (1, 3, False)
+        store.save()
+
+    # The changed folder was too recent to be trusted, it is listed again.
+    with SnapshotStore(tmp_path, "scope") as store:
+        assert len(walk_names(source_dir, store)) == 2
+        assert (store.listed, store.skipped) == (1, 3)
+
+
+def test_walk_source_snapshots_full_scan(tmp_path: Path):
+    """A full scan lists every folder and reports the changes the snapshots missed."""
+    source_dir: Path = tmp_path / "source"
+    create_tree(source_dir)
+    with SnapshotStore(tmp_path, "scope") as store:
+        walk_names(source_dir, store)
+        store.save()
+
+    # A file added while keeping the folder's modification time.
+    (source_dir / "2021/hidden.txt").write_bytes(b"hidden")
+    os.utime(source_dir / "2021", (PAST, PAST))
+    with SnapshotStore(tmp_path, "scope") as store:
+        assert not walk_names(source_dir, store)
+
+    next_day: float = time.time() + config.SNAPSHOT_FULL_SCAN_SECONDS
+    with SnapshotStore(tmp_path, "scope", clock=lambda: next_day) as store:
+        assert "2021/hidden.txt" in walk_names(source_dir, store)
+        assert (store.listed, store.missed, store.verify) == (4, 1, True)
+
+
+def test_move_from_source_incremental(tmp_path: Path):
+    """Incremental runs find new files, other scopes and dry runs walk everything."""
+    source_dir: Path = tmp_path / "source"
+    create_tree(source_dir)
+    (source_dir / "2021/notes.txt").rename(source_dir / "2021/notes.md")
+    os.utime(source_dir / "2021", (PAST, PAST))
+    dest_dir: Path = tmp_path / "dest"
+
+    move_from_source(
+        source_dir, dest_dir, dry_run=False, incremental=True, full_scan=True
+    )
+    assert not (source_dir / "2020/june/notes.txt").exists()
+    assert (dest_dir / "unsort/md/notes.md").exists()
+
+    (dest_dir / "unsort/md/notes.md").rename(source_dir / "2021/notes.md")
+    os.utime(source_dir / "2021", (PAST, PAST))
+    (source_dir / "2020/june/new.txt").write_bytes(b"new")
+    move_from_source(source_dir, dest_dir, dry_run=False, incremental=True)
+
+    assert (dest_dir / "docs/txt/new.txt").exists()
+    assert (source_dir / "2021/notes.md").exists()
+
+    move_from_source(source_dir, dest_dir, dry_run=False)
+    assert not (source_dir / "2021/notes.md").exists()
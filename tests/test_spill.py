@@ -0,0 +1,35 @@
+"""Test keeping intermediate state within a memory budget."""
+
+import pytest
+
+from media_organizer.spill import SpillList, get_max_items, sorted_spill
+
+
+class TestSpill:
+    """Test spill.py"""
+
+    @pytest.mark.parametrize("max_items", [2, 3, 100])
+    def test_spill_list(self, max_items: int):
+        """Items keep their insertion order whether they are spilled or not."""
+        with SpillList[int](max_items=max_items) as items:
+            for number in range(10):
+                items.append(number)
+
+            assert len(items) == 10
+            assert items.is_spilled == (max_items <= 10)
+            assert list(items) == list(range(10))
+
+    @pytest.mark.parametrize("max_items", [1, 3, 100])
+    @pytest.mark.parametrize("reverse", [False, True])
+    def test_sorted_spill(self, max_items: int, reverse: bool):
+        """Items are sorted across all runs spilled to disk."""
+        numbers: list[int] = [7, 3, 9, 1, 3, 8, 0, 5]
+        result = list(
+            sorted_spill(numbers, key=lambda x: x, max_items=max_items, reverse=reverse)
+        )
+        assert result == sorted(numbers, reverse=reverse)
+
+    def test_get_max_items(self):
+        """At least one item always fits the budget."""
+        assert get_max_items(1024, item_size=256) == 4
+        assert get_max_items(0, item_size=256) == 1
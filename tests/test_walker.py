@@ -0,0 +1,105 @@
+"""Test walking source directories."""
+
+import os
+from pathlib import Path
+
+import pytest
+
+from media_organizer import config
+from media_organizer.walker import (
+    FileRecord,
+    WalkRules,
+    find_nested_destination,
+    walk_source,
+)
+
+
+class TestWalker:
+    """Test walker.py"""
+
+    def test_walk_source(self, tmp_path: Path):
+        """All regular files are yielded, folders and symlinked folders are not."""
+        (tmp_path / "a" / "b").mkdir(parents=True)
+        (tmp_path / "root.jpg").write_text("root")
+        (tmp_path / "a" / "child.MOV").write_text("child")
+        (tmp_path / "a" / "b" / "grandchild.txt").write_text("grandchild")
+        (tmp_path / "link").symlink_to(tmp_path / "a", target_is_directory=True)
+
+        records: list[FileRecord] = list(walk_source(tmp_path))
+
+        assert sorted(record.path for record in records) == [
+            tmp_path / "a" / "b" / "grandchild.txt",
+            tmp_path / "a" / "child.MOV",
+            tmp_path / "root.jpg",
+        ]
+        child: FileRecord = next(r for r in records if r.name == "child.MOV")
+        assert child.suffix == ".mov"
+        assert child.size == len("child")
+        assert child.ino == (tmp_path / "a" / "child.MOV").stat().st_ino
+
+    def test_walk_source_shares_parent(self, tmp_path: Path):
+        """Files of the same folder share one interned parent string."""
+        for name in ("a.jpg", "b.jpg"):
+            (tmp_path / name).write_text(name)
+
+        first, second = walk_source(tmp_path)
+
+        assert first.parent is second.parent
+
+    def test_walk_rules(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        """Excluded folders are never listed, files are filtered by glob and size."""
+        for folder in (
+            ".git",
+            "node_modules/pkg",
+            "Catalog Previews.lrdata",
+            "a/Exports",
+        ):
+            (tmp_path / folder).mkdir(parents=True)
+            (tmp_path / folder / "IMG_0001.jpg").write_text("excluded")
+        (tmp_path / "a" / "IMG_0002.jpg").write_text("kept")
+        (tmp_path / "a" / "empty.jpg").write_text("")
+        (tmp_path / "a" / "notes.txt").write_text("not included")
+        listed: list[str] = []
+        scandir = os.scandir
+
+        def recording_scandir(path):
+            listed.append(path)
+            return scandir(path)
+
+        monkeypatch.setattr(os, "scandir", recording_scandir)
+        rules = WalkRules(
+            include=["*.jpg"],
+            exclude=[*config.DEFAULT_EXCLUDES, "a/Exports"],
+            min_size=1,
+        )
+
+        records: list[FileRecord] = list(walk_source(tmp_path, rules))
+
+        assert [record.path for record in records] == [tmp_path / "a" / "IMG_0002.jpg"]
+        assert sorted(listed) == [str(tmp_path), str(tmp_path / "a")]
+
+    def test_find_nested_destination(self, tmp_path: Path):
+        """A destination inside the source is found, given relative to the source."""
+        (tmp_path / "source" / "organized").mkdir(parents=True)
+        source_dir: Path = tmp_path / "source" / ".." / "source"
+
+        assert (
+            find_nested_destination(source_dir, tmp_path / "source" / "organized")
+            == source_dir / "organized"
+        )
+        assert find_nested_destination(source_dir, tmp_path / "source") is None
+        assert find_nested_destination(source_dir, tmp_path / "other") is None
+
+    def test_exclude_nested_destination_relative(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        """A destination found below a relative source is skipped by the walk."""
+        (tmp_path / "organized").mkdir()
+        (tmp_path / "organized" / "old.txt").write_text("old")
+        (tmp_path / "new.txt").write_text("new")
+        monkeypatch.chdir(tmp_path)
+        nested_dest = find_nested_destination(Path("."), Path("organized"))
+        assert nested_dest is not None
+        rules = WalkRules(excluded_dirs=[nested_dest])
+
+        assert [record.name for record in walk_source(Path("."), rules)] == ["new.txt"]
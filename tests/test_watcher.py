@@ -0,0 +1,108 @@
+"""Test watching the source for new files."""
+
+import os
+from pathlib import Path
+
+from media_organizer import config
+from media_organizer.walker import WalkRules
+from media_organizer.watcher import PendingFiles, SourceWatcher
+
+
+def set_mtime(path: Path, mtime: float) -> None:
+    """Set the modification time of the given file."""
+    os.utime(path, (mtime, mtime))
+
+
+def test_pending_files_settle(tmp_path: Path):
+    """Files are ready once they saw no event for the settle time."""
+    photo: Path = tmp_path / "IMG_0001.JPG"
+    photo.write_bytes(b"photo")
+    set_mtime(photo, 0)
+    pending = PendingFiles(settle=5, sidecar_wait=30)
+
+    pending.add(photo, now=100)
+    assert pending.get_next_ready_time() == 105
+    assert not pending.pop_ready(now=104, limit=10)
+    pending.add(photo, now=103)
+    assert not pending.pop_ready(now=107, limit=10)
+    assert pending.pop_ready(now=108, limit=10) == [[photo]]
+    assert len(pending) == 0
+
+
+def test_pending_files_group_sidecar(tmp_path: Path):
+    """A photo is handed over with its sidecar, a lone sidecar waits longer."""
+    photo: Path = tmp_path / "IMG_0001.CR2"
+    sidecar: Path = tmp_path / "IMG_0001.xmp"
+    lone_sidecar: Path = tmp_path / "IMG_0002.xmp"
+    for path in (photo, sidecar, lone_sidecar):
+        path.write_bytes(b"data")
+        set_mtime(path, 0)
+    pending = PendingFiles(settle=5, sidecar_wait=30)
+
+    pending.add(sidecar, now=100)
+    pending.add(lone_sidecar, now=100)
+    pending.add(photo, now=101)
+
+    assert pending.pop_ready(now=110, limit=10) == [[photo, sidecar]]
+    assert pending.pop_ready(now=130, limit=10) == [[lone_sidecar]]
+
+
+def test_pending_files_recently_modified(tmp_path: Path):
+    """Files modified without an event wait for the settle time again."""
+    video: Path = tmp_path / "VID_0001.MP4"
+    video.write_bytes(b"video")
+    set_mtime(video, 108)
+    pending = PendingFiles(settle=5)
+
+    pending.add(video, now=100)
+    assert not pending.pop_ready(now=110, limit=10)
+    assert pending.get_next_ready_time() == 113
+    assert pending.pop_ready(now=113, limit=10) == [[video]]
+
+
+def test_pending_files_discard_and_limit(tmp_path: Path):
+    """Removed files are forgotten, at most limit groups are returned."""
+    pending = PendingFiles(settle=0)
+    paths: list[Path] = [tmp_path / f"IMG_{index}.JPG" for index in range(3)]
+    for path in paths:
+        pending.add(path, now=0)
+    pending.discard(paths[0])
+
+    assert pending.pop_ready(now=1, limit=1) == [[paths[1]]]
+    assert pending.pop_ready(now=1, limit=1) == [[paths[2]]]
+    assert pending.get_next_ready_time() is None
+
+
+def test_source_watcher(tmp_path: Path):
+    """Closed and moved in files are reported, excluded folders are not watched."""
+    source_dir: Path = tmp_path / "source"
+    dest_dir: Path = source_dir / "organized"
+    dest_dir.mkdir(parents=True)
+    (source_dir / "node_modules").mkdir()
+    rules = WalkRules(exclude=config.DEFAULT_EXCLUDES + ("*.tmp",))
+    rules.exclude_dir(dest_dir)
+    with SourceWatcher(
+        source_dir, rules=rules, pending=PendingFiles(settle=0)
+    ) as watcher:
+        (source_dir / "IMG_0001.JPG").write_bytes(b"photo")
+        (dest_dir / "IMG_0002.JPG").write_bytes(b"organized")
+        (source_dir / "node_modules" / "logo.png").write_bytes(b"logo")
+        (source_dir / "IMG_0001.JPG.tmp").write_bytes(b"partial")
+        (source_dir / ".git").mkdir()
+        (source_dir / ".git" / "index").write_bytes(b"index")
+        upload: Path = tmp_path / "IMG_0003.JPG"
+        upload.write_bytes(b"upload")
+        upload.rename(source_dir / "IMG_0003.JPG")
+        album: Path = tmp_path / "album"
+        album.mkdir()
+        (album / "IMG_0004.JPG").write_bytes(b"album")
+        album.rename(source_dir / "album")
+
+        watcher.wait_for_events(timeout=5)
+        batch = next(watcher.iter_batches(batch_size=10))
+
+    assert sorted(path for group in batch for path in group) == [
+        source_dir / "IMG_0001.JPG",
+        source_dir / "IMG_0003.JPG",
+        source_dir / "album" / "IMG_0004.JPG",
+    ]